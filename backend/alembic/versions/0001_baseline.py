@@ -0,0 +1,108 @@
+"""Baseline: the schema previously created by Base.metadata.create_all
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "categories",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(length=100), nullable=False),
+        sa.Column("slug", sa.String(length=100), nullable=False),
+        sa.Column("description", sa.String(length=500), nullable=True),
+        sa.Column("color", sa.String(length=7), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_categories_id", "categories", ["id"])
+    op.create_index("ix_categories_name", "categories", ["name"], unique=True)
+    op.create_index("ix_categories_slug", "categories", ["slug"], unique=True)
+
+    op.create_table(
+        "tags",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(length=50), nullable=False),
+        sa.Column("color", sa.String(length=7), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_tags_id", "tags", ["id"])
+    op.create_index("ix_tags_name", "tags", ["name"], unique=True)
+
+    op.create_table(
+        "articles",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("title", sa.String(length=255), nullable=False),
+        sa.Column("slug", sa.String(length=300), nullable=True),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("summary", sa.String(length=500), nullable=True),
+        sa.Column("author", sa.String(length=100), nullable=True),
+        sa.Column("category_id", sa.Integer(), nullable=True),
+        sa.Column("is_published", sa.Boolean(), nullable=True),
+        sa.Column("view_count", sa.Integer(), nullable=True),
+        sa.Column("featured", sa.Boolean(), nullable=True),
+        sa.Column("reading_time", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["category_id"], ["categories.id"], ondelete="SET NULL"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_articles_id", "articles", ["id"])
+    op.create_index("ix_articles_title", "articles", ["title"])
+    op.create_index("ix_articles_slug", "articles", ["slug"], unique=True)
+    op.create_index("ix_articles_is_published", "articles", ["is_published"])
+    op.create_index("ix_articles_created_at", "articles", ["created_at"])
+
+    op.create_table(
+        "article_tags",
+        sa.Column("article_id", sa.Integer(), nullable=True),
+        sa.Column("tag_id", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(["article_id"], ["articles.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["tag_id"], ["tags.id"], ondelete="CASCADE"),
+    )
+
+    op.create_table(
+        "images",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("filename", sa.String(length=255), nullable=False),
+        sa.Column("filepath", sa.String(length=500), nullable=False),
+        sa.Column("alt_text", sa.String(length=255), nullable=True),
+        sa.Column("article_id", sa.Integer(), nullable=True),
+        sa.Column("thumbnail_path", sa.String(length=500), nullable=True),
+        sa.Column("medium_path", sa.String(length=500), nullable=True),
+        sa.Column("width", sa.Integer(), nullable=True),
+        sa.Column("height", sa.Integer(), nullable=True),
+        sa.Column("file_size", sa.Integer(), nullable=True),
+        sa.Column("uploaded_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["article_id"], ["articles.id"], ondelete="SET NULL"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_images_id", "images", ["id"])
+
+    op.create_table(
+        "site_settings",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("key", sa.String(length=100), nullable=False),
+        sa.Column("value", sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_site_settings_id", "site_settings", ["id"])
+    op.create_index("ix_site_settings_key", "site_settings", ["key"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_table("site_settings")
+    op.drop_table("images")
+    op.drop_table("article_tags")
+    op.drop_table("articles")
+    op.drop_table("tags")
+    op.drop_table("categories")
@@ -0,0 +1,35 @@
+"""Scheduled publishing and partial indexes for published listings
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("articles") as batch:
+        batch.add_column(sa.Column("publish_at", sa.DateTime(), nullable=True))
+    op.create_index(
+        "ix_articles_published_created_at", "articles", ["created_at"],
+        postgresql_where=sa.text("is_published = true"), sqlite_where=sa.text("is_published = 1"),
+    )
+    op.create_index(
+        "ix_articles_scheduled_publish_at", "articles", ["publish_at"],
+        postgresql_where=sa.text("publish_at IS NOT NULL AND is_published = false"),
+        sqlite_where=sa.text("publish_at IS NOT NULL AND is_published = 0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_articles_scheduled_publish_at", table_name="articles")
+    op.drop_index("ix_articles_published_created_at", table_name="articles")
+    with op.batch_alter_table("articles") as batch:
+        batch.drop_column("publish_at")
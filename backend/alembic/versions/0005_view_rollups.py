@@ -0,0 +1,30 @@
+"""Per-day article view rollups for trending and popular rankings
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "article_view_daily",
+        sa.Column("article_id", sa.Integer(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("views", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["article_id"], ["articles.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("article_id", "day"),
+    )
+    op.create_index("ix_article_view_daily_day", "article_view_daily", ["day"])
+
+
+def downgrade() -> None:
+    op.drop_table("article_view_daily")
@@ -0,0 +1,26 @@
+"""Image placeholders and dominant colours
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("images") as batch:
+        batch.add_column(sa.Column("placeholder", sa.Text(), nullable=True))
+        batch.add_column(sa.Column("dominant_color", sa.String(length=7), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("images") as batch:
+        batch.drop_column("dominant_color")
+        batch.drop_column("placeholder")
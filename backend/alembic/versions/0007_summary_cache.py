@@ -0,0 +1,37 @@
+"""AI summary cache
+
+The table arrived with the summary cache, before Alembic; databases created
+from the first baseline already have it.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table("summary_cache"):
+        return
+    op.create_table(
+        "summary_cache",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("key", sa.String(length=64), nullable=False),
+        sa.Column("model", sa.String(length=100), nullable=True),
+        sa.Column("summary", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_summary_cache_id", "summary_cache", ["id"])
+    op.create_index("ix_summary_cache_key", "summary_cache", ["key"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_table("summary_cache")
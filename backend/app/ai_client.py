@@ -0,0 +1,126 @@
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional
+
+import httpx
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+AI_TIMEOUT = float(os.getenv("AI_TIMEOUT", "30"))
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "4"))
+AI_QUEUE_TIMEOUT = float(os.getenv("AI_QUEUE_TIMEOUT", "15"))
+AI_MAX_CONNECTIONS = int(os.getenv("AI_MAX_CONNECTIONS", "10"))
+AI_KEEPALIVE_EXPIRY = float(os.getenv("AI_KEEPALIVE_EXPIRY", "60"))
+
+
+class AIBusyError(Exception):
+    """Raised when no upstream slot frees up within AI_QUEUE_TIMEOUT."""
+
+
+class AIClient:
+    """App-lifetime pooled client for the OpenAI-compatible chat completions API.
+
+    One connection pool (HTTP/2 when h2 is installed) is shared by every
+    request, and a semaphore caps concurrent upstream calls; callers past the
+    cap queue for up to AI_QUEUE_TIMEOUT seconds.
+    """
+
+    def __init__(self, max_concurrency: int = AI_MAX_CONCURRENCY, queue_timeout: float = AI_QUEUE_TIMEOUT):
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop = None
+
+    def _new_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            timeout=AI_TIMEOUT,
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=AI_MAX_CONNECTIONS,
+                max_keepalive_connections=AI_MAX_CONNECTIONS,
+                keepalive_expiry=AI_KEEPALIVE_EXPIRY,
+            ),
+        )
+
+    async def startup(self) -> None:
+        if self._client is None:
+            self._loop = asyncio.get_running_loop()
+            self._client = self._new_client()
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def shutdown(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+        self._client = None
+        self._semaphore = None
+        self._loop = None
+
+    async def _ensure_started(self) -> None:
+        # Pools and semaphores belong to one event loop; a caller on another
+        # loop (e.g. a test client without lifespan) gets its own pair.
+        if self._client is not None and self._loop is not asyncio.get_running_loop():
+            self._client = None
+        await self.startup()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self._ensure_started()
+        semaphore = self._semaphore
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise AIBusyError()
+        try:
+            yield self._client
+        finally:
+            semaphore.release()
+
+    @staticmethod
+    def _request(base_url: str, api_key: str, model: str, messages: List[dict], stream: bool) -> dict:
+        return {
+            "url": f"{base_url}/chat/completions",
+            "headers": {
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json",
+            },
+            "json": {
+                "model": model,
+                "messages": messages,
+                "max_tokens": 200,
+                "temperature": 0.7,
+                "stream": stream,
+            },
+        }
+
+    async def complete(self, base_url: str, api_key: str, model: str, messages: List[dict]) -> str:
+        async with self.slot() as client:
+            resp = await client.post(**self._request(base_url, api_key, model, messages, stream=False))
+            resp.raise_for_status()
+            return resp.json()["choices"][0]["message"]["content"].strip()
+
+    async def stream(self, client: httpx.AsyncClient, base_url: str, api_key: str,
+                     model: str, messages: List[dict]) -> AsyncIterator[str]:
+        """Yield content deltas from a streamed completion; call inside `slot()`."""
+        async with client.stream("POST", **self._request(base_url, api_key, model, messages, stream=True)) as resp:
+            if resp.is_error:
+                await resp.aread()
+                resp.raise_for_status()
+            async for line in resp.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                payload = line[5:].strip()
+                if payload == "[DONE]":
+                    break
+                delta = json.loads(payload)["choices"][0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
+
+
+ai_client = AIClient()
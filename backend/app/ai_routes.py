@@ -1,41 +1,35 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import Optional, Dict
-from .database import get_db
-from . import models
+from .database import SessionLocal, get_db
+from .ai_client import AIBusyError, ai_client
+from .site_settings import SETTING_KEYS, settings_store
+from .summaries import build_messages, cache_key, get_cached, store_cached, summary_settings
 import httpx
+import json
 
 router = APIRouter(prefix="/api/ai", tags=["ai"])
 settings_router = APIRouter(prefix="/api/settings", tags=["settings"])
 
 # === Settings ===
 
-SETTING_KEYS = ["ai_api_key", "ai_model", "ai_base_url", "ai_summary_prompt"]
-
-SETTING_DEFAULTS = {
-    "ai_api_key": "",
-    "ai_model": "gpt-4o-mini",
-    "ai_base_url": "https://api.openai.com/v1",
-    "ai_summary_prompt": "請根據以下文章內容，用繁體中文撰寫一段 50 字以內的摘要，直接輸出摘要文字即可，不要加任何前綴。",
-}
-
-
 def get_setting(db: Session, key: str) -> str:
-    row = db.query(models.SiteSetting).filter(models.SiteSetting.key == key).first()
-    if row:
-        return row.value
-    return SETTING_DEFAULTS.get(key, "")
+    return settings_store.get(db, key)
 
 
 def set_setting(db: Session, key: str, value: str):
-    row = db.query(models.SiteSetting).filter(models.SiteSetting.key == key).first()
-    if row:
-        row.value = value
-    else:
-        row = models.SiteSetting(key=key, value=value)
-        db.add(row)
-    db.commit()
+    settings_store.update(db, {key: value})
+
+
+def mask_settings(values: Dict[str, str]) -> Dict[str, str]:
+    result = dict(values)
+    val = result.get("ai_api_key")
+    # Mask API key for security
+    if val:
+        result["ai_api_key"] = val[:8] + "..." + val[-4:] if len(val) > 12 else "***"
+    return result
 
 
 class SettingsResponse(BaseModel):
@@ -54,33 +48,16 @@ class SettingsUpdate(BaseModel):
 
 @settings_router.get("/", response_model=SettingsResponse)
 def get_settings(db: Session = Depends(get_db)):
-    result = {}
-    for key in SETTING_KEYS:
-        val = get_setting(db, key)
-        # Mask API key for security
-        if key == "ai_api_key" and val:
-            result[key] = val[:8] + "..." + val[-4:] if len(val) > 12 else "***"
-        else:
-            result[key] = val
-    return result
+    return mask_settings(settings_store.all(db))
 
 
 @settings_router.put("/", response_model=SettingsResponse)
 def update_settings(data: SettingsUpdate, db: Session = Depends(get_db)):
-    updates = data.model_dump(exclude_none=True)
-    for key, value in updates.items():
-        if key in SETTING_KEYS:
-            set_setting(db, key, value)
+    updates = {k: v for k, v in data.model_dump(exclude_none=True).items() if k in SETTING_KEYS}
+    settings_store.update(db, updates)
 
     # Return updated (with masked key)
-    result = {}
-    for key in SETTING_KEYS:
-        val = get_setting(db, key)
-        if key == "ai_api_key" and val:
-            result[key] = val[:8] + "..." + val[-4:] if len(val) > 12 else "***"
-        else:
-            result[key] = val
-    return result
+    return mask_settings(settings_store.all(db))
 
 
 # === AI Summary Generation ===
@@ -94,48 +71,81 @@ class SummaryResponse(BaseModel):
     summary: str
 
 
-@router.post("/generate-summary", response_model=SummaryResponse)
-async def generate_summary(req: SummaryRequest, db: Session = Depends(get_db)):
-    api_key = get_setting(db, "ai_api_key")
-    if not api_key:
+def summary_request(req: SummaryRequest, db: Session):
+    """Resolve settings and build the chat messages and cache key for a summary request."""
+    cfg = summary_settings(db)
+    if not cfg["api_key"]:
         raise HTTPException(status_code=400, detail="尚未設定 AI API Key，請至設定頁面配置")
+    messages = build_messages(cfg["prompt"], req.title, req.content)
+    key = cache_key(cfg["prompt"], cfg["model"], req.title, req.content)
+    return cfg, messages, key
 
-    model = get_setting(db, "ai_model") or SETTING_DEFAULTS["ai_model"]
-    base_url = get_setting(db, "ai_base_url") or SETTING_DEFAULTS["ai_base_url"]
-    prompt = get_setting(db, "ai_summary_prompt") or SETTING_DEFAULTS["ai_summary_prompt"]
-
-    # Truncate content to avoid token limits
-    content = req.content[:3000]
-    user_msg = f"標題：{req.title}\n\n內容：\n{content}"
 
-    try:
-        async with httpx.AsyncClient(timeout=30) as client:
-            resp = await client.post(
-                f"{base_url}/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "model": model,
-                    "messages": [
-                        {"role": "system", "content": prompt},
-                        {"role": "user", "content": user_msg},
-                    ],
-                    "max_tokens": 200,
-                    "temperature": 0.7,
-                },
-            )
-            resp.raise_for_status()
-            data = resp.json()
-            summary = data["choices"][0]["message"]["content"].strip()
-            return {"summary": summary}
-    except httpx.HTTPStatusError as e:
+def upstream_error_detail(e: Exception) -> str:
+    if isinstance(e, httpx.HTTPStatusError):
         detail = "AI API 回傳錯誤"
         try:
             detail = e.response.json().get("error", {}).get("message", detail)
         except Exception:
             pass
-        raise HTTPException(status_code=502, detail=detail)
+        return detail
+    return f"AI 請求失敗：{str(e)}"
+
+
+@router.post("/generate-summary", response_model=SummaryResponse)
+async def generate_summary(req: SummaryRequest, db: Session = Depends(get_db)):
+    cfg, messages, key = summary_request(req, db)
+    cached = get_cached(db, key)
+    if cached is not None:
+        return {"summary": cached}
+    try:
+        summary = await ai_client.complete(cfg["base_url"], cfg["api_key"], cfg["model"], messages)
+    except AIBusyError:
+        raise HTTPException(status_code=503, detail="AI 請求過多，請稍後再試")
     except Exception as e:
-        raise HTTPException(status_code=502, detail=f"AI 請求失敗：{str(e)}")
+        raise HTTPException(status_code=502, detail=upstream_error_detail(e))
+    store_cached(db, key, cfg["model"], summary)
+    return {"summary": summary}
+
+
+def sse_event(data: dict, event: str = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/generate-summary/stream")
+async def generate_summary_stream(req: SummaryRequest, db: Session = Depends(get_db)):
+    """Server-sent events: `data: {"delta"}` per token, then `event: done` with the full summary."""
+    cfg, messages, key = summary_request(req, db)
+    cached = get_cached(db, key)
+    if cached is not None:
+        async def cached_events():
+            yield sse_event({"delta": cached})
+            yield sse_event({"summary": cached}, event="done")
+        return StreamingResponse(cached_events(), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache"})
+
+    # The slot and the session live inside the generator: a client that disconnects
+    # before the body starts never runs it, so there is nothing to release, and the
+    # request-scoped session is closed by the time the body streams.
+    async def events():
+        parts = []
+        try:
+            async with ai_client.slot() as client:
+                async for delta in ai_client.stream(client, cfg["base_url"], cfg["api_key"], cfg["model"], messages):
+                    parts.append(delta)
+                    yield sse_event({"delta": delta})
+            summary = "".join(parts).strip()
+            cache_db = SessionLocal()
+            try:
+                store_cached(cache_db, key, cfg["model"], summary)
+            finally:
+                cache_db.close()
+            yield sse_event({"summary": summary}, event="done")
+        except AIBusyError:
+            yield sse_event({"detail": "AI 請求過多，請稍後再試"}, event="error")
+        except Exception as e:
+            yield sse_event({"detail": upstream_error_detail(e)}, event="error")
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -1,41 +1,225 @@
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
-from fastapi import Depends, HTTPException
+from fastapi import Depends, HTTPException, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from collections import OrderedDict, deque
+from functools import lru_cache
+from typing import Deque, Dict, NamedTuple, Optional, Set
+from sqlalchemy.exc import IntegrityError
+import hmac
+import logging
 import os
+import threading
+import time
+import uuid
+
+from . import models
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
 
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-this")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24
 
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "1024"))
+# How stale another worker's view of a logout may be
+DENYLIST_SYNC_INTERVAL = float(os.getenv("DENYLIST_SYNC_INTERVAL", "30"))
+LOGIN_RATE_LIMIT = int(os.getenv("LOGIN_RATE_LIMIT", "10"))
+LOGIN_RATE_WINDOW = float(os.getenv("LOGIN_RATE_WINDOW", "60"))
+# The backend is only reachable through Caddy, which appends the peer address to X-Forwarded-For
+TRUST_PROXY_HEADERS = os.getenv("TRUST_PROXY_HEADERS", "true").lower() in ("1", "true", "yes")
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
 ADMIN_USERNAME = os.getenv("ADMIN_USERNAME", "admin")
-ADMIN_PASSWORD_HASH = pwd_context.hash(os.getenv("ADMIN_PASSWORD", "admin123"))
+# Generate with: python -c "from passlib.hash import bcrypt; print(bcrypt.hash('...'))"
+ADMIN_PASSWORD_HASH = os.getenv("ADMIN_PASSWORD_HASH", "")
+
+
+@lru_cache(maxsize=1)
+def admin_password_hash() -> str:
+    if ADMIN_PASSWORD_HASH:
+        return ADMIN_PASSWORD_HASH
+    # Fallback for plaintext ADMIN_PASSWORD: hashed once per worker, warmed by the startup checks
+    return pwd_context.hash(os.getenv("ADMIN_PASSWORD", "admin123"))
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
 def create_access_token(data: dict):
     to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    now = datetime.utcnow()
+    expire = now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    # jti lets a single token be revoked on logout
+    to_encode.update({"exp": expire, "iat": now, "jti": uuid.uuid4().hex})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    try:
-        token = credentials.credentials
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+
+# ===== Verified token cache =====
+class TokenInfo(NamedTuple):
+    username: str
+    jti: Optional[str]
+    expires_at: float  # unix timestamp
+
+
+class TokenCache:
+    """Bounded LRU of already-verified tokens; an entry is dropped at the token's own expiry."""
+
+    def __init__(self, maxsize: int = TOKEN_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, TokenInfo]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[TokenInfo]:
+        with self._lock:
+            info = self._entries.get(token)
+            if info is None:
+                return None
+            if info.expires_at <= time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return info
+
+    def put(self, token: str, info: TokenInfo) -> None:
+        with self._lock:
+            self._entries[token] = info
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class TokenDenylist:
+    """Revoked token ids.
+
+    The revoked_tokens table is shared by every worker; each worker keeps a
+    set of unexpired jtis and re-reads the table at most once per
+    DENYLIST_SYNC_INTERVAL, so checking a token is a set lookup.
+    """
+
+    def __init__(self, sync_interval: float = DENYLIST_SYNC_INTERVAL):
+        self.sync_interval = sync_interval
+        self._jtis: Set[str] = set()
+        self._synced_at = None
+        self._lock = threading.Lock()
+
+    def _sync(self) -> None:
+        db = SessionLocal()
+        try:
+            rows = db.query(models.RevokedToken.jti).filter(
+                models.RevokedToken.expires_at > datetime.utcnow()
+            ).all()
+        finally:
+            db.close()
+        self._jtis = {jti for jti, in rows}
+        self._synced_at = time.monotonic()
+
+    def is_revoked(self, jti: str) -> bool:
+        if self._synced_at is None or time.monotonic() - self._synced_at >= self.sync_interval:
+            with self._lock:
+                if self._synced_at is None or time.monotonic() - self._synced_at >= self.sync_interval:
+                    try:
+                        self._sync()
+                    except Exception as e:
+                        # Keep the last known set and try again next interval
+                        logger.error("Token denylist sync failed: %s", e)
+                        self._synced_at = time.monotonic()
+        return jti in self._jtis
+
+    def revoke(self, db, jti: str, expires_at: datetime) -> None:
+        db.query(models.RevokedToken).filter(
+            models.RevokedToken.expires_at <= datetime.utcnow()
+        ).delete(synchronize_session=False)
+        db.add(models.RevokedToken(jti=jti, expires_at=expires_at))
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()  # already revoked
+        self._jtis.add(jti)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._jtis = set()
+            self._synced_at = None
+
+
+token_cache = TokenCache()
+token_denylist = TokenDenylist()
+
+
+def decode_token(token: str) -> TokenInfo:
+    info = token_cache.get(token)
+    if info is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            raise HTTPException(status_code=401, detail="Invalid token")
         username = payload.get("sub")
         if not username:
             raise HTTPException(status_code=401, detail="Invalid token")
-        return username
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
+        # Tokens issued before jti existed can't be revoked individually; they expire within a day
+        info = TokenInfo(username, payload.get("jti"), float(payload["exp"]))
+        token_cache.put(token, info)
+    if info.jti and token_denylist.is_revoked(info.jti):
+        raise HTTPException(status_code=401, detail="Token revoked")
+    return info
+
+def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return decode_token(credentials.credentials).username
 
 def authenticate_user(username: str, password: str):
-    if username == ADMIN_USERNAME and verify_password(password, ADMIN_PASSWORD_HASH):
+    if hmac.compare_digest(username, ADMIN_USERNAME) and verify_password(password, admin_password_hash()):
         return username
     return None
+
+
+# ===== Login rate limiting =====
+class LoginRateLimiter:
+    """Sliding-window attempt counter per client address, per worker."""
+
+    MAX_TRACKED = 10000
+
+    def __init__(self, limit: int = LOGIN_RATE_LIMIT, window: float = LOGIN_RATE_WINDOW):
+        self.limit = limit
+        self.window = window
+        self._attempts: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def hit(self, key: str) -> float:
+        """Record an attempt. Returns 0 if allowed, else seconds until the next one is."""
+        now = time.monotonic()
+        with self._lock:
+            if len(self._attempts) > self.MAX_TRACKED:
+                self._attempts = {
+                    k: q for k, q in self._attempts.items() if q and q[-1] > now - self.window
+                }
+            attempts = self._attempts.setdefault(key, deque())
+            while attempts and attempts[0] <= now - self.window:
+                attempts.popleft()
+            if len(attempts) >= self.limit:
+                return attempts[0] + self.window - now
+            attempts.append(now)
+            return 0.0
+
+    def reset(self) -> None:
+        with self._lock:
+            self._attempts.clear()
+
+
+login_rate_limiter = LoginRateLimiter()
+
+
+def client_address(request: Request) -> str:
+    if TRUST_PROXY_HEADERS:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            # Rightmost entry is the one our proxy appended; earlier ones are client-supplied
+            return forwarded.rsplit(",", 1)[-1].strip()
+    return request.client.host if request.client else "unknown"
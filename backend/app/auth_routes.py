@@ -1,6 +1,17 @@
-from fastapi import APIRouter, HTTPException
+import math
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.security import HTTPAuthorizationCredentials
 from pydantic import BaseModel
-from .auth import authenticate_user, create_access_token
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from .auth import (
+    authenticate_user, client_address, create_access_token, decode_token,
+    login_rate_limiter, security, token_denylist, verify_token,
+)
+from .database import get_db
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
@@ -13,8 +24,15 @@ class TokenResponse(BaseModel):
     token_type: str = "bearer"
 
 @router.post("/login", response_model=TokenResponse)
-def login(request: LoginRequest):
-    user = authenticate_user(request.username, request.password)
+async def login(form: LoginRequest, request: Request):
+    # Checked before bcrypt runs, so repeated attempts can't tie up the CPU
+    retry_after = login_rate_limiter.hit(client_address(request))
+    if retry_after:
+        raise HTTPException(
+            status_code=429, detail="登入嘗試過於頻繁，請稍後再試",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+    user = await run_in_threadpool(authenticate_user, form.username, form.password)
     if not user:
         raise HTTPException(status_code=401, detail="帳號或密碼錯誤")
     
@@ -22,5 +40,12 @@ def login(request: LoginRequest):
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/logout")
-def logout():
+def logout(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
+    info = decode_token(credentials.credentials)
+    if info.jti:
+        token_denylist.revoke(db, info.jti, datetime.utcfromtimestamp(info.expires_at))
     return {"message": "Logged out"}
+
+@router.get("/me")
+def me(username: str = Depends(verify_token)):
+    return {"username": username}
@@ -0,0 +1,201 @@
+import json
+from typing import AsyncIterator, Iterator, List, Tuple
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+from . import duplicates, image_markup, models, schemas, semantic, snapshots
+from .database import SessionLocal, get_db
+from .read_cache import related_cache, taxonomy_cache
+from .routes import (
+    allocate_slugs, calculate_reading_time, commit_with_slug_retry,
+    pick_tags, resolve_tags, sanitize_html, semantic_item,
+)
+from .scheduler import apply_schedule, publish_scheduler
+from .search import bulk_index_articles
+
+# Registered before the main article router so /bulk and /export are not
+# captured by the /{article_id} routes.
+router = APIRouter(prefix="/api/articles", tags=["articles"])
+
+BULK_BATCH_SIZE = 100
+EXPORT_BATCH_SIZE = 200
+
+
+# ===== Import =====
+async def iter_ndjson_lines(request: Request) -> AsyncIterator[bytes]:
+    """Yield request body lines as they arrive without buffering the whole upload."""
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+    if buffer:
+        yield buffer
+
+
+def format_validation_error(e: ValidationError) -> str:
+    parts = []
+    for err in e.errors():
+        loc = ".".join(str(p) for p in err.get("loc", ()))
+        parts.append(f"{loc}: {err['msg']}" if loc else err["msg"])
+    return "; ".join(parts)
+
+
+def import_batch(db: Session, batch: List[Tuple[int, schemas.ArticleImport]]) -> List[dict]:
+    """Insert one batch of parsed lines in a single transaction and bulk-index it.
+
+    Tags, categories and slugs for the whole batch are resolved with one query
+    each; per-line problems are reported without failing the rest of the batch.
+    """
+    results = []
+    category_ids = {item.category_id for _, item in batch if item.category_id is not None}
+    category_slugs = {item.category_slug for _, item in batch
+                      if item.category_id is None and item.category_slug}
+    known_ids = set()
+    if category_ids:
+        known_ids = {row[0] for row in db.query(models.Category.id)
+                     .filter(models.Category.id.in_(category_ids))}
+    by_slug = {}
+    if category_slugs:
+        by_slug = {row.slug: row.id for row in db.query(models.Category.id, models.Category.slug)
+                   .filter(models.Category.slug.in_(category_slugs))}
+
+    images = image_markup.images_for(db, [item.content for _, item in batch])
+    accepted = []
+    for line, item in batch:
+        category_id = item.category_id
+        if category_id is not None and category_id not in known_ids:
+            results.append({"line": line, "error": f"Unknown category_id: {category_id}"})
+            continue
+        if category_id is None and item.category_slug:
+            category_id = by_slug.get(item.category_slug)
+            if category_id is None:
+                results.append({"line": line, "error": f"Unknown category: {item.category_slug}"})
+                continue
+        content = image_markup.decorate(sanitize_html(item.content), images)
+        fields = item.model_dump(exclude={'tag_names', 'slug', 'category_slug', 'created_at'})
+        fields.update(content=content, reading_time=calculate_reading_time(content),
+                      category_id=category_id)
+        if item.created_at:
+            fields['created_at'] = item.created_at
+        apply_schedule(fields)
+        accepted.append((line, item, fields))
+    if not accepted:
+        return results
+
+    staged = []
+
+    def stage():
+        staged.clear()
+        tags = resolve_tags(db, [name for _, item, _ in accepted for name in item.tag_names])
+        slugs = allocate_slugs(db, models.Article,
+                               [item.slug or item.title for _, item, _ in accepted], "article")
+        for (line, item, fields), slug in zip(accepted, slugs):
+            article = models.Article(**fields, slug=slug)
+            article.tags = pick_tags(tags, item.tag_names)
+            db.add(article)
+            staged.append((line, article))
+        db.flush()
+        staged[:] = [(line, article.id, article.slug) for line, article in staged]
+
+    try:
+        commit_with_slug_retry(db, stage)
+    except HTTPException as e:
+        results.extend({"line": line, "error": e.detail} for line, _, _ in accepted)
+        return results
+
+    ids = [article_id for _, article_id, _ in staged]
+    articles = db.query(models.Article).options(
+        joinedload(models.Article.category_rel),
+        selectinload(models.Article.tags),
+    ).filter(models.Article.id.in_(ids)).all()
+    bulk_index_articles(articles)
+    semantic.index_articles([semantic_item(a) for a in articles])
+    duplicates.store_signatures(
+        db, [(a.id, duplicates.plain_text(a.title, a.content)) for a in articles], replace=False)
+    db.commit()
+    related_cache.clear()
+    taxonomy_cache.discard("tags")
+    if any(fields.get('publish_at') and not fields['is_published'] for _, _, fields in accepted):
+        publish_scheduler.notify()
+
+    results.extend({"line": line, "id": article_id, "slug": slug} for line, article_id, slug in staged)
+    return results
+
+
+@router.post("/bulk", response_model=schemas.BulkImportResponse)
+async def bulk_import(request: Request, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    """Import articles from an NDJSON body (one ArticleImport object per line)."""
+    results = []
+    batch = []
+    line_no = 0
+    async for raw in iter_ndjson_lines(request):
+        line_no += 1
+        if not raw.strip():
+            continue
+        try:
+            batch.append((line_no, schemas.ArticleImport.model_validate_json(raw)))
+        except ValidationError as e:
+            results.append({"line": line_no, "error": format_validation_error(e)})
+            continue
+        if len(batch) >= BULK_BATCH_SIZE:
+            results.extend(await run_in_threadpool(import_batch, db, batch))
+            batch = []
+    if batch:
+        results.extend(await run_in_threadpool(import_batch, db, batch))
+
+    results.sort(key=lambda r: r["line"])
+    created_ids = [r["id"] for r in results if r.get("id")]
+    if created_ids:
+        background_tasks.add_task(snapshots.refresh_many, created_ids)
+    failed = sum(1 for r in results if r.get("error"))
+    return {"created": len(results) - failed, "failed": failed, "results": results}
+
+
+# ===== Export =====
+def export_record(article: models.Article) -> dict:
+    return {
+        "title": article.title,
+        "slug": article.slug,
+        "content": article.content,
+        "summary": article.summary,
+        "author": article.author,
+        "category_slug": article.category_rel.slug if article.category_rel else None,
+        "is_published": article.is_published,
+        "publish_at": article.publish_at.isoformat() if article.publish_at else None,
+        "featured": article.featured,
+        "tag_names": [t.name for t in article.tags],
+        "created_at": article.created_at.isoformat() if article.created_at else None,
+    }
+
+
+def iter_export_lines(published_only: bool) -> Iterator[bytes]:
+    # The request-scoped session is closed before a streaming body finishes,
+    # so the export owns its session for the lifetime of the stream.
+    db = SessionLocal()
+    try:
+        query = db.query(models.Article).options(
+            selectinload(models.Article.category_rel),
+            selectinload(models.Article.tags),
+        ).order_by(models.Article.id)
+        if published_only:
+            query = query.filter(models.Article.is_published == True)
+        for article in query.yield_per(EXPORT_BATCH_SIZE):
+            yield json.dumps(export_record(article), ensure_ascii=False).encode("utf-8") + b"\n"
+    finally:
+        db.close()
+
+
+@router.get("/export")
+def export_articles(published_only: bool = False):
+    """Stream every article as NDJSON in constant memory; the output re-imports via /bulk."""
+    return StreamingResponse(
+        iter_export_lines(published_only),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="articles.ndjson"'},
+    )
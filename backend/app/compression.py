@@ -0,0 +1,189 @@
+"""Response compression (brotli or gzip, negotiated from Accept-Encoding).
+
+CompressionMiddleware compresses text-like responses of at least
+COMPRESS_MIN_SIZE bytes; below that the headers cost more than they save.
+Streaming responses are compressed chunk by chunk. Images and other binary
+types, range responses and bodies that already carry a Content-Encoding
+pass through untouched.
+
+Routes that serve a cached payload return an EncodedBody instead: it keeps
+the JSON bytes plus each compressed variant the first time a client asks
+for it, so a hot article is compressed once per cache entry rather than
+once per request. The middleware leaves those responses alone.
+
+Brotli is optional; without the package only gzip is offered.
+"""
+import gzip
+import os
+import re
+import zlib
+from typing import Optional
+
+import orjson
+from fastapi import Request
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+# Server-sent events stay uncompressed so each event reaches the client as soon as it is sent
+COMPRESSIBLE_TYPES = re.compile(
+    r"^(text/(?!event-stream)|application/(json|xml|javascript|x-ndjson|rss\+xml|atom\+xml)|image/svg\+xml)"
+)
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """'br' or 'gzip' from an Accept-Encoding header, honouring q=0; None for identity."""
+    if not COMPRESSION_ENABLED or not accept_encoding:
+        return None
+    offered = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        offered[name.strip()] = q
+    candidates = (["br"] if brotli else []) + ["gzip"]
+    best = max(candidates, key=lambda enc: offered.get(enc, offered.get("*", 0.0)))
+    return best if offered.get(best, offered.get("*", 0.0)) > 0 else None
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class EncodedBody:
+    """A JSON payload with its compressed variants, made once and shared by every request."""
+
+    __slots__ = ("raw", "_variants")
+
+    def __init__(self, raw: bytes):
+        self.raw = raw
+        self._variants = {}
+
+    @classmethod
+    def json(cls, content) -> "EncodedBody":
+        # Same options as ORJSONResponse
+        return cls(orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY))
+
+    def variant(self, encoding: Optional[str]) -> bytes:
+        if encoding is None or len(self.raw) < COMPRESS_MIN_SIZE:
+            return self.raw
+        data = self._variants.get(encoding)
+        if data is None:
+            # Two first hits may both compress; either result is the same bytes
+            data = self._variants[encoding] = compress(self.raw, encoding)
+        return data
+
+    def response(self, request: Request, status_code: int = 200) -> Response:
+        encoding = negotiate(request.headers.get("accept-encoding"))
+        body = self.variant(encoding)
+        headers = {"Vary": "Accept-Encoding"}
+        if body is not self.raw:
+            headers["Content-Encoding"] = encoding
+        return Response(body, status_code=status_code, headers=headers, media_type="application/json")
+
+
+class _Stream:
+    """Incremental compressor for streamed bodies."""
+
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._c = brotli.Compressor(quality=BROTLI_QUALITY)
+            self._process, self._finish = self._c.process, self._c.finish
+        else:
+            self._c = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+            self._process, self._finish = self._c.compress, self._c.flush
+
+    def process(self, data: bytes) -> bytes:
+        return self._process(data)
+
+    def finish(self) -> bytes:
+        return self._finish()
+
+
+class CompressionMiddleware:
+    """Plain ASGI middleware: buffers only the first body message to decide, then streams."""
+
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        state = {"start": None, "stream": None, "passthrough": False}
+
+        async def send_wrapper(message):
+            if state["passthrough"]:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                state["start"] = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            start, stream = state["start"], state["stream"]
+            if stream is None:
+                body = message.get("body", b"")
+                more = message.get("more_body", False)
+                headers = MutableHeaders(raw=start["headers"])
+                if not self._should_compress(start["status"], headers, body, more):
+                    state["passthrough"] = True
+                    if "content-encoding" not in headers and COMPRESSIBLE_TYPES.match(headers.get("content-type", "")):
+                        headers.add_vary_header("Accept-Encoding")
+                    await send(start)
+                    await send(message)
+                    return
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if not more:
+                    data = compress(body, encoding)
+                    headers["Content-Length"] = str(len(data))
+                    await send(start)
+                    await send({"type": "http.response.body", "body": data})
+                    return
+                del headers["Content-Length"]
+                stream = state["stream"] = _Stream(encoding)
+                await send(start)
+
+            data = stream.process(message.get("body", b""))
+            if not message.get("more_body", False):
+                data += stream.finish()
+                await send({"type": "http.response.body", "body": data})
+            elif data:
+                await send({"type": "http.response.body", "body": data, "more_body": True})
+
+        await self.app(scope, receive, send_wrapper)
+
+    def _should_compress(self, status: int, headers: MutableHeaders, body: bytes, more: bool) -> bool:
+        if status < 200 or status in (204, 206, 304) or "content-encoding" in headers or "content-range" in headers:
+            return False
+        if not COMPRESSIBLE_TYPES.match(headers.get("content-type", "")):
+            return False
+        if more:
+            length = headers.get("content-length")
+            return length is None or int(length) >= self.minimum_size
+        return len(body) >= self.minimum_size
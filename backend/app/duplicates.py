@@ -0,0 +1,244 @@
+"""Near-duplicate detection with MinHash and locality-sensitive hashing.
+
+The plain text that goes into the ES document (title plus stripped content)
+is cut into 5-character shingles and summarised as NUM_PERM minimum hashes;
+the share of equal positions in two signatures estimates the Jaccard
+similarity of their shingle sets. Each signature is split into BANDS bands
+of ROWS values and every band is hashed into article_lsh_buckets, so the
+candidates for one article come from an index lookup on (band, bucket)
+instead of a pass over the archive. With 16 bands of 8 rows a pair becomes a
+candidate ~95% of the time at 0.8 similarity and almost always at 0.9.
+
+Check the whole archive:  python -m app.duplicates scan [--threshold 0.8] [--rebuild]
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+from itertools import combinations
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import delete, insert, select, tuple_
+from sqlalchemy.orm import Session
+
+from . import models
+from .search import strip_html
+from .semantic import code_points, mix64
+
+logger = logging.getLogger(__name__)
+
+NUM_PERM = 128
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", "0.8"))
+MAX_CHARS = 20000
+# A bucket this crowded is boilerplate, not duplication; its pairs are skipped by the scan
+MAX_BUCKET_SIZE = 200
+
+# Stored signatures are only comparable while these seeds stay the same
+_SEEDS = np.random.default_rng(0x5EED).integers(1, 2 ** 63, size=NUM_PERM, dtype=np.uint64)
+_SHINGLE_PRIME = np.uint64(0x100000001B3)
+
+
+# ===== Signatures =====
+def plain_text(title: str, content: str) -> str:
+    return f"{title}\n{strip_html(content)}"[:MAX_CHARS]
+
+
+def shingles(text: str) -> np.ndarray:
+    codes = code_points(text)
+    if not codes.size:
+        return codes
+    size = min(SHINGLE_SIZE, codes.size)
+    count = codes.size - size + 1
+    h = np.zeros(count, dtype=np.uint64)
+    for offset in range(size):
+        h = h * _SHINGLE_PRIME + codes[offset:offset + count]
+    return np.unique(mix64(h))
+
+
+def signature(text: str) -> Optional[np.ndarray]:
+    """NUM_PERM uint32 minimum hashes, or None for text without any shingles."""
+    values = shingles(text)
+    if not values.size:
+        return None
+    hashed = mix64(values[None, :] ^ _SEEDS[:, None])
+    return (hashed.min(axis=1) >> np.uint64(32)).astype("<u4")
+
+
+def band_hashes(sig: np.ndarray) -> List[int]:
+    return [
+        int.from_bytes(hashlib.blake2b(band.tobytes(), digest_size=8).digest(), "little", signed=True)
+        for band in sig.reshape(BANDS, ROWS)
+    ]
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.count_nonzero(a == b)) / NUM_PERM
+
+
+def from_bytes(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype="<u4")
+
+
+# ===== Storage =====
+def forget(db: Session, article_ids: List[int]) -> None:
+    db.execute(delete(models.ArticleLshBucket).where(models.ArticleLshBucket.article_id.in_(article_ids)))
+    db.execute(delete(models.ArticleSignature).where(models.ArticleSignature.article_id.in_(article_ids)))
+
+
+def store_signatures(db: Session, items: Iterable[Tuple[int, str]],
+                     replace: bool = True) -> Dict[int, Optional[np.ndarray]]:
+    """Stage signature and bucket rows for (article_id, plain text) pairs; the caller commits.
+
+    `replace=False` skips deleting old rows, for articles that were just created.
+    """
+    signatures = {article_id: signature(text) for article_id, text in items}
+    if replace and signatures:
+        forget(db, list(signatures))
+    signed = [(article_id, sig) for article_id, sig in signatures.items() if sig is not None]
+    if signed:
+        db.execute(insert(models.ArticleSignature), [
+            {"article_id": article_id, "signature": sig.tobytes()} for article_id, sig in signed
+        ])
+        db.execute(insert(models.ArticleLshBucket), [
+            {"article_id": article_id, "band": band, "bucket": bucket}
+            for article_id, sig in signed
+            for band, bucket in enumerate(band_hashes(sig))
+        ])
+    return signatures
+
+
+# ===== Lookup =====
+def near_duplicates(db: Session, article_id: int, sig: Optional[np.ndarray],
+                    threshold: float = DUPLICATE_THRESHOLD) -> List[dict]:
+    """Articles sharing an LSH bucket with `sig` whose estimated similarity reaches `threshold`."""
+    if sig is None:
+        return []
+    candidates = select(models.ArticleLshBucket.article_id).where(
+        tuple_(models.ArticleLshBucket.band, models.ArticleLshBucket.bucket).in_(
+            list(enumerate(band_hashes(sig)))
+        )
+    )
+    rows = db.query(
+        models.Article.id, models.Article.title, models.Article.slug, models.ArticleSignature.signature,
+    ).join(
+        models.ArticleSignature, models.ArticleSignature.article_id == models.Article.id
+    ).filter(
+        models.Article.id.in_(candidates), models.Article.id != article_id
+    ).all()
+    found = []
+    for row in rows:
+        score = similarity(sig, from_bytes(row.signature))
+        if score >= threshold:
+            found.append({"id": row.id, "title": row.title, "slug": row.slug, "similarity": round(score, 3)})
+    found.sort(key=lambda d: d["similarity"], reverse=True)
+    return found
+
+
+def check_article(db: Session, article_id: int, title: str, content: str, new: bool = False) -> List[dict]:
+    """Re-sign a just-saved article, commit, and return its near-duplicates."""
+    signatures = store_signatures(db, [(article_id, plain_text(title, content))], replace=not new)
+    db.commit()
+    found = near_duplicates(db, article_id, signatures[article_id])
+    if found:
+        logger.info("Article %s has near-duplicates %s", article_id, [d["id"] for d in found])
+    return found
+
+
+# ===== Batch scan =====
+def backfill(db: Session, rebuild: bool = False, chunk_size: int = 500) -> int:
+    """Sign every article without a signature (all of them with `rebuild`). Returns the number signed."""
+    if rebuild:
+        db.execute(delete(models.ArticleLshBucket))
+        db.execute(delete(models.ArticleSignature))
+        db.commit()
+    signed = 0
+    last_id = 0
+    while True:
+        rows = db.query(models.Article.id, models.Article.title, models.Article.content).outerjoin(
+            models.ArticleSignature, models.ArticleSignature.article_id == models.Article.id
+        ).filter(
+            models.ArticleSignature.article_id.is_(None), models.Article.id > last_id
+        ).order_by(models.Article.id).limit(chunk_size).all()
+        if not rows:
+            return signed
+        store_signatures(db, [(row.id, plain_text(row.title, row.content)) for row in rows], replace=False)
+        db.commit()
+        signed += len(rows)
+        last_id = rows[-1].id
+
+
+def scan(db: Session, threshold: float = DUPLICATE_THRESHOLD) -> List[dict]:
+    """Group the whole archive into clusters of near-duplicates using the stored buckets."""
+    signatures = {
+        article_id: from_bytes(blob)
+        for article_id, blob in db.query(models.ArticleSignature.article_id, models.ArticleSignature.signature)
+    }
+    candidates = set()
+
+    def add_pairs(members: List[int]) -> None:
+        if len(members) > MAX_BUCKET_SIZE:
+            logger.warning("Skipping LSH bucket with %d articles", len(members))
+        elif len(members) > 1:
+            candidates.update(combinations(members, 2))
+
+    current, members = None, []
+    rows = db.query(
+        models.ArticleLshBucket.band, models.ArticleLshBucket.bucket, models.ArticleLshBucket.article_id,
+    ).order_by(
+        models.ArticleLshBucket.band, models.ArticleLshBucket.bucket, models.ArticleLshBucket.article_id,
+    ).yield_per(5000)
+    for band, bucket, article_id in rows:
+        if (band, bucket) != current:
+            add_pairs(members)
+            current, members = (band, bucket), []
+        members.append(article_id)
+    add_pairs(members)
+
+    parent = {}
+
+    def root(x: int) -> int:
+        while parent.get(x, x) != x:
+            parent[x] = parent.get(parent[x], parent[x])
+            x = parent[x]
+        return x
+
+    pairs = []
+    for a, b in candidates:
+        score = similarity(signatures[a], signatures[b])
+        if score >= threshold:
+            pairs.append((a, b, round(score, 3)))
+            parent[root(a)] = root(b)
+
+    clusters: Dict[int, dict] = {}
+    for a, b, score in sorted(pairs):
+        cluster = clusters.setdefault(root(a), {"articles": set(), "pairs": []})
+        cluster["articles"].update((a, b))
+        cluster["pairs"].append([a, b, score])
+    return sorted(
+        ({"articles": sorted(c["articles"]), "pairs": c["pairs"]} for c in clusters.values()),
+        key=lambda c: c["articles"][0],
+    )
+
+
+if __name__ == "__main__":
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Find near-duplicate articles")
+    parser.add_argument("command", choices=["scan"])
+    parser.add_argument("--threshold", type=float, default=DUPLICATE_THRESHOLD)
+    parser.add_argument("--rebuild", action="store_true", help="recompute every signature first")
+    args = parser.parse_args()
+    db = SessionLocal()
+    try:
+        signed = backfill(db, rebuild=args.rebuild)
+        clusters = scan(db, args.threshold)
+    finally:
+        db.close()
+    print(json.dumps({"signed": signed, "clusters": len(clusters)}))
+    for cluster in clusters:
+        print(json.dumps(cluster))
@@ -0,0 +1,182 @@
+"""Sitemap and Atom feed, generated from a slim projection and cached on disk.
+
+The cache is keyed by a fingerprint of the published set (count and latest
+updated_at), fetched with a single aggregate query, so files are only
+regenerated when an article is published, edited or removed.
+"""
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from pathlib import Path
+from typing import Iterator, Optional
+from urllib.parse import quote
+from xml.sax.saxutils import escape
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import FileResponse, Response
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import get_db
+from .metrics import record_cache
+
+router = APIRouter(tags=["feeds"])
+
+SITE_URL = os.getenv("SITE_URL", "https://www.heniiii.cc").rstrip("/")
+SITE_TITLE = os.getenv("SITE_TITLE", "Itsour Blog")
+ARTICLE_URL_TEMPLATE = os.getenv("ARTICLE_URL_TEMPLATE", "{site}/?article={slug}")
+FEED_CACHE_DIR = Path(os.getenv("FEED_CACHE_DIR", "cache/feeds"))
+SITEMAP_MAX_URLS = 50000
+FEED_SIZE = 50
+PROJECTION_BATCH = 1000
+
+_lock = threading.Lock()
+
+
+def article_url(slug: str) -> str:
+    return ARTICLE_URL_TEMPLATE.format(site=SITE_URL, slug=quote(slug))
+
+
+def w3c_datetime(dt: Optional[datetime]) -> str:
+    return (dt or datetime.utcnow()).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+# ===== Fingerprint / cache =====
+def published_fingerprint(db: Session) -> dict:
+    total, latest = db.query(
+        func.count(models.Article.id), func.max(models.Article.updated_at)
+    ).filter(models.Article.is_published == True).one()
+    return {"total": total, "latest": latest.isoformat() if latest else None}
+
+
+def projection(db: Session):
+    return db.query(
+        models.Article.slug, models.Article.updated_at, models.Article.title, models.Article.summary,
+    ).filter(models.Article.is_published == True, models.Article.slug.isnot(None))
+
+
+def write_streamed(path: Path, chunks: Iterator[str]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def ensure_fresh(db: Session) -> dict:
+    """Regenerate every cached file if the published set changed since the last build."""
+    fingerprint = published_fingerprint(db)
+    stamp = FEED_CACHE_DIR / "fingerprint.json"
+    with _lock:
+        try:
+            if json.loads(stamp.read_text()) == fingerprint:
+                record_cache("feeds", True)
+                return fingerprint
+        except (OSError, ValueError):
+            pass
+        record_cache("feeds", False)
+        build_sitemaps(db, fingerprint["total"])
+        write_streamed(FEED_CACHE_DIR / "feed.xml", iter_feed(db, fingerprint["latest"]))
+        write_streamed(stamp, iter([json.dumps(fingerprint)]))
+    return fingerprint
+
+
+# ===== Sitemap =====
+def iter_urlset(db: Session, offset: int, limit: int) -> Iterator[str]:
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+    rows = projection(db).order_by(models.Article.id).offset(offset).limit(limit)
+    for row in rows.yield_per(PROJECTION_BATCH):
+        yield (f"<url><loc>{escape(article_url(row.slug))}</loc>"
+               f"<lastmod>{w3c_datetime(row.updated_at)}</lastmod></url>\n")
+    yield "</urlset>\n"
+
+
+def build_sitemaps(db: Session, total: int) -> None:
+    if total <= SITEMAP_MAX_URLS:
+        write_streamed(FEED_CACHE_DIR / "sitemap.xml", iter_urlset(db, 0, SITEMAP_MAX_URLS))
+        parts = 0
+    else:
+        parts = (total + SITEMAP_MAX_URLS - 1) // SITEMAP_MAX_URLS
+        for n in range(1, parts + 1):
+            write_streamed(FEED_CACHE_DIR / f"sitemap-{n}.xml",
+                           iter_urlset(db, (n - 1) * SITEMAP_MAX_URLS, SITEMAP_MAX_URLS))
+        write_streamed(FEED_CACHE_DIR / "sitemap.xml", iter_sitemap_index(parts))
+    for stale in FEED_CACHE_DIR.glob("sitemap-*.xml"):
+        n = stale.stem.split("-", 1)[1]
+        if n.isdigit() and int(n) > parts:
+            stale.unlink(missing_ok=True)
+
+
+def iter_sitemap_index(parts: int) -> Iterator[str]:
+    now = w3c_datetime(None)
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+    for n in range(1, parts + 1):
+        yield f"<sitemap><loc>{SITE_URL}/sitemaps/{n}.xml</loc><lastmod>{now}</lastmod></sitemap>\n"
+    yield "</sitemapindex>\n"
+
+
+# ===== Atom feed =====
+def iter_feed(db: Session, latest: Optional[str]) -> Iterator[str]:
+    updated = w3c_datetime(datetime.fromisoformat(latest) if latest else None)
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield '<feed xmlns="http://www.w3.org/2005/Atom">\n'
+    yield f"<title>{escape(SITE_TITLE)}</title>\n"
+    yield f'<link href="{escape(SITE_URL)}/"/>\n<link rel="self" href="{escape(SITE_URL)}/feed.xml"/>\n'
+    yield f"<id>{escape(SITE_URL)}/</id>\n<updated>{updated}</updated>\n"
+    rows = projection(db).order_by(models.Article.updated_at.desc()).limit(FEED_SIZE)
+    for row in rows:
+        url = escape(article_url(row.slug))
+        yield (f"<entry><title>{escape(row.title)}</title>"
+               f'<link href="{url}"/><id>{url}</id>'
+               f"<updated>{w3c_datetime(row.updated_at)}</updated>"
+               f"<summary>{escape(row.summary or '')}</summary></entry>\n")
+    yield "</feed>\n"
+
+
+# ===== Routes =====
+def cached_file(request: Request, name: str, media_type: str, fingerprint: dict):
+    path = FEED_CACHE_DIR / name
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="Not found")
+    latest = datetime.fromisoformat(fingerprint["latest"]) if fingerprint["latest"] else None
+    headers = {"Cache-Control": "public, max-age=300"}
+    if latest:
+        last_modified = latest.replace(microsecond=0)
+        headers["Last-Modified"] = format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True)
+        since = request.headers.get("if-modified-since")
+        if since:
+            try:
+                if parsedate_to_datetime(since).replace(tzinfo=None) >= last_modified:
+                    return Response(status_code=304, headers=headers)
+            except (TypeError, ValueError):
+                pass
+    return FileResponse(path, media_type=media_type, headers=headers)
+
+
+@router.get("/sitemap.xml")
+def sitemap(request: Request, db: Session = Depends(get_db)):
+    fingerprint = ensure_fresh(db)
+    return cached_file(request, "sitemap.xml", "application/xml", fingerprint)
+
+
+@router.get("/sitemaps/{part}.xml")
+def sitemap_part(part: int, request: Request, db: Session = Depends(get_db)):
+    fingerprint = ensure_fresh(db)
+    return cached_file(request, f"sitemap-{part}.xml", "application/xml", fingerprint)
+
+
+@router.get("/feed.xml")
+def feed(request: Request, db: Session = Depends(get_db)):
+    fingerprint = ensure_fresh(db)
+    return cached_file(request, "feed.xml", "application/atom+xml", fingerprint)
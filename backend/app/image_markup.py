@@ -0,0 +1,197 @@
+"""Responsive <img> markup for article content, computed when the article is saved.
+
+Every <img> whose src is one of our uploads gets:
+- width/height of the variant it shows (unless the author set them), so the
+  browser reserves the space before the file arrives;
+- loading="lazy" and decoding="async";
+- srcset over the thumbnail, medium and original variants, with sizes;
+- the dominant colour and LQIP as its background while it loads.
+
+It runs after sanitize_html on create, update and bulk import, so the stored
+HTML is what reads serve. Re-sanitizing on the next save strips the extra
+attributes and this puts them back. Images without a row are left alone.
+
+Fill in placeholders for images uploaded before they existed and re-render
+every article's markup:  python -m app.image_markup backfill
+"""
+import argparse
+import html
+import json
+import logging
+import re
+from typing import Dict, Iterable, Optional, Set
+from urllib.parse import unquote, urlsplit
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from . import models
+from .image_utils import MEDIUM_WIDTH, THUMBNAIL_WIDTH, dominant_color, placeholder, variant_size
+
+logger = logging.getLogger(__name__)
+
+IMG_TAG = re.compile(r"<img\b[^>]*>")
+ATTRIBUTE = re.compile(r'([\w-]+)="([^"]*)"')
+SIZES = f"(max-width: {MEDIUM_WIDTH}px) 100vw, {MEDIUM_WIDTH}px"
+VARIANT_WIDTHS = {"thumbnail": THUMBNAIL_WIDTH, "medium": MEDIUM_WIDTH, "original": None}
+
+
+def upload_path(src: str) -> Optional[str]:
+    """'/uploads/medium/ab/cd/x.jpg' or an absolute URL to it -> 'uploads/medium/ab/cd/x.jpg'."""
+    path = unquote(urlsplit(html.unescape(src)).path).lstrip("/")
+    parts = path.split("/")
+    if len(parts) < 3 or parts[0] != "uploads" or parts[1] not in VARIANT_WIDTHS:
+        return None
+    return path
+
+
+def references(content: str) -> Set[str]:
+    """Stored paths of every upload an <img> in `content` shows, through src or any srcset candidate."""
+    paths = set()
+    for tag in IMG_TAG.findall(content or ""):
+        attrs = dict(ATTRIBUTE.findall(tag))
+        candidates = [attrs.get("src", "")]
+        candidates += [c.split()[0] for c in attrs.get("srcset", "").split(",") if c.strip()]
+        paths.update(filter(None, map(upload_path, candidates)))
+    return paths
+
+
+def images_for(db: Session, contents: Iterable[str]) -> Dict[str, models.Image]:
+    """Stored path -> Image for every upload referenced by <img src> in `contents`, in one query."""
+    paths = set()
+    for content in contents:
+        for tag in IMG_TAG.findall(content or ""):
+            src = dict(ATTRIBUTE.findall(tag)).get("src")
+            path = src and upload_path(src)
+            if path:
+                paths.add(path)
+    if not paths:
+        return {}
+    paths = list(paths)
+    rows = db.query(models.Image).filter(or_(
+        models.Image.filepath.in_(paths), models.Image.medium_path.in_(paths),
+        models.Image.thumbnail_path.in_(paths),
+    )).all()
+    return {path: image for image in rows
+            for path in (image.filepath, image.medium_path, image.thumbnail_path) if path}
+
+
+def srcset(image: models.Image) -> Optional[str]:
+    entries, seen = [], set()
+    for variant, path in (("thumbnail", image.thumbnail_path), ("medium", image.medium_path),
+                          ("original", image.filepath)):
+        if not path:
+            continue
+        width, _ = variant_size(image.width, image.height, VARIANT_WIDTHS[variant] or image.width)
+        if width not in seen:
+            seen.add(width)
+            entries.append(f"/{path} {width}w")
+    # A small original makes every variant the same size; one candidate needs no srcset
+    return ", ".join(entries) if len(entries) > 1 else None
+
+
+def decorate_tag(tag: str, image: models.Image, path: str) -> str:
+    attrs = dict(ATTRIBUTE.findall(tag))
+    added = {}
+    if image.width and image.height:
+        if "width" not in attrs and "height" not in attrs:
+            max_width = VARIANT_WIDTHS[path.split("/")[1]] or image.width
+            added["width"], added["height"] = variant_size(image.width, image.height, max_width)
+        candidates = srcset(image)
+        if candidates:
+            added["srcset"], added["sizes"] = candidates, SIZES
+    added["loading"], added["decoding"] = "lazy", "async"
+    background = " ".join(filter(None, [
+        image.dominant_color, f"url({image.placeholder})" if image.placeholder else None,
+    ]))
+    if background:
+        added["style"] = f"background: {background} center / cover no-repeat"
+    for key in added:
+        attrs.pop(key, None)
+    # Values parsed from the tag are already escaped by bleach; only the new ones need it
+    parts = [f'{k}="{v}"' for k, v in attrs.items()]
+    parts += [f'{k}="{html.escape(str(v), quote=True)}"' for k, v in added.items()]
+    return "<img " + " ".join(parts) + ">"
+
+
+def decorate(content: str, images: Dict[str, models.Image]) -> str:
+    if not images:
+        return content
+
+    def replace(m: re.Match) -> str:
+        tag = m.group(0)
+        src = dict(ATTRIBUTE.findall(tag)).get("src")
+        path = src and upload_path(src)
+        image = images.get(path) if path else None
+        return decorate_tag(tag, image, path) if image else tag
+
+    return IMG_TAG.sub(replace, content)
+
+
+def decorate_content(db: Session, content: str) -> str:
+    return decorate(content, images_for(db, [content]))
+
+
+def backfill(db: Session, batch_size: int = 200) -> dict:
+    """Compute missing placeholders from the stored originals, then re-decorate all article content."""
+    from PIL import Image as PILImage
+
+    stats = {"images": 0, "unreadable": 0, "articles": 0}
+    last_id = 0
+    while True:
+        images = db.query(models.Image).filter(
+            models.Image.id > last_id, models.Image.placeholder.is_(None)
+        ).order_by(models.Image.id).limit(batch_size).all()
+        if not images:
+            break
+        for image in images:
+            try:
+                with PILImage.open(image.filepath) as img:
+                    image.placeholder, image.dominant_color = placeholder(img), dominant_color(img)
+                stats["images"] += 1
+            except OSError as e:
+                logger.warning("Skipping image %s: %s", image.id, e)
+                stats["unreadable"] += 1
+        last_id = images[-1].id
+        db.commit()
+
+    changed = []
+    last_id = 0
+    while True:
+        rows = db.query(models.Article.id, models.Article.content).filter(
+            models.Article.id > last_id, models.Article.content.contains("<img")
+        ).order_by(models.Article.id).limit(batch_size).all()
+        if not rows:
+            break
+        images = images_for(db, [content for _, content in rows])
+        for article_id, content in rows:
+            rendered = decorate(content, images)
+            if rendered != content:
+                # Markup only: keep updated_at so feeds and sitemaps don't see a new revision
+                db.query(models.Article).filter(models.Article.id == article_id).update(
+                    {models.Article.content: rendered, models.Article.updated_at: models.Article.updated_at},
+                    synchronize_session=False,
+                )
+                changed.append(article_id)
+        last_id = rows[-1].id
+        db.commit()
+    stats["articles"] = len(changed)
+
+    if changed:
+        from .snapshots import refresh_many
+        refresh_many(changed)
+    return stats
+
+
+if __name__ == "__main__":
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Image placeholders and responsive <img> markup")
+    parser.add_argument("command", choices=["backfill"])
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args()
+    db = SessionLocal()
+    try:
+        print(json.dumps(backfill(db, args.batch_size)))
+    finally:
+        db.close()
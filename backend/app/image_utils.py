@@ -1,43 +1,93 @@
-from PIL import Image
+from PIL import Image, ImageOps, features
 from pathlib import Path
+import base64
+import hashlib
+import io
 import uuid
 
+from .metrics import IMAGE_PROCESSING
+
 UPLOAD_BASE = Path("uploads")
 ORIGINAL_DIR = UPLOAD_BASE / "original"
 MEDIUM_DIR = UPLOAD_BASE / "medium"
 THUMBNAIL_DIR = UPLOAD_BASE / "thumbnail"
 
-for d in [ORIGINAL_DIR, MEDIUM_DIR, THUMBNAIL_DIR]:
-    d.mkdir(parents=True, exist_ok=True)
-
 MEDIUM_WIDTH = 800
 THUMBNAIL_WIDTH = 300
 JPEG_QUALITY = 85
+PLACEHOLDER_SIZE = 16
+PLACEHOLDER_QUALITY = 40
+# WebP keeps a 16 px placeholder near 150 bytes; a JPEG's headers alone are ~600
+PLACEHOLDER_FORMAT = "WEBP" if features.check("webp") else "JPEG"
+VARIANT_DIRS = {"original": ORIGINAL_DIR, "medium": MEDIUM_DIR, "thumbnail": THUMBNAIL_DIR}
+
+
+def shard(name: str) -> str:
+    """Two-level hash prefix for a stored file name ("3f/a2"), so no directory grows past a few entries."""
+    digest = hashlib.blake2b(name.encode(), digest_size=2).hexdigest()
+    return f"{digest[:2]}/{digest[2:]}"
+
+
+def sharded_path(variant_dir: Path, name: str) -> Path:
+    return variant_dir / shard(name) / name
+
+
+def variant_size(width: int, height: int, max_width: int) -> tuple:
+    """Pixel size of a variant resized to at most `max_width` wide."""
+    if width <= max_width:
+        return width, height
+    return max_width, int(height * max_width / width)
+
+
+def placeholder(img: Image.Image) -> str:
+    """A low-quality image placeholder: the picture at PLACEHOLDER_SIZE px, as a data URI."""
+    small = img.convert("RGB")
+    small.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    buf = io.BytesIO()
+    small.save(buf, format=PLACEHOLDER_FORMAT, quality=PLACEHOLDER_QUALITY)
+    return f"data:image/{PLACEHOLDER_FORMAT.lower()};base64," + base64.b64encode(buf.getvalue()).decode()
+
+
+def dominant_color(img: Image.Image) -> str:
+    """Most common colour of a 5-colour quantization, as #rrggbb."""
+    small = img.convert("RGB")
+    small.thumbnail((64, 64))
+    quantized = small.quantize(colors=5)
+    _, index = max(quantized.getcolors())
+    r, g, b = quantized.getpalette()[index * 3:index * 3 + 3]
+    return f"#{r:02x}{g:02x}{b:02x}"
 
 
+@IMAGE_PROCESSING.time()
 def process_image(file_path: str, filename: str) -> dict:
     """Process uploaded image: generate original (compressed), medium, and thumbnail versions.
 
-    Returns dict with original_path, medium_path, thumbnail_path, width, height, file_size.
+    Returns dict with original_path, medium_path, thumbnail_path, width, height, file_size,
+    placeholder and dominant_color. EXIF orientation is applied to the pixels and the
+    metadata (camera, GPS) is not written to any variant.
     """
-    img = Image.open(file_path)
+    img = ImageOps.exif_transpose(Image.open(file_path))
     width, height = img.size
 
-    # Generate a unique prefix
-    prefix = uuid.uuid4().hex[:8]
+    # A unique prefix: a stored name never gets different bytes, so it can be cached as immutable
+    prefix = uuid.uuid4().hex[:16]
     safe_name = f"{prefix}_{filename}"
+    for variant_dir in VARIANT_DIRS.values():
+        sharded_path(variant_dir, safe_name).parent.mkdir(parents=True, exist_ok=True)
 
     # Convert RGBA to RGB for JPEG
     if img.mode in ("RGBA", "P"):
         img = img.convert("RGB")
+    # exif_transpose keeps the rest of the EXIF block in img.info; saving must not carry it over
+    img.info.pop("exif", None)
 
     # Save original (compressed)
-    original_path = ORIGINAL_DIR / safe_name
+    original_path = sharded_path(ORIGINAL_DIR, safe_name)
     img.save(str(original_path), quality=JPEG_QUALITY, optimize=True)
     file_size = original_path.stat().st_size
 
     # Medium (800px wide)
-    medium_path = MEDIUM_DIR / safe_name
+    medium_path = sharded_path(MEDIUM_DIR, safe_name)
     if width > MEDIUM_WIDTH:
         ratio = MEDIUM_WIDTH / width
         medium_size = (MEDIUM_WIDTH, int(height * ratio))
@@ -47,7 +97,7 @@ def process_image(file_path: str, filename: str) -> dict:
         img.save(str(medium_path), quality=JPEG_QUALITY, optimize=True)
 
     # Thumbnail (300px wide)
-    thumbnail_path = THUMBNAIL_DIR / safe_name
+    thumbnail_path = sharded_path(THUMBNAIL_DIR, safe_name)
     if width > THUMBNAIL_WIDTH:
         ratio = THUMBNAIL_WIDTH / width
         thumb_size = (THUMBNAIL_WIDTH, int(height * ratio))
@@ -64,6 +114,8 @@ def process_image(file_path: str, filename: str) -> dict:
         "height": height,
         "file_size": file_size,
         "safe_name": safe_name,
+        "placeholder": placeholder(img),
+        "dominant_color": dominant_color(img),
     }
 
 
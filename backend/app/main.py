@@ -1,17 +1,32 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from .database import engine, Base
-from .routes import router, category_router, media_router
+from .compression import CompressionMiddleware
+from .database import ReadYourWritesMiddleware, engine, replicas
+from .routes import router, category_router, media_router, tag_router
+from .bulk import router as bulk_router
+from .feeds import router as feeds_router
+from .media import router as uploads_router
 from .auth_routes import router as auth_router
 from .ai_routes import router as ai_router, settings_router
-from .search import ensure_index
-from pathlib import Path
+from .metrics import MetricsMiddleware, instrument_engine, metrics_response
+from .startup import lifespan, readiness
+from . import query_audit
 
-Base.metadata.create_all(bind=engine)
+# Schema is managed by Alembic (`python -m app.startup migrate`); directories,
+# the ES index and the admin password hash are prepared in the lifespan.
+for bound in [engine, *replicas.engines]:
+    instrument_engine(bound)
 
-app = FastAPI(title="Itsour Blog API")
+app = FastAPI(title="Itsour Blog API", default_response_class=ORJSONResponse, lifespan=lifespan)
 
+if query_audit.QUERY_AUDIT != "off":
+    for bound in [engine, *replicas.engines]:
+        query_audit.install(bound)
+    app.add_middleware(query_audit.QueryAuditMiddleware)
+app.add_middleware(ReadYourWritesMiddleware)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(MetricsMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -24,26 +39,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Create upload directories
-for d in ["uploads", "uploads/original", "uploads/medium", "uploads/thumbnail"]:
-    Path(d).mkdir(parents=True, exist_ok=True)
-
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
-
 app.include_router(auth_router)
 app.include_router(category_router)
+app.include_router(tag_router)
 app.include_router(media_router)
 app.include_router(ai_router)
 app.include_router(settings_router)
+app.include_router(bulk_router)
+app.include_router(feeds_router)
+app.include_router(uploads_router)
 app.include_router(router)
 
-# Initialize Elasticsearch index
-ensure_index()
-
 @app.get("/")
 def read_root():
     return {"message": "Itsour Blog API"}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return metrics_response()
+
 @app.get("/health")
 def health_check():
     return {"status": "healthy"}
+
+@app.get("/ready")
+async def ready_check():
+    """Readiness probe: 503 until every critical startup check passes."""
+    await readiness.recheck_failed()
+    return ORJSONResponse(readiness.report(), status_code=200 if readiness.ready else 503)
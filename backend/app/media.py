@@ -0,0 +1,263 @@
+"""Serving /uploads and migrating it to the sharded layout.
+
+In production Caddy serves the uploads volume itself (sendfile, ranges and
+ETags without touching Python) and only forwards misses here; this route is
+the fallback and what development and tests use. Both send the same headers:
+
+- names written by process_image (a random hex prefix, never reused) get
+  `Cache-Control: public, max-age=31536000, immutable`;
+- anything else gets MEDIA_MAX_AGE;
+- If-None-Match / If-Modified-Since answer 304, a single byte range 206,
+  and an unsatisfiable range 416;
+- a pre-sharding URL (uploads/<variant>/<name>) whose file has moved
+  redirects permanently to its sharded location.
+
+Move existing files into <variant>/<xx>/<yy>/ and rewrite image rows and
+<img src> references in article content:
+
+    python -m app.media migrate [--batch-size 500] [--dry-run]
+"""
+import argparse
+import json
+import os
+import re
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import anyio
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, RedirectResponse, Response
+from sqlalchemy.orm import Session
+
+from . import models
+from .image_utils import UPLOAD_BASE, VARIANT_DIRS, shard
+
+router = APIRouter(tags=["uploads"])
+
+MEDIA_MAX_AGE = int(os.getenv("MEDIA_MAX_AGE", "3600"))
+IMMUTABLE = "public, max-age=31536000, immutable"
+VERSIONED_NAME = re.compile(r"^[0-9a-f]{8,}_")
+RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+# /uploads/<variant>/<name> in content; a sharded reference has more path segments and does not match
+FLAT_REFERENCE = re.compile(r"(/?uploads/(original|medium|thumbnail)/)([^/\"'\s?#<>]+)(?=[\"'\s?#<>]|$)")
+
+
+class FileRangeResponse(FileResponse):
+    """206 for bytes start..end (inclusive) of a file, read in chunks off the event loop."""
+
+    def __init__(self, path: Path, start: int, end: int, stat_result: os.stat_result, headers: dict):
+        super().__init__(path, status_code=206, headers=headers, stat_result=stat_result)
+        self.start, self.end = start, end
+        self.headers["content-length"] = str(end - start + 1)
+        self.headers["content-range"] = f"bytes {start}-{end}/{stat_result.st_size}"
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"].upper() == "HEAD":
+            await send({"type": "http.response.body", "body": b""})
+            return
+        remaining = self.end - self.start + 1
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(self.start)
+            while remaining > 0:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0:
+            # The file shrank under us; end the body rather than hang the client
+            await send({"type": "http.response.body", "body": b""})
+
+
+def resolve(path: str) -> Optional[Path]:
+    """The file for a URL path under uploads/, or None if it escapes the directory or isn't a file."""
+    root = UPLOAD_BASE.resolve()
+    full = (root / path).resolve()
+    if root not in full.parents or not full.is_file():
+        return None
+    return full
+
+
+def cache_control(path: str) -> str:
+    parts = path.split("/")
+    if parts[0] in VARIANT_DIRS and VERSIONED_NAME.match(parts[-1]):
+        return IMMUTABLE
+    return f"public, max-age={MEDIA_MAX_AGE}"
+
+
+def etag_of(st: os.stat_result) -> str:
+    return f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+
+
+def not_modified(request: Request, etag: str, st: os.stat_result) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    since = request.headers.get("if-modified-since")
+    if since:
+        try:
+            return int(st.st_mtime) <= parsedate_to_datetime(since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def byte_range(request: Request, etag: str, size: int) -> Optional[Tuple[int, int]]:
+    """(start, end) of a satisfiable single range, None to send the whole file.
+
+    Raises 416 for a range past the end. Multiple ranges are answered with the
+    whole file, which RFC 9110 allows.
+    """
+    header = request.headers.get("range")
+    if not header:
+        return None
+    if_range = request.headers.get("if-range")
+    if if_range and if_range != etag:
+        return None
+    m = RANGE.match(header.strip())
+    if not m or m.groups() == ("", ""):
+        return None
+    first, last = m.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    else:
+        start, end = max(size - int(last), 0), size - 1
+    if start >= size or size == 0:
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+
+@router.api_route("/uploads/{path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+def serve_upload(path: str, request: Request):
+    full = resolve(path)
+    if full is None:
+        parts = path.split("/")
+        if len(parts) == 2 and parts[0] in VARIANT_DIRS and resolve(f"{parts[0]}/{shard(parts[1])}/{parts[1]}"):
+            return RedirectResponse(f"/uploads/{parts[0]}/{shard(parts[1])}/{parts[1]}", status_code=301,
+                                    headers={"Cache-Control": IMMUTABLE})
+        raise HTTPException(status_code=404, detail="Not found")
+
+    st = full.stat()
+    etag = etag_of(st)
+    headers = {
+        "Cache-Control": cache_control(path),
+        "ETag": etag,
+        "Last-Modified": formatdate(st.st_mtime, usegmt=True),
+        "Accept-Ranges": "bytes",
+    }
+    if not_modified(request, etag, st):
+        return Response(status_code=304, headers=headers)
+    span = byte_range(request, etag, st.st_size)
+    if span is not None:
+        return FileRangeResponse(full, *span, stat_result=st, headers=headers)
+    return FileResponse(full, headers=headers, stat_result=st)
+
+
+# ===== Migration to the sharded layout =====
+def sharded_location(stored: Optional[str]) -> Optional[str]:
+    """uploads/<variant>/<name> -> uploads/<variant>/<xx>/<yy>/<name>; None if already sharded or foreign."""
+    if not stored:
+        return None
+    parts = Path(stored).parts
+    if len(parts) != 3 or parts[0] != UPLOAD_BASE.name or parts[1] not in VARIANT_DIRS:
+        return None
+    return str(Path(parts[0], parts[1], shard(parts[2]), parts[2]))
+
+
+def move_image_files(image: models.Image, dry_run: bool = False) -> Dict[str, int]:
+    """Move one image's variants into the sharded layout and point the row at them."""
+    counts = {"moved": 0, "missing": 0}
+    for field in ("filepath", "medium_path", "thumbnail_path"):
+        old = getattr(image, field)
+        new = sharded_location(old)
+        if new is None:
+            continue
+        src, dst = Path(old), Path(new)
+        if src.exists():
+            if not dry_run:
+                dst.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(src, dst)
+            counts["moved"] += 1
+        elif not dst.exists():
+            counts["missing"] += 1
+        # Also when only dst exists: a previous run moved the file but died before committing
+        if not dry_run:
+            setattr(image, field, new)
+    return counts
+
+
+def rewrite_references(content: str, dry_run: bool = False) -> str:
+    """Point flat /uploads/<variant>/<name> references at files that now live in a shard."""
+    def replace(m: re.Match) -> str:
+        prefix, variant, name = m.groups()
+        target = Path(UPLOAD_BASE, variant, shard(name), name)
+        if target.exists() or (dry_run and Path(UPLOAD_BASE, variant, name).exists()):
+            return f"{prefix}{shard(name)}/{name}"
+        return m.group(0)
+    return FLAT_REFERENCE.sub(replace, content)
+
+
+def migrate(db: Session, batch_size: int = 500, dry_run: bool = False) -> dict:
+    """Move every image into the sharded layout, then rewrite article content, one batch per commit."""
+    stats = {"images": 0, "moved": 0, "missing": 0, "articles": 0}
+    last_id = 0
+    while True:
+        images = db.query(models.Image).filter(models.Image.id > last_id).order_by(
+            models.Image.id).limit(batch_size).all()
+        if not images:
+            break
+        for image in images:
+            counts = move_image_files(image, dry_run)
+            stats["moved"] += counts["moved"]
+            stats["missing"] += counts["missing"]
+        stats["images"] += len(images)
+        last_id = images[-1].id
+        db.commit()
+
+    changed: List[int] = []
+    last_id = 0
+    while True:
+        rows = db.query(models.Article.id, models.Article.content).filter(
+            models.Article.id > last_id, models.Article.content.contains("uploads/")
+        ).order_by(models.Article.id).limit(batch_size).all()
+        if not rows:
+            break
+        for article_id, content in rows:
+            rewritten = rewrite_references(content, dry_run)
+            if rewritten != content:
+                changed.append(article_id)
+                if not dry_run:
+                    # Keep updated_at: only URLs changed, feeds and sitemaps shouldn't see a new revision
+                    db.query(models.Article).filter(models.Article.id == article_id).update(
+                        {models.Article.content: rewritten, models.Article.updated_at: models.Article.updated_at},
+                        synchronize_session=False,
+                    )
+        last_id = rows[-1].id
+        db.commit()
+    stats["articles"] = len(changed)
+
+    if changed and not dry_run:
+        from .snapshots import refresh_many
+        refresh_many(changed)
+    return stats
+
+
+if __name__ == "__main__":
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Move uploads into hash-prefix shard directories")
+    parser.add_argument("command", choices=["migrate"])
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="report what would move without changing anything")
+    args = parser.parse_args()
+    db = SessionLocal()
+    try:
+        print(json.dumps(migrate(db, args.batch_size, args.dry_run)))
+    finally:
+        db.close()
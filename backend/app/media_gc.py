@@ -0,0 +1,276 @@
+"""Orphaned media collection and storage accounting.
+
+Garbage is:
+- image rows without an article (media library uploads never used, or whose
+  article was deleted) that no article's content references;
+- files under uploads/<variant>/ that no image row or article references;
+- uploads/temp_* files left behind when process_image failed.
+
+Everything must be older than a grace period before it counts: MEDIA_GC_GRACE_HOURS
+for rows (by uploaded_at) and files (by mtime), so an upload that isn't yet
+committed or linked is never touched; MEDIA_GC_TEMP_GRACE_MINUTES for temp files.
+
+Collection deletes in batches. Each batch of rows is checked again right
+before its DELETE (still unattached, still unreferenced), the rows are
+committed first and the files unlinked after, so a failure leaves at most
+an unreferenced file for the next run.
+
+    python -m app.media_gc scan                  # report only
+    python -m app.media_gc collect [--dry-run] [--grace-hours 168] [--batch-size 200]
+"""
+import argparse
+import html
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Set, Tuple
+from urllib.parse import quote
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from . import image_markup, models
+from .image_utils import UPLOAD_BASE, VARIANT_DIRS
+from .media import VERSIONED_NAME
+
+MEDIA_GC_GRACE_HOURS = float(os.getenv("MEDIA_GC_GRACE_HOURS", "168"))
+MEDIA_GC_TEMP_GRACE_MINUTES = float(os.getenv("MEDIA_GC_TEMP_GRACE_MINUTES", "60"))
+MEDIA_USAGE_TTL = float(os.getenv("MEDIA_USAGE_TTL", "300"))
+TEMP_PREFIX = "temp_"
+
+_usage_cache: Tuple[float, dict] = (0.0, {})
+
+
+# ===== Disk =====
+def walk(directory: Path) -> Iterator[os.DirEntry]:
+    """Every regular file below `directory`. Paths come out as stored on image rows (uploads/original/...)."""
+    stack = [str(directory)]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield entry
+        except FileNotFoundError:
+            continue
+
+
+def temp_files() -> Iterator[os.DirEntry]:
+    try:
+        with os.scandir(UPLOAD_BASE) as entries:
+            for entry in entries:
+                if entry.name.startswith(TEMP_PREFIX) and entry.is_file(follow_symlinks=False):
+                    yield entry
+    except FileNotFoundError:
+        return
+
+
+# ===== References =====
+def row_paths(db: Session) -> Set[str]:
+    paths = set()
+    for row in db.query(models.Image.filepath, models.Image.medium_path,
+                        models.Image.thumbnail_path).yield_per(5000):
+        paths.update(p for p in row if p)
+    return paths
+
+
+def content_paths(db: Session) -> Set[str]:
+    paths = set()
+    for (content,) in db.query(models.Article.content).filter(
+        models.Article.content.contains("uploads/")
+    ).yield_per(500):
+        paths.update(image_markup.references(content))
+    return paths
+
+
+def search_tokens(name: str) -> Set[str]:
+    """Substrings a stored reference to `name` must contain, for a LIKE prefilter.
+
+    The random hex prefix survives HTML and URL escaping; an older name without
+    one is looked for as written, HTML-escaped and percent-encoded.
+    """
+    if VERSIONED_NAME.match(name):
+        return {name.split("_", 1)[0]}
+    return {name, html.escape(name, quote=True), quote(name)}
+
+
+def referenced_in_content(db: Session, images: List[models.Image]) -> Set[int]:
+    """Ids of `images` some article's content shows right now (one query per batch)."""
+    paths = {image.id: {p for p in (image.filepath, image.medium_path, image.thumbnail_path) if p}
+             for image in images}
+    tokens = {token for image in images if image.filename for token in search_tokens(image.filename)}
+    if not tokens:
+        return set()
+    hits = set()
+    for (content,) in db.query(models.Article.content).filter(
+        or_(*(models.Article.content.contains(token) for token in tokens))
+    ):
+        shown = image_markup.references(content)
+        hits.update(image_id for image_id, own in paths.items() if own & shown)
+    return hits
+
+
+# ===== Plan =====
+def plan(db: Session, grace_hours: float = MEDIA_GC_GRACE_HOURS,
+         temp_grace_minutes: float = MEDIA_GC_TEMP_GRACE_MINUTES) -> dict:
+    """What collection would delete: image ids, file paths with sizes, and totals."""
+    now = time.time()
+    file_cutoff = now - grace_hours * 3600
+    row_cutoff = datetime.utcnow() - timedelta(hours=grace_hours)
+    in_content = content_paths(db)
+
+    orphan_rows: Dict[int, List[str]] = {}
+    for image_id, *paths in db.query(
+        models.Image.id, models.Image.filepath, models.Image.medium_path, models.Image.thumbnail_path,
+    ).filter(models.Image.article_id.is_(None), models.Image.uploaded_at < row_cutoff).yield_per(5000):
+        paths = [p for p in paths if p]
+        if not in_content.intersection(paths):
+            orphan_rows[image_id] = paths
+    row_owned = {p for paths in orphan_rows.values() for p in paths}
+    live = (row_paths(db) - row_owned) | in_content
+
+    files: Dict[str, int] = {}
+    row_bytes = 0
+    on_disk = set()
+    for variant_dir in VARIANT_DIRS.values():
+        for entry in walk(variant_dir):
+            path = entry.path
+            on_disk.add(path)
+            st = entry.stat(follow_symlinks=False)
+            if path in row_owned:
+                row_bytes += st.st_size
+            elif path not in live and st.st_mtime < file_cutoff:
+                files[path] = st.st_size
+    missing = len((live - in_content) - on_disk)
+
+    temps = {}
+    for entry in temp_files():
+        st = entry.stat(follow_symlinks=False)
+        if st.st_mtime < now - temp_grace_minutes * 60:
+            temps[entry.path] = st.st_size
+
+    return {
+        "images": sorted(orphan_rows),
+        "files": files,
+        "temp_files": temps,
+        "summary": {
+            "orphan_images": len(orphan_rows),
+            "orphan_image_bytes": row_bytes,
+            "orphan_files": len(files),
+            "orphan_file_bytes": sum(files.values()),
+            "temp_files": len(temps),
+            "temp_bytes": sum(temps.values()),
+            "reclaimable_bytes": row_bytes + sum(files.values()) + sum(temps.values()),
+            "missing_files": missing,
+        },
+    }
+
+
+# ===== Collect =====
+def unlink_all(paths) -> int:
+    removed = 0
+    for path in paths:
+        try:
+            Path(path).unlink()
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def collect(db: Session, dry_run: bool = False, grace_hours: float = MEDIA_GC_GRACE_HOURS,
+            batch_size: int = 200) -> dict:
+    """Delete what plan() finds, batch by batch. Returns plan()'s summary plus what was removed."""
+    found = plan(db, grace_hours)
+    result = dict(found["summary"], dry_run=dry_run, deleted_images=0, deleted_files=0)
+    if dry_run:
+        return result
+
+    row_cutoff = datetime.utcnow() - timedelta(hours=grace_hours)
+    ids = found["images"]
+    for start in range(0, len(ids), batch_size):
+        images = db.query(models.Image).filter(
+            models.Image.id.in_(ids[start:start + batch_size]),
+            models.Image.article_id.is_(None),
+            models.Image.uploaded_at < row_cutoff,
+        ).all()
+        # Someone may have linked an image into an article since the scan
+        keep = referenced_in_content(db, images)
+        doomed = [image for image in images if image.id not in keep]
+        paths = [p for image in doomed for p in (image.filepath, image.medium_path, image.thumbnail_path) if p]
+        for image in doomed:
+            db.delete(image)
+        db.commit()
+        result["deleted_images"] += len(doomed)
+        result["deleted_files"] += unlink_all(paths)
+
+    stray = list(found["files"]) + list(found["temp_files"])
+    for start in range(0, len(stray), batch_size):
+        result["deleted_files"] += unlink_all(stray[start:start + batch_size])
+    invalidate_usage()
+    return result
+
+
+# ===== Usage =====
+def usage(db: Session) -> dict:
+    """Bytes and files per variant directory and in temp files, image rows, and what GC could reclaim."""
+    global _usage_cache
+    stamp, cached = _usage_cache
+    if cached and time.monotonic() - stamp < MEDIA_USAGE_TTL:
+        return cached
+
+    directories = {}
+    for name, variant_dir in VARIANT_DIRS.items():
+        files = total = 0
+        for entry in walk(variant_dir):
+            files += 1
+            total += entry.stat(follow_symlinks=False).st_size
+        directories[name] = {"files": files, "bytes": total}
+    temps = [entry.stat(follow_symlinks=False).st_size for entry in temp_files()]
+    directories["temp"] = {"files": len(temps), "bytes": sum(temps)}
+
+    attached = db.query(func.count(models.Image.id), func.coalesce(func.sum(models.Image.file_size), 0)).filter(
+        models.Image.article_id.isnot(None)).one()
+    unattached = db.query(func.count(models.Image.id), func.coalesce(func.sum(models.Image.file_size), 0)).filter(
+        models.Image.article_id.is_(None)).one()
+    report = {
+        "total_bytes": sum(d["bytes"] for d in directories.values()),
+        "total_files": sum(d["files"] for d in directories.values()),
+        "directories": directories,
+        "images": {
+            "attached": {"count": attached[0], "original_bytes": int(attached[1])},
+            "unattached": {"count": unattached[0], "original_bytes": int(unattached[1])},
+        },
+        "reclaimable": plan(db)["summary"],
+        "generated_at": datetime.utcnow(),
+    }
+    _usage_cache = (time.monotonic(), report)
+    return report
+
+
+def invalidate_usage() -> None:
+    global _usage_cache
+    _usage_cache = (0.0, {})
+
+
+if __name__ == "__main__":
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Find and delete orphaned uploads")
+    parser.add_argument("command", choices=["scan", "collect"])
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--grace-hours", type=float, default=MEDIA_GC_GRACE_HOURS)
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args()
+    db = SessionLocal()
+    try:
+        if args.command == "scan":
+            print(json.dumps(plan(db, args.grace_hours)["summary"]))
+        else:
+            print(json.dumps(collect(db, args.dry_run, args.grace_hours, args.batch_size)))
+    finally:
+        db.close()
@@ -0,0 +1,162 @@
+"""Prometheus metrics for requests, database, Elasticsearch, image processing and caches.
+
+With several uvicorn workers, point PROMETHEUS_MULTIPROC_DIR at an empty
+directory shared by the workers (wiped on deploy); /metrics then aggregates
+every worker's samples.
+"""
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest,
+)
+from prometheus_client import multiprocess
+from sqlalchemy import event
+from starlette.responses import Response
+
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "Requests currently being handled",
+    ["method"], multiprocess_mode="livesum",
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request", "SQL statements executed per request",
+    ["route"], buckets=QUERY_COUNT_BUCKETS,
+)
+DB_TIME_PER_REQUEST = Histogram(
+    "db_time_per_request_seconds", "Time spent in SQL per request",
+    ["route"], buckets=LATENCY_BUCKETS,
+)
+DB_QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds", "Latency of individual SQL statements", buckets=LATENCY_BUCKETS,
+)
+ES_LATENCY = Histogram(
+    "es_request_duration_seconds", "Elasticsearch call latency", ["operation"], buckets=LATENCY_BUCKETS,
+)
+ES_ERRORS = Counter("es_errors_total", "Failed Elasticsearch calls", ["operation"])
+IMAGE_PROCESSING = Histogram(
+    "image_processing_seconds", "Time to generate image variants",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 16),
+)
+STARTUP_SECONDS = Gauge(
+    "app_startup_seconds", "Time the lifespan startup checks took", multiprocess_mode="max",
+)
+CACHE_REQUESTS = Counter("cache_requests_total", "Cache lookups by outcome", ["cache", "result"])
+
+
+# ===== Per-request DB accounting =====
+class RequestStats:
+    __slots__ = ("queries", "db_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+
+
+# Holds a mutable object so sync routes running in the threadpool (which get a
+# copy of the context) still add to the request's counters.
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def instrument_engine(engine) -> None:
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info["metrics_start"] = time.perf_counter()
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        # A failed statement never reaches _after; don't leave its start on the pooled connection
+        if context.connection is not None:
+            context.connection.info.pop("metrics_start", None)
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info.pop("metrics_start")
+        DB_QUERY_LATENCY.observe(elapsed)
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += elapsed
+
+
+# ===== Helpers for instrumented code =====
+@contextmanager
+def time_es(operation: str):
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        ES_ERRORS.labels(operation).inc()
+        raise
+    finally:
+        ES_LATENCY.labels(operation).observe(time.perf_counter() - start)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+# ===== ASGI middleware =====
+class MetricsMiddleware:
+    """Plain ASGI middleware (no BaseHTTPMiddleware task overhead, streaming-safe)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = {"code": 500}
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        in_flight = REQUESTS_IN_FLIGHT.labels(method)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            in_flight.dec()
+            _request_stats.reset(token)
+            route = scope.get("route")
+            # Route templates keep label cardinality bounded
+            template = getattr(route, "path", None) or "unmatched"
+            REQUEST_LATENCY.labels(method, template, str(status["code"])).observe(elapsed)
+            DB_QUERIES_PER_REQUEST.labels(template).observe(stats.queries)
+            DB_TIME_PER_REQUEST.labels(template).observe(stats.db_time)
+
+
+def metrics_response() -> Response:
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        data = generate_latest(registry)
+    else:
+        data = generate_latest()
+    return Response(data, media_type=CONTENT_TYPE_LATEST)
+
+
+def mark_worker_dead() -> None:
+    """Drop this worker's live gauges from the shared multiprocess directory on shutdown."""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
@@ -1,4 +1,7 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Table
+from sqlalchemy import (
+    Column, Integer, BigInteger, SmallInteger, String, Text, Date, DateTime, ForeignKey, Boolean,
+    LargeBinary, Table, Index, text,
+)
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
@@ -36,6 +39,18 @@ class Article(Base):
     reading_time = Column(Integer, default=1)
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # 排程發布：草稿在此時間（UTC）自動上線
+    publish_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Public list: WHERE is_published ORDER BY created_at DESC
+        Index("ix_articles_published_created_at", "created_at",
+              postgresql_where=text("is_published = true"), sqlite_where=text("is_published = 1")),
+        # Scheduler: earliest publish_at among pending drafts
+        Index("ix_articles_scheduled_publish_at", "publish_at",
+              postgresql_where=text("publish_at IS NOT NULL AND is_published = false"),
+              sqlite_where=text("publish_at IS NOT NULL AND is_published = 0")),
+    )
 
     # 關聯
     category_rel = relationship("Category", back_populates="articles")
@@ -56,6 +71,9 @@ class Image(Base):
     width = Column(Integer)
     height = Column(Integer)
     file_size = Column(Integer)
+    # LQIP data URI and #rrggbb, shown while the image loads
+    placeholder = Column(Text)
+    dominant_color = Column(String(7))
     uploaded_at = Column(DateTime, default=datetime.utcnow)
 
     article = relationship("Article", back_populates="images", foreign_keys=[article_id])
@@ -75,3 +93,50 @@ class SiteSetting(Base):
     id = Column(Integer, primary_key=True, index=True)
     key = Column(String(100), unique=True, nullable=False, index=True)
     value = Column(Text, default="")
+
+class SummaryCache(Base):
+    __tablename__ = "summary_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # sha256 of (prompt, model, title, truncated content)
+    key = Column(String(64), unique=True, nullable=False, index=True)
+    model = Column(String(100))
+    summary = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    jti = Column(String(36), unique=True, nullable=False, index=True)
+    # Rows can be pruned once the token would have expired anyway
+    expires_at = Column(DateTime, nullable=False, index=True)
+    revoked_at = Column(DateTime, default=datetime.utcnow)
+
+class ArticleSignature(Base):
+    __tablename__ = "article_signatures"
+
+    article_id = Column(Integer, ForeignKey("articles.id", ondelete='CASCADE'), primary_key=True)
+    # MinHash of the indexed plain text: NUM_PERM little-endian uint32 (see app/duplicates.py)
+    signature = Column(LargeBinary, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ArticleLshBucket(Base):
+    __tablename__ = "article_lsh_buckets"
+
+    article_id = Column(Integer, ForeignKey("articles.id", ondelete='CASCADE'), primary_key=True)
+    band = Column(SmallInteger, primary_key=True, autoincrement=False)
+    # 64-bit hash of one band of the signature; articles sharing any (band, bucket) are candidates
+    bucket = Column(BigInteger, nullable=False)
+
+    __table_args__ = (
+        Index("ix_article_lsh_buckets_band_bucket", "band", "bucket"),
+    )
+
+class ArticleViewDaily(Base):
+    __tablename__ = "article_view_daily"
+
+    article_id = Column(Integer, ForeignKey("articles.id", ondelete='CASCADE'), primary_key=True)
+    # UTC day; workers add their buffered view counts here (see app/trending.py)
+    day = Column(Date, primary_key=True, index=True)
+    views = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,181 @@
+"""Opt-in SQL auditing: per-request query counts, duplicate statements and slow queries.
+
+Enable with QUERY_AUDIT=log (report problems through logging) or
+QUERY_AUDIT=strict (also raise QueryBudgetExceeded before the response goes
+out, failing the request with a 500, when an endpoint goes over its budget).
+Off by default; the cursor listeners are only installed when auditing is
+enabled or a test asks for it.
+
+Tests use the ``query_budget`` fixture from tests/conftest.py.
+"""
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+QUERY_AUDIT = os.getenv("QUERY_AUDIT", "off").lower()
+QUERY_AUDIT_SLOW_MS = float(os.getenv("QUERY_AUDIT_SLOW_MS", "100"))
+QUERY_AUDIT_DEFAULT_BUDGET = int(os.getenv("QUERY_AUDIT_DEFAULT_BUDGET", "10"))
+
+# Per-endpoint budgets, keyed by "METHOD /route/template"
+ENDPOINT_BUDGETS: Dict[str, int] = {
+    "GET /api/articles/": 2,
+    "GET /api/articles/{article_id}": 3,
+    "GET /api/articles/by-slug/{slug}": 3,
+    "GET /api/articles/{article_id}/related": 3,
+    "GET /api/articles/tags/all": 1,
+    "GET /api/categories/": 1,
+}
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PARAM_LISTS = re.compile(r"\((?:\s*(?:\?|%\(\w+\)s|%s|:\w+)\s*,)+\s*(?:\?|%\(\w+\)s|%s|:\w+)\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def fingerprint(statement: str) -> str:
+    """Normalize a statement so the same query with different values or IN-list sizes matches."""
+    text = _LITERALS.sub("?", statement)
+    text = _PARAM_LISTS.sub("(?...)", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+class QueryAudit:
+    def __init__(self, label: str = ""):
+        self.label = label
+        self.queries: List[tuple] = []  # (statement, seconds)
+
+    @property
+    def count(self) -> int:
+        return len(self.queries)
+
+    @property
+    def total_time(self) -> float:
+        return sum(seconds for _, seconds in self.queries)
+
+    def duplicates(self) -> Dict[str, int]:
+        counts = Counter(fingerprint(statement) for statement, _ in self.queries)
+        return {fp: n for fp, n in counts.items() if n > 1}
+
+    def slow(self, threshold_ms: float = QUERY_AUDIT_SLOW_MS) -> List[tuple]:
+        return [(s, t) for s, t in self.queries if t * 1000 >= threshold_ms]
+
+    def report(self) -> str:
+        lines = [f"{self.label or 'audit'}: {self.count} queries in {self.total_time * 1000:.1f} ms"]
+        for fp, n in sorted(self.duplicates().items(), key=lambda item: -item[1]):
+            lines.append(f"  duplicate x{n}: {fp[:200]}")
+        for statement, seconds in self.slow():
+            lines.append(f"  slow {seconds * 1000:.1f} ms: {_WHITESPACE.sub(' ', statement)[:200]}")
+        return "\n".join(lines)
+
+
+# Request audits live in a context variable; test audits are global because
+# the test client runs the app on another thread.
+_current: ContextVar[Optional[QueryAudit]] = ContextVar("query_audit", default=None)
+_global_audits: List[QueryAudit] = []
+_global_lock = threading.Lock()
+_installed = set()
+
+
+def install(engine) -> None:
+    if id(engine) in _installed:
+        return
+    _installed.add(id(engine))
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info["audit_start"] = time.perf_counter()
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        # A failed statement never reaches _after; don't leave its start on the pooled connection
+        if context.connection is not None:
+            context.connection.info.pop("audit_start", None)
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        record = (statement, time.perf_counter() - conn.info.pop("audit_start"))
+        audit = _current.get()
+        if audit is not None:
+            audit.queries.append(record)
+        if _global_audits:
+            with _global_lock:
+                for audit in _global_audits:
+                    audit.queries.append(record)
+
+
+@contextmanager
+def capture(label: str = ""):
+    """Record every statement executed on any thread while the block runs."""
+    audit = QueryAudit(label)
+    with _global_lock:
+        _global_audits.append(audit)
+    try:
+        yield audit
+    finally:
+        with _global_lock:
+            _global_audits.remove(audit)
+
+
+class QueryAuditMiddleware:
+    """Logs requests over budget. In strict mode it holds the response until its last
+    body message and raises instead of sending it, so the client gets a 500; streamed
+    bodies are buffered in full, which is fine for the development and CI runs strict
+    mode is meant for."""
+
+    def __init__(self, app, strict: bool = QUERY_AUDIT == "strict"):
+        self.app = app
+        self.strict = strict
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        audit = QueryAudit()
+        token = _current.set(audit)
+        held = []
+
+        async def strict_send(message):
+            if message["type"] not in ("http.response.start", "http.response.body"):
+                await send(message)
+                return
+            held.append(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                budget = self._label(scope, audit)
+                if budget is not None and audit.count > budget:
+                    raise QueryBudgetExceeded(
+                        f"{audit.label} ran {audit.count} queries, budget {budget}\n{audit.report()}")
+                for pending in held:
+                    await send(pending)
+                held.clear()
+
+        try:
+            await self.app(scope, receive, strict_send if self.strict else send)
+        finally:
+            _current.reset(token)
+        budget = self._label(scope, audit)
+        if budget is None:
+            return
+        if audit.count > budget or audit.duplicates() or audit.slow():
+            logger.warning("%s (budget %d)", audit.report(), budget)
+
+    @staticmethod
+    def _label(scope, audit: QueryAudit) -> Optional[int]:
+        """Label the audit with the matched route and return its budget; None before routing."""
+        route = getattr(scope.get("route"), "path", None)
+        if route is None:
+            return None
+        audit.label = f"{scope['method']} {route}"
+        return ENDPOINT_BUDGETS.get(audit.label, QUERY_AUDIT_DEFAULT_BUDGET)
@@ -0,0 +1,164 @@
+"""Request coalescing and stale-while-revalidate for hot read endpoints.
+
+Each ReadCache maps a key (route + params) to a serialized response:
+
+- fresh (younger than READ_CACHE_TTL): served from memory;
+- stale (up to READ_CACHE_STALE seconds past that): served from memory while
+  exactly one background refresh runs;
+- missing: the first request computes it and concurrent requests for the
+  same key wait for that result instead of running the same query
+  (singleflight). A waiter gives up after READ_CACHE_MAX_WAIT seconds and
+  computes on its own, so one slow query can't stall a queue of requests.
+
+Errors (e.g. a 404) are shared with the waiters but never cached. Writes
+call discard/clear; a computation that started before an invalidation
+still answers its callers but is not stored. Clients pinned to the primary
+after a write (see database.ReadYourWritesMiddleware) read through.
+
+Caches are per worker; another worker's write becomes visible here within
+READ_CACHE_TTL plus one refresh.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, Hashable, List
+
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+READ_CACHE_ENABLED = os.getenv("READ_CACHE_ENABLED", "true").lower() == "true"
+READ_CACHE_TTL = float(os.getenv("READ_CACHE_TTL", "2"))
+READ_CACHE_STALE = float(os.getenv("READ_CACHE_STALE", "30"))
+READ_CACHE_MAX_WAIT = float(os.getenv("READ_CACHE_MAX_WAIT", "2"))
+READ_CACHE_SIZE = int(os.getenv("READ_CACHE_SIZE", "1000"))
+
+_refresher = ThreadPoolExecutor(max_workers=4, thread_name_prefix="read-cache")
+
+
+class _Entry:
+    __slots__ = ("value", "stored_at")
+
+    def __init__(self, value, stored_at: float):
+        self.value = value
+        self.stored_at = stored_at
+
+
+class ReadCache:
+    def __init__(self, name: str, ttl: float = READ_CACHE_TTL, stale: float = READ_CACHE_STALE,
+                 max_entries: int = READ_CACHE_SIZE, max_wait: float = READ_CACHE_MAX_WAIT):
+        self.name = name
+        self.ttl = ttl
+        self.stale = stale
+        self.max_entries = max_entries
+        self.max_wait = max_wait
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._inflight: Dict[Hashable, Future] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, compute: Callable[[Session], Any], db: Session) -> Any:
+        """Cached `compute(db)`; the returned value is shared, callers must not mutate it."""
+        if not READ_CACHE_ENABLED or not db.info.get("use_replica"):
+            return compute(db)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = time.monotonic() - entry.stored_at
+                if age < self.ttl:
+                    self._entries.move_to_end(key)
+                    record_cache(self.name, True)
+                    return entry.value
+                if age < self.ttl + self.stale:
+                    if key not in self._inflight:
+                        future = self._inflight[key] = Future()
+                        _refresher.submit(self._refresh, key, compute, future, self._generation)
+                    record_cache(self.name, True)
+                    return entry.value
+                del self._entries[key]
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+                generation = self._generation
+        record_cache(self.name, not leader)
+        if not leader:
+            try:
+                return future.result(timeout=self.max_wait)
+            except FutureTimeout:
+                return compute(db)
+        return self._run(key, compute, db, future, generation)
+
+    def _run(self, key, compute, db, future: Future, generation: int):
+        try:
+            value = compute(db)
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._inflight.pop(key, None)
+            if generation == self._generation:
+                self._entries[key] = _Entry(value, time.monotonic())
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        future.set_result(value)
+        return value
+
+    def _refresh(self, key, compute, future: Future, generation: int) -> None:
+        db = SessionLocal()
+        db.info["use_replica"] = True
+        try:
+            self._run(key, compute, db, future, generation)
+        except Exception as e:
+            # Keep serving the stale value; the next request past the TTL retries
+            logger.warning("Background refresh of %s %r failed: %s", self.name, key, e)
+        finally:
+            db.close()
+
+    def discard(self, *keys: Hashable) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+            self._generation += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+
+# ===== Shared caches =====
+article_cache = ReadCache("article")        # ("id", id) / ("slug", slug) -> (id, EncodedBody)
+related_cache = ReadCache("related")        # article_id -> EncodedBody
+taxonomy_cache = ReadCache("taxonomy")      # "tags" / "categories" / "categories-all" -> EncodedBody
+
+CACHES: List[ReadCache] = [article_cache, related_cache, taxonomy_cache]
+
+
+def article_changed(article_id: int = None, *slugs: str) -> None:
+    """After an article write: its detail entries, and every related list (it may appear in any)."""
+    if article_id is None:
+        article_cache.clear()
+    else:
+        article_cache.discard(("id", article_id), *(("slug", slug) for slug in slugs if slug))
+    related_cache.clear()
+
+
+def taxonomy_changed() -> None:
+    """Tag/category writes change the listings and the names embedded in articles."""
+    for cache in CACHES:
+        cache.clear()
+
+
+def clear_all() -> None:
+    for cache in CACHES:
+        cache.clear()
@@ -2,25 +2,34 @@ import math
 import re
 import shutil
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, List, Optional
 
 import bleach
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File, Query, Request
+from fastapi.responses import ORJSONResponse
 from slugify import slugify
-from sqlalchemy import func
-from sqlalchemy.orm import Session, joinedload
-
-from . import models, schemas
-from .database import get_db
+from sqlalchemy import delete, func, insert, inspect, literal, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload, load_only
+
+from . import duplicates, image_markup, media_gc, models, schemas, semantic, serializers, snapshots, trending
+from .read_cache import article_cache, article_changed, related_cache, taxonomy_cache, taxonomy_changed
+from .compression import EncodedBody
+from .database import get_db, get_read_db
 from .image_utils import process_image, delete_image_files
-from .search import index_article, search_articles, delete_article_index, reindex_all
+from .scheduler import apply_schedule, publish_scheduler
+from .search import (
+    index_article, search_articles_scored, delete_article_index, reindex_all,
+    rename_category_in_index, clear_category_in_index, rename_tag_in_index, merge_tags_in_index,
+)
 
 router = APIRouter(prefix="/api/articles", tags=["articles"])
 category_router = APIRouter(prefix="/api/categories", tags=["categories"])
+tag_router = APIRouter(prefix="/api/tags", tags=["tags"])
 media_router = APIRouter(prefix="/api/media", tags=["media"])
 
 UPLOAD_DIR = Path("uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
+MAX_BATCH_IDS = 100
 
 # ===== HTML Sanitization =====
 ALLOWED_TAGS = [
@@ -57,35 +66,113 @@ def calculate_reading_time(content: str) -> int:
     return max(1, math.ceil(minutes))
 
 # ===== Slug Generation =====
-def generate_unique_slug(db: Session, title: str, exclude_id: int = None) -> str:
-    base_slug = slugify(title, allow_unicode=True)
-    if not base_slug:
-        base_slug = "article"
-    slug = base_slug
+SLUG_RETRY_ATTEMPTS = 3
+
+
+def base_slug_for(text: str, fallback: str) -> str:
+    return slugify(text, allow_unicode=True) or fallback
+
+
+def slug_family(model, base_slug: str):
+    """SQL condition matching `base_slug` itself and every `base_slug-N` variant."""
+    escaped = base_slug.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return or_(model.slug == base_slug, model.slug.like(f"{escaped}-%", escape="\\"))
+
+
+def taken_slugs(db: Session, model, base_slug: str, exclude_id: int = None) -> set:
+    """Fetch every slug equal to `base_slug` or shaped like `base_slug-N` in one query."""
+    query = db.query(model.slug).filter(slug_family(model, base_slug))
+    if exclude_id:
+        query = query.filter(model.id != exclude_id)
+    return {row[0] for row in query}
+
+
+def next_free_slug(base_slug: str, taken: set) -> str:
+    """Return `base_slug`, or the lowest `base_slug-N` suffix not in `taken`."""
+    if base_slug not in taken:
+        return base_slug
+    prefix = f"{base_slug}-"
+    used = {
+        int(s[len(prefix):]) for s in taken
+        if s.startswith(prefix) and s[len(prefix):].isdigit()
+    }
     counter = 1
-    while True:
-        query = db.query(models.Article).filter(models.Article.slug == slug)
-        if exclude_id:
-            query = query.filter(models.Article.id != exclude_id)
-        if not query.first():
-            return slug
-        slug = f"{base_slug}-{counter}"
+    while counter in used:
         counter += 1
+    return f"{prefix}{counter}"
+
+
+def allocate_slug(db: Session, model, text: str, fallback: str, exclude_id: int = None) -> str:
+    base_slug = base_slug_for(text, fallback)
+    return next_free_slug(base_slug, taken_slugs(db, model, base_slug, exclude_id))
+
+
+def allocate_slugs(db: Session, model, texts: List[str], fallback: str) -> List[str]:
+    """Allocate distinct slugs for a batch of new rows with one query for all bases."""
+    base_slugs = [base_slug_for(text, fallback) for text in texts]
+    taken = set()
+    distinct = list(dict.fromkeys(base_slugs))
+    if distinct:
+        conditions = [slug_family(model, base_slug) for base_slug in distinct]
+        taken = {row[0] for row in db.query(model.slug).filter(or_(*conditions))}
+    slugs = []
+    for base_slug in base_slugs:
+        slug = next_free_slug(base_slug, taken)
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+def generate_unique_slug(db: Session, title: str, exclude_id: int = None) -> str:
+    return allocate_slug(db, models.Article, title, "article", exclude_id)
+
+
+def commit_with_slug_retry(db: Session, stage: Callable[[], None]) -> None:
+    """Stage changes (including slug allocation) and commit, retrying on unique violations.
+
+    Another request may take the same slug between allocation and commit; the
+    unique index rejects the loser, which re-runs `stage` against fresh data.
+    `stage` must be re-entrant because a rollback discards everything it did.
+    """
+    for attempt in range(SLUG_RETRY_ATTEMPTS):
+        try:
+            stage()
+            db.commit()
+            return
+        except IntegrityError:
+            db.rollback()
+    raise HTTPException(status_code=409, detail="Slug or name conflicts with an existing record")
 
 # ===== Helper Functions =====
-def get_or_create_tags(db: Session, tag_names: List[str]):
-    tags = []
-    for name in tag_names:
-        name = name.strip()
-        if not name:
-            continue
-        tag = db.query(models.Tag).filter(models.Tag.name == name).first()
-        if not tag:
-            tag = models.Tag(name=name)
-            db.add(tag)
-        tags.append(tag)
+def resolve_tags(db: Session, tag_names: List[str]) -> dict:
+    """Map tag names to Tag rows with one lookup query, staging any missing tags."""
+    names = list(dict.fromkeys(n.strip() for n in tag_names if n and n.strip()))
+    if not names:
+        return {}
+    tags = {t.name: t for t in db.query(models.Tag).filter(models.Tag.name.in_(names))}
+    for name in names:
+        if name not in tags:
+            tags[name] = models.Tag(name=name)
+            db.add(tags[name])
     return tags
 
+def pick_tags(tags: dict, tag_names: List[str]):
+    """Return the Tag rows for `tag_names` from a `resolve_tags` map, deduplicated in order."""
+    return [tags[name] for name in dict.fromkeys(n.strip() for n in tag_names if n and n.strip())]
+
+def get_or_create_tags(db: Session, tag_names: List[str]):
+    return pick_tags(resolve_tags(db, tag_names), tag_names)
+
+def record_view(db: Session, article_id: int) -> None:
+    """Increment view_count in SQL without bumping updated_at (feeds and sitemaps key on it)."""
+    db.query(models.Article).filter(models.Article.id == article_id).update(
+        {models.Article.view_count: models.Article.view_count + 1,
+         models.Article.updated_at: models.Article.updated_at},
+        synchronize_session=False,
+    )
+    db.commit()
+    trending.tracker.record(article_id)
+
 def get_article_query(db: Session):
     return db.query(models.Article).options(
         joinedload(models.Article.category_rel),
@@ -93,30 +180,92 @@ def get_article_query(db: Session):
         joinedload(models.Article.images),
     )
 
+# fields= names backed by a relationship, or by a column with a different name
+FIELD_RELATIONSHIPS = {
+    "category": models.Article.category_rel,
+    "tags": models.Article.tags,
+    "images": models.Article.images,
+}
+FIELD_COLUMNS = {"category": "category_id", "cover_image": "content", "tags": None, "images": None}
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """`id,slug,title` -> ["id", "slug", "title"]; None keeps the full list item."""
+    if fields is None:
+        return None
+    names = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [n for n in names if n not in serializers.LIST_FIELDS]
+    if not names or unknown:
+        raise HTTPException(status_code=422,
+                            detail=f"Unknown fields: {unknown}; choose from {list(serializers.LIST_FIELDS)}")
+    return names
+
+def list_query(db: Session, fields: Optional[List[str]] = None):
+    """Article query that loads only the columns and relationships `fields` serialize."""
+    if fields is None:
+        return get_article_query(db)
+    columns = [FIELD_COLUMNS.get(n, n) for n in fields]
+    options = [load_only(*(getattr(models.Article, c) for c in dict.fromkeys(["id", *filter(None, columns)])))]
+    options += [joinedload(FIELD_RELATIONSHIPS[n]) for n in fields if n in FIELD_RELATIONSHIPS]
+    return db.query(models.Article).options(*options)
+
+def reload_article(db: Session, article_id: int):
+    """Reload a just-committed article with its relationships in one query.
+
+    `db.refresh` only reloads columns, so the serializer would then lazy-load
+    category, tags and images with one query each.
+    """
+    return get_article_query(db).populate_existing().filter(models.Article.id == article_id).one()
+
+def articles_in_order(db: Session, article_ids: List[int], published_only: bool = False,
+                      fields: Optional[List[str]] = None):
+    """Load articles by id, keeping the ranking order of `article_ids`."""
+    query = list_query(db, fields).filter(models.Article.id.in_(article_ids))
+    if published_only:
+        query = query.filter(models.Article.is_published == True)
+    by_id = {a.id: a for a in query.all()}
+    return [by_id[i] for i in article_ids if i in by_id]
+
+def semantic_item(article) -> tuple:
+    return article.id, semantic.article_text(article.title, article.summary, article.content)
+
 # ===== Article CRUD =====
-@router.post("/", response_model=schemas.ArticleResponse, status_code=201)
-def create_article(article: schemas.ArticleCreate, db: Session = Depends(get_db)):
+@router.post("/", response_model=schemas.ArticleWriteResponse, status_code=201)
+def create_article(article: schemas.ArticleCreate, background_tasks: BackgroundTasks,
+                   db: Session = Depends(get_db)):
     article_data = article.model_dump(exclude={'tag_names'})
-    article_data['content'] = sanitize_html(article_data['content'])
+    article_data['content'] = image_markup.decorate_content(db, sanitize_html(article_data['content']))
     article_data['reading_time'] = calculate_reading_time(article_data['content'])
+    scheduled = apply_schedule(article_data)
 
     db_article = models.Article(**article_data)
-    db_article.slug = generate_unique_slug(db, article_data['title'])
 
-    if article.tag_names:
-        db_article.tags = get_or_create_tags(db, article.tag_names)
+    def stage():
+        db_article.slug = generate_unique_slug(db, article_data['title'])
+        if article.tag_names:
+            db_article.tags = get_or_create_tags(db, article.tag_names)
+        db.add(db_article)
 
-    db.add(db_article)
-    db.commit()
-    db.refresh(db_article)
+    commit_with_slug_retry(db, stage)
+    db_article = reload_article(db, inspect(db_article).identity[0])
 
     # Index to Elasticsearch
     tag_names = [t.name for t in db_article.tags]
     cat_name = db_article.category_rel.name if db_article.category_rel else ""
     index_article(db_article.id, db_article.title, db_article.content,
-                  db_article.author, cat_name, tag_names, db_article.slug)
+                  db_article.author, cat_name, tag_names, db_article.slug,
+                  db_article.category_id, [t.id for t in db_article.tags])
+    background_tasks.add_task(semantic.index_articles, [semantic_item(db_article)])
+    background_tasks.add_task(snapshots.refresh_article, db_article.id)
+    article_changed(db_article.id, db_article.slug)
+    if article.tag_names:
+        taxonomy_cache.discard("tags")
+    if scheduled:
+        publish_scheduler.notify()
 
-    return db_article
+    data = serializers.article_dict(db_article)
+    data["near_duplicates"] = duplicates.check_article(
+        db, db_article.id, db_article.title, db_article.content, new=True)
+    return ORJSONResponse(data, status_code=201)
 
 @router.get("/", response_model=List[schemas.ArticleListResponse])
 def get_articles(
@@ -127,9 +276,11 @@ def get_articles(
     tag: Optional[str] = None,
     published_only: bool = False,
     featured_only: bool = False,
-    db: Session = Depends(get_db)
+    fields: Optional[str] = None,
+    db: Session = Depends(get_read_db)
 ):
-    query = get_article_query(db)
+    fields = parse_fields(fields)
+    query = list_query(db, fields)
 
     if published_only:
         query = query.filter(models.Article.is_published == True)
@@ -143,15 +294,72 @@ def get_articles(
         query = query.join(models.Article.tags).filter(models.Tag.name == tag)
 
     articles = query.order_by(models.Article.created_at.desc()).offset(skip).limit(limit).all()
-    return articles
+    return ORJSONResponse(serializers.article_list(articles, fields))
+
+@router.get("/batch", response_model=List[schemas.ArticleListResponse])
+def get_articles_batch(
+    ids: str = Query(..., pattern=r"^\d{1,10}(,\d{1,10})*$"),
+    fields: Optional[str] = None,
+    published_only: bool = False,
+    db: Session = Depends(get_read_db),
+):
+    """Up to MAX_BATCH_IDS articles in one query, in the order of `ids` (e.g. 3,1,2); unknown ids are skipped."""
+    article_ids = list(dict.fromkeys(int(i) for i in ids.split(",")))
+    if len(article_ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=422, detail=f"At most {MAX_BATCH_IDS} ids per batch")
+    fields = parse_fields(fields)
+    articles = articles_in_order(db, article_ids, published_only, fields)
+    return ORJSONResponse(serializers.article_list(articles, fields))
 
 @router.get("/search/query", response_model=List[schemas.ArticleListResponse])
-def search(q: str = Query(..., min_length=1), db: Session = Depends(get_db)):
-    article_ids = search_articles(q)
+def search(
+    q: str = Query(..., min_length=1),
+    mode: str = Query("hybrid", pattern="^(keyword|semantic|hybrid)$"),
+    fields: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+):
+    """keyword: Elasticsearch only; semantic: local vector index only; hybrid: ES scores blended with cosine."""
+    if mode == "semantic":
+        article_ids = [article_id for article_id, _ in semantic.semantic_index.search(q)]
+    elif mode == "hybrid":
+        article_ids = semantic.blend(search_articles_scored(q), q)
+    else:
+        article_ids = [article_id for article_id, _ in search_articles_scored(q)]
+    fields = parse_fields(fields)
+    if not article_ids:
+        return []
+    return ORJSONResponse(serializers.article_list(articles_in_order(db, article_ids, fields=fields), fields))
+
+@router.get("/trending", response_model=List[schemas.ArticleListResponse])
+def get_trending(limit: int = Query(10, ge=1, le=50), fields: Optional[str] = None,
+                 db: Session = Depends(get_read_db)):
+    """Published articles by exponentially decayed views (TRENDING_HALF_LIFE_HOURS)."""
+    fields = parse_fields(fields)
+    trending.tracker.ensure_loaded(db)
+    # Over-fetch: drafts and deleted articles drop out below
+    article_ids = trending.tracker.top(limit * 2)
     if not article_ids:
         return []
-    articles = get_article_query(db).filter(models.Article.id.in_(article_ids)).all()
-    return articles
+    articles = articles_in_order(db, article_ids, published_only=True, fields=fields)[:limit]
+    return ORJSONResponse(serializers.article_list(articles, fields))
+
+@router.get("/popular", response_model=List[schemas.ArticleListResponse])
+def get_popular(
+    window: str = Query("7d", pattern=r"^\d{1,3}d$"),
+    limit: int = Query(10, ge=1, le=50),
+    fields: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+):
+    """Published articles by total views over the last `window` days (e.g. 1d, 7d, 30d)."""
+    fields = parse_fields(fields)
+    days = trending.parse_window(window)
+    if not 1 <= days <= trending.VIEW_ROLLUP_RETENTION_DAYS:
+        raise HTTPException(status_code=422, detail=f"window must be 1d-{trending.VIEW_ROLLUP_RETENTION_DAYS}d")
+    article_ids = trending.tracker.popular(db, days, limit * 2)
+    if not article_ids:
+        return []
+    articles = articles_in_order(db, article_ids, published_only=True, fields=fields)[:limit]
+    return ORJSONResponse(serializers.article_list(articles, fields))
 
 @router.get("/stats/dashboard", response_model=schemas.StatsResponse)
 def get_stats(db: Session = Depends(get_db)):
@@ -172,45 +380,61 @@ def get_stats(db: Session = Depends(get_db)):
         "draft_articles": drafts,
         "total_tags": total_tags,
         "total_categories": total_categories,
-        "categories": category_list
+        "categories": category_list,
+        "daily_views": trending.daily_views(db),
     }
 
 @router.get("/tags/all", response_model=List[schemas.TagResponse])
-def get_all_tags(db: Session = Depends(get_db)):
-    return db.query(models.Tag).all()
+def get_all_tags(request: Request, db: Session = Depends(get_read_db)):
+    tags = taxonomy_cache.get(
+        "tags", lambda s: EncodedBody.json([serializers.tag_dict(t) for t in s.query(models.Tag).all()]), db)
+    return tags.response(request)
 
 @router.get("/categories/all")
-def get_all_categories(db: Session = Depends(get_db)):
-    categories = db.query(models.Category).all()
-    return [{"id": c.id, "name": c.name, "slug": c.slug, "color": c.color} for c in categories]
+def get_all_categories(request: Request, db: Session = Depends(get_read_db)):
+    def load(s: Session):
+        return EncodedBody.json([{"id": c.id, "name": c.name, "slug": c.slug, "color": c.color}
+                                 for c in s.query(models.Category).all()])
+    return taxonomy_cache.get("categories-all", load, db).response(request)
 
 @router.post("/management/reindex")
 def reindex_articles(db: Session = Depends(get_db)):
     articles = get_article_query(db).all()
     reindex_all(articles)
+    if semantic.SEMANTIC_ENABLED:
+        semantic.semantic_index.rebuild(semantic_item(a) for a in articles)
     return {"message": f"Successfully reindexed {len(articles)} articles"}
 
-@router.get("/by-slug/{slug}", response_model=schemas.ArticleResponse)
-def get_article_by_slug(slug: str, db: Session = Depends(get_db)):
-    article = get_article_query(db).filter(models.Article.slug == slug).first()
+def load_article_body(db: Session, *criteria) -> tuple:
+    """(article id, encoded ArticleResponse) for the article detail cache."""
+    article = get_article_query(db).filter(*criteria).first()
     if not article:
         raise HTTPException(status_code=404, detail="Article not found")
-    article.view_count += 1
-    db.commit()
-    return article
+    data = serializers.article_dict(article)
+    # Includes the view being served; cache hits reuse it, so view_count may trail by up to the TTL
+    data["view_count"] += 1
+    return article.id, EncodedBody.json(data)
+
+@router.get("/by-slug/{slug}", response_model=schemas.ArticleResponse)
+def get_article_by_slug(slug: str, request: Request, db: Session = Depends(get_read_db)):
+    article_id, body = article_cache.get(
+        ("slug", slug), lambda s: load_article_body(s, models.Article.slug == slug), db)
+    record_view(db, article_id)
+    return body.response(request)
 
 @router.get("/{article_id}", response_model=schemas.ArticleResponse)
-def get_article(article_id: int, db: Session = Depends(get_db)):
-    article = get_article_query(db).filter(models.Article.id == article_id).first()
-    if not article:
-        raise HTTPException(status_code=404, detail="Article not found")
-    article.view_count += 1
-    db.commit()
-    return article
+def get_article(article_id: int, request: Request, db: Session = Depends(get_read_db)):
+    article_id, body = article_cache.get(
+        ("id", article_id), lambda s: load_article_body(s, models.Article.id == article_id), db)
+    record_view(db, article_id)
+    return body.response(request)
 
 @router.get("/{article_id}/related", response_model=List[schemas.ArticleListResponse])
-def get_related_articles(article_id: int, db: Session = Depends(get_db)):
+def get_related_articles(article_id: int, request: Request, db: Session = Depends(get_read_db)):
     """Get related articles based on same category and shared tags."""
+    return related_cache.get(article_id, lambda s: load_related(s, article_id), db).response(request)
+
+def load_related(db: Session, article_id: int) -> EncodedBody:
     article = db.query(models.Article).options(
         joinedload(models.Article.tags)
     ).filter(models.Article.id == article_id).first()
@@ -236,47 +460,85 @@ def get_related_articles(article_id: int, db: Session = Depends(get_db)):
         )
 
     results = candidates.order_by(models.Article.created_at.desc()).limit(3).all()
-    return results
+    return EncodedBody.json(serializers.article_list(results))
+
+@router.get("/{article_id}/similar", response_model=List[schemas.ArticleListResponse])
+def get_similar_articles(article_id: int, limit: int = Query(5, ge=1, le=50), fields: Optional[str] = None,
+                         db: Session = Depends(get_read_db)):
+    """Published articles closest to this one by content, from the local semantic index."""
+    fields = parse_fields(fields)
+    if not db.query(models.Article.id).filter(models.Article.id == article_id).first():
+        raise HTTPException(status_code=404, detail="Article not found")
+    # Over-fetch: drafts are indexed too and get filtered out here
+    neighbours = semantic.semantic_index.similar(article_id, limit * 3)
+    if not neighbours:
+        return []
+    articles = articles_in_order(db, [i for i, _ in neighbours], published_only=True, fields=fields)
+    return ORJSONResponse(serializers.article_list(articles[:limit], fields))
 
-@router.put("/{article_id}", response_model=schemas.ArticleResponse)
-def update_article(article_id: int, article: schemas.ArticleUpdate, db: Session = Depends(get_db)):
+@router.put("/{article_id}", response_model=schemas.ArticleWriteResponse)
+def update_article(article_id: int, article: schemas.ArticleUpdate, background_tasks: BackgroundTasks,
+                   db: Session = Depends(get_db)):
     db_article = get_article_query(db).filter(models.Article.id == article_id).first()
     if not db_article:
         raise HTTPException(status_code=404, detail="Article not found")
+    old_slug = db_article.slug
+    old_scopes = snapshots.scopes_of([t.id for t in db_article.tags], db_article.category_id)
+    was_published = db_article.is_published
 
     update_data = article.model_dump(exclude_unset=True, exclude={'tag_names'})
 
     if 'content' in update_data:
-        update_data['content'] = sanitize_html(update_data['content'])
+        update_data['content'] = image_markup.decorate_content(db, sanitize_html(update_data['content']))
         update_data['reading_time'] = calculate_reading_time(update_data['content'])
+    scheduled = apply_schedule(update_data)
 
-    if 'title' in update_data:
-        update_data['slug'] = generate_unique_slug(db, update_data['title'], exclude_id=article_id)
+    def stage():
+        for key, value in update_data.items():
+            setattr(db_article, key, value)
+        if 'title' in update_data:
+            db_article.slug = generate_unique_slug(db, update_data['title'], exclude_id=article_id)
+        if article.tag_names is not None:
+            db_article.tags = get_or_create_tags(db, article.tag_names)
 
-    for key, value in update_data.items():
-        setattr(db_article, key, value)
-
-    if article.tag_names is not None:
-        db_article.tags = get_or_create_tags(db, article.tag_names)
-
-    db.commit()
-    db.refresh(db_article)
+    commit_with_slug_retry(db, stage)
+    db_article = reload_article(db, article_id)
 
     tag_names = [t.name for t in db_article.tags]
     cat_name = db_article.category_rel.name if db_article.category_rel else ""
     index_article(db_article.id, db_article.title, db_article.content,
-                  db_article.author, cat_name, tag_names, db_article.slug)
+                  db_article.author, cat_name, tag_names, db_article.slug,
+                  db_article.category_id, [t.id for t in db_article.tags])
+    if {'title', 'summary', 'content'} & update_data.keys():
+        background_tasks.add_task(semantic.index_articles, [semantic_item(db_article)])
+    background_tasks.add_task(snapshots.refresh_article, article_id, old_slug, old_scopes, was_published)
+    article_changed(article_id, old_slug, db_article.slug)
+    if article.tag_names is not None:
+        taxonomy_cache.discard("tags")
+    if scheduled:
+        publish_scheduler.notify()
 
-    return db_article
+    data = serializers.article_dict(db_article)
+    data["near_duplicates"] = None
+    if {'title', 'content'} & update_data.keys():
+        data["near_duplicates"] = duplicates.check_article(db, article_id, db_article.title, db_article.content)
+    return ORJSONResponse(data)
 
 @router.delete("/{article_id}")
-def delete_article(article_id: int, db: Session = Depends(get_db)):
+def delete_article(article_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     db_article = db.query(models.Article).filter(models.Article.id == article_id).first()
     if not db_article:
         raise HTTPException(status_code=404, detail="Article not found")
+    slug = db_article.slug
+    old_scopes = snapshots.scopes_of([t.id for t in db_article.tags], db_article.category_id)
+    # SQLite ignores ON DELETE CASCADE without the foreign_keys pragma
+    duplicates.forget(db, [article_id])
     db.delete(db_article)
     db.commit()
     delete_article_index(article_id)
+    background_tasks.add_task(semantic.remove_article, article_id)
+    background_tasks.add_task(snapshots.remove_article, slug, old_scopes)
+    article_changed(article_id, slug)
     return {"message": "Article deleted successfully"}
 
 # ===== Image Upload (article-bound) =====
@@ -309,66 +571,146 @@ async def upload_image(
         width=result["width"],
         height=result["height"],
         file_size=result["file_size"],
+        placeholder=result["placeholder"],
+        dominant_color=result["dominant_color"],
     )
     db.add(db_image)
     db.commit()
     db.refresh(db_image)
+    article_changed(article_id, article.slug)
     return db_image
 
 # ===== Category CRUD =====
 @category_router.get("/", response_model=List[schemas.CategoryResponse])
-def get_categories(db: Session = Depends(get_db)):
-    return db.query(models.Category).all()
+def get_categories(request: Request, db: Session = Depends(get_read_db)):
+    def load(s: Session):
+        return EncodedBody.json([serializers.category_dict(c) for c in s.query(models.Category).all()])
+    return taxonomy_cache.get("categories", load, db).response(request)
 
 @category_router.post("/", response_model=schemas.CategoryResponse, status_code=201)
-def create_category(category: schemas.CategoryCreate, db: Session = Depends(get_db)):
-    cat_slug = slugify(category.name, allow_unicode=True)
-    if not cat_slug:
-        cat_slug = "category"
-    # Ensure unique slug
-    base_slug = cat_slug
-    counter = 1
-    while db.query(models.Category).filter(models.Category.slug == cat_slug).first():
-        cat_slug = f"{base_slug}-{counter}"
-        counter += 1
-
+def create_category(category: schemas.CategoryCreate, background_tasks: BackgroundTasks,
+                    db: Session = Depends(get_db)):
     db_cat = models.Category(
         name=category.name,
-        slug=cat_slug,
         description=category.description,
         color=category.color,
     )
-    db.add(db_cat)
-    db.commit()
+
+    def stage():
+        db_cat.slug = allocate_slug(db, models.Category, category.name, "category")
+        db.add(db_cat)
+
+    commit_with_slug_retry(db, stage)
     db.refresh(db_cat)
+    taxonomy_changed()
+    background_tasks.add_task(snapshots.refresh_taxonomy)
     return db_cat
 
 @category_router.put("/{category_id}", response_model=schemas.CategoryResponse)
-def update_category(category_id: int, category: schemas.CategoryUpdate, db: Session = Depends(get_db)):
+def update_category(category_id: int, category: schemas.CategoryUpdate, background_tasks: BackgroundTasks,
+                    db: Session = Depends(get_db)):
     db_cat = db.query(models.Category).filter(models.Category.id == category_id).first()
     if not db_cat:
         raise HTTPException(status_code=404, detail="Category not found")
 
     update_data = category.model_dump(exclude_unset=True)
-    if 'name' in update_data:
-        db_cat.slug = slugify(update_data['name'], allow_unicode=True) or "category"
 
-    for key, value in update_data.items():
-        setattr(db_cat, key, value)
+    def stage():
+        for key, value in update_data.items():
+            setattr(db_cat, key, value)
+        if update_data.get('name'):
+            db_cat.slug = allocate_slug(db, models.Category, update_data['name'], "category",
+                                        exclude_id=category_id)
 
-    db.commit()
+    renamed = bool(update_data.get('name')) and update_data['name'] != db_cat.name
+    commit_with_slug_retry(db, stage)
     db.refresh(db_cat)
+    taxonomy_changed()
+    if renamed:
+        background_tasks.add_task(rename_category_in_index, category_id, db_cat.name)
+    background_tasks.add_task(snapshots.refresh_category, category_id)
     return db_cat
 
 @category_router.delete("/{category_id}")
-def delete_category(category_id: int, db: Session = Depends(get_db)):
+def delete_category(category_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     db_cat = db.query(models.Category).filter(models.Category.id == category_id).first()
     if not db_cat:
         raise HTTPException(status_code=404, detail="Category not found")
+    article_ids = [row[0] for row in db.query(models.Article.id).filter(models.Article.category_id == category_id)]
     db.delete(db_cat)
     db.commit()
+    taxonomy_changed()
+    background_tasks.add_task(clear_category_in_index, category_id)
+    background_tasks.add_task(snapshots.refresh_category, category_id, article_ids, True)
     return {"message": "Category deleted successfully"}
 
+# ===== Tag rename / merge =====
+def tagged_article_ids(db: Session, tag_ids: List[int]) -> List[int]:
+    return [row[0] for row in db.query(models.article_tags.c.article_id)
+            .filter(models.article_tags.c.tag_id.in_(tag_ids)).distinct()]
+
+@tag_router.put("/{tag_id}", response_model=schemas.TagResponse)
+def update_tag(tag_id: int, tag: schemas.TagUpdate, background_tasks: BackgroundTasks,
+               db: Session = Depends(get_db)):
+    db_tag = db.query(models.Tag).filter(models.Tag.id == tag_id).first()
+    if not db_tag:
+        raise HTTPException(status_code=404, detail="Tag not found")
+    update_data = tag.model_dump(exclude_unset=True)
+    new_name = (update_data.get('name') or '').strip()
+    renamed = bool(new_name) and new_name != db_tag.name
+    if renamed:
+        clash = db.query(models.Tag.id).filter(models.Tag.name == new_name, models.Tag.id != tag_id).first()
+        if clash:
+            raise HTTPException(status_code=409, detail=f"Tag '{new_name}' already exists; merge instead")
+        update_data['name'] = new_name
+    elif 'name' in update_data:
+        del update_data['name']
+    for key, value in update_data.items():
+        setattr(db_tag, key, value)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=f"Tag '{new_name}' already exists; merge instead")
+    db.refresh(db_tag)
+    taxonomy_changed()
+    if renamed:
+        background_tasks.add_task(rename_tag_in_index, tag_id, db_tag.name)
+        background_tasks.add_task(snapshots.refresh_tags, tagged_article_ids(db, [tag_id]))
+    return db_tag
+
+@tag_router.post("/merge", response_model=schemas.TagMergeResponse)
+def merge_tags(merge: schemas.TagMerge, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    """Fold the source tags into the target: set-based rewrites of article_tags, then drop the sources."""
+    source_ids = sorted(set(merge.source_ids) - {merge.target_id})
+    if not source_ids:
+        raise HTTPException(status_code=400, detail="No source tags to merge")
+    target = db.query(models.Tag).filter(models.Tag.id == merge.target_id).first()
+    if not target:
+        raise HTTPException(status_code=404, detail="Target tag not found")
+    found = {row[0] for row in db.query(models.Tag.id).filter(models.Tag.id.in_(source_ids))}
+    if len(found) != len(source_ids):
+        missing = sorted(set(source_ids) - found)
+        raise HTTPException(status_code=404, detail=f"Tags not found: {missing}")
+
+    links = models.article_tags
+    article_ids = tagged_article_ids(db, source_ids)
+    already_tagged = select(links.c.article_id).where(links.c.tag_id == merge.target_id)
+    db.execute(insert(links).from_select(
+        ["article_id", "tag_id"],
+        select(links.c.article_id, literal(merge.target_id)).where(
+            links.c.tag_id.in_(source_ids), links.c.article_id.notin_(already_tagged)
+        ).distinct(),
+    ))
+    db.execute(delete(links).where(links.c.tag_id.in_(source_ids)))
+    db.execute(delete(models.Tag).where(models.Tag.id.in_(source_ids)))
+    db.commit()
+    taxonomy_changed()
+
+    background_tasks.add_task(merge_tags_in_index, source_ids, target.id, target.name)
+    background_tasks.add_task(snapshots.refresh_tags, article_ids, source_ids)
+    return {"target_id": target.id, "merged_tag_ids": source_ids, "articles_updated": len(article_ids)}
+
 # ===== Media Library =====
 @media_router.post("/upload", response_model=schemas.ImageResponse)
 async def upload_media(
@@ -392,6 +734,8 @@ async def upload_media(
         width=result["width"],
         height=result["height"],
         file_size=result["file_size"],
+        placeholder=result["placeholder"],
+        dominant_color=result["dominant_color"],
     )
     db.add(db_image)
     db.commit()
@@ -399,11 +743,16 @@ async def upload_media(
     return db_image
 
 @media_router.get("/", response_model=List[schemas.ImageResponse])
-def get_media(skip: int = 0, limit: int = 50, db: Session = Depends(get_db)):
+def get_media(skip: int = 0, limit: int = 50, db: Session = Depends(get_read_db)):
     return db.query(models.Image).order_by(models.Image.uploaded_at.desc()).offset(skip).limit(limit).all()
 
+@media_router.get("/storage")
+def get_media_storage(db: Session = Depends(get_read_db)):
+    """Disk usage per variant, image rows attached vs not, and what media_gc would reclaim (cached)."""
+    return media_gc.usage(db)
+
 @media_router.get("/{image_id}", response_model=schemas.ImageResponse)
-def get_media_item(image_id: int, db: Session = Depends(get_db)):
+def get_media_item(image_id: int, db: Session = Depends(get_read_db)):
     image = db.query(models.Image).filter(models.Image.id == image_id).first()
     if not image:
         raise HTTPException(status_code=404, detail="Image not found")
@@ -414,7 +763,11 @@ def delete_media(image_id: int, db: Session = Depends(get_db)):
     image = db.query(models.Image).filter(models.Image.id == image_id).first()
     if not image:
         raise HTTPException(status_code=404, detail="Image not found")
+    article_id = image.article_id
     delete_image_files(image)
     db.delete(image)
     db.commit()
+    if article_id:
+        article_changed()
+    media_gc.invalidate_usage()
     return {"message": "Image deleted successfully"}
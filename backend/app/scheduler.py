@@ -0,0 +1,149 @@
+"""Scheduled publishing.
+
+A draft with ``publish_at`` goes live at that time. Each worker runs one
+asyncio task that sleeps until the earliest pending ``publish_at`` (one
+indexed MIN query) and is woken early when an article is scheduled through
+this worker. Workers race on a conditional UPDATE, so an article is
+published, indexed and snapshotted exactly once.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+from . import models, snapshots
+from .database import SessionLocal
+from .read_cache import article_changed
+from .search import bulk_index_articles
+
+logger = logging.getLogger(__name__)
+
+PUBLISH_SCHEDULER_ENABLED = os.getenv("PUBLISH_SCHEDULER_ENABLED", "true").lower() == "true"
+# Upper bound on a sleep, so articles scheduled through another worker are picked up
+# even if that worker dies before its own deadline
+SCHEDULER_MAX_SLEEP = float(os.getenv("SCHEDULER_MAX_SLEEP", "900"))
+SCHEDULER_RETRY_DELAY = 30.0
+
+
+def apply_schedule(data: dict) -> bool:
+    """A future publish_at saves the article as a draft until then. Returns True if it was scheduled.
+
+    A publish_at that has already passed, or publishing by hand, clears the
+    schedule; otherwise the scheduler would publish the draft on its next pass.
+    """
+    publish_at = data.get('publish_at')
+    if publish_at is not None and publish_at > datetime.utcnow():
+        data['is_published'] = False
+        return True
+    if 'publish_at' in data or data.get('is_published'):
+        data['publish_at'] = None
+    return False
+
+
+def pending(db: Session):
+    return db.query(models.Article).filter(
+        models.Article.is_published == False,
+        models.Article.publish_at.isnot(None),
+    )
+
+
+def next_due(db: Session) -> Optional[datetime]:
+    return pending(db).with_entities(func.min(models.Article.publish_at)).scalar()
+
+
+def publish_due(db: Session) -> List[int]:
+    """Publish every draft whose publish_at has passed; returns the ids this call published."""
+    now = datetime.utcnow()
+    due = pending(db).filter(models.Article.publish_at <= now).with_entities(
+        models.Article.id, models.Article.publish_at
+    ).all()
+    published = []
+    for article_id, publish_at in due:
+        # Only the worker whose UPDATE matches wins; a concurrent reschedule changes publish_at
+        won = db.query(models.Article).filter(
+            models.Article.id == article_id,
+            models.Article.is_published == False,
+            models.Article.publish_at == publish_at,
+        ).update({
+            models.Article.is_published: True,
+            # Done with the schedule; unpublishing later must not bring it back
+            models.Article.publish_at: None,
+            # Lists are ordered by created_at; a scheduled post is new as of its publish time
+            models.Article.created_at: publish_at,
+            models.Article.updated_at: now,
+        }, synchronize_session=False)
+        db.commit()
+        if won:
+            published.append(article_id)
+
+    if published:
+        articles = db.query(models.Article).options(
+            joinedload(models.Article.category_rel),
+            selectinload(models.Article.tags),
+        ).filter(models.Article.id.in_(published)).all()
+        bulk_index_articles(articles)
+        article_changed()
+        snapshots.refresh_many(published)
+        logger.info("Published scheduled articles %s", published)
+    return published
+
+
+def run_once() -> Optional[datetime]:
+    """Publish what is due and return when to look next."""
+    db = SessionLocal()
+    try:
+        publish_due(db)
+        return next_due(db)
+    finally:
+        db.close()
+
+
+class PublishScheduler:
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def start(self) -> None:
+        if self._task is None and PUBLISH_SCHEDULER_ENABLED:
+            self._loop = asyncio.get_running_loop()
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = self._wake = self._loop = None
+
+    def notify(self) -> None:
+        """Re-read the next due time now (safe to call from threadpool routes)."""
+        loop, wake = self._loop, self._wake
+        if loop is not None and wake is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(wake.set)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                due = await asyncio.to_thread(run_once)
+                delay = SCHEDULER_MAX_SLEEP
+                if due is not None:
+                    delay = min(delay, max(0.0, (due - datetime.utcnow()).total_seconds()))
+            except Exception as e:
+                logger.error("Publish scheduler error: %s", e)
+                delay = SCHEDULER_RETRY_DELAY
+            try:
+                await asyncio.wait_for(self._wake.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+
+publish_scheduler = PublishScheduler()
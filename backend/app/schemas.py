@@ -1,8 +1,15 @@
 import re
-from pydantic import BaseModel, model_validator
-from datetime import datetime
+from pydantic import BaseModel, field_validator, model_validator
+from datetime import datetime, timezone
 from typing import Optional, List
 
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Timestamps are stored as naive UTC; convert aware inputs."""
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
 # ===== Tag Schemas =====
 class TagBase(BaseModel):
     name: str
@@ -11,6 +18,19 @@ class TagBase(BaseModel):
 class TagCreate(TagBase):
     pass
 
+class TagUpdate(BaseModel):
+    name: Optional[str] = None
+    color: Optional[str] = None
+
+class TagMerge(BaseModel):
+    source_ids: List[int]
+    target_id: int
+
+class TagMergeResponse(BaseModel):
+    target_id: int
+    merged_tag_ids: List[int]
+    articles_updated: int
+
 class TagResponse(TagBase):
     id: int
 
@@ -58,6 +78,8 @@ class ImageResponse(BaseModel):
     width: Optional[int] = None
     height: Optional[int] = None
     file_size: Optional[int] = None
+    placeholder: Optional[str] = None
+    dominant_color: Optional[str] = None
     uploaded_at: datetime
 
     class Config:
@@ -72,10 +94,20 @@ class ArticleBase(BaseModel):
     category_id: Optional[int] = None
     is_published: bool = True
     featured: bool = False
+    # A future time saves the article as a draft that goes live then
+    publish_at: Optional[datetime] = None
+
+    _publish_at_utc = field_validator('publish_at')(naive_utc)
 
 class ArticleCreate(ArticleBase):
     tag_names: List[str] = []
 
+class ArticleImport(ArticleCreate):
+    """One NDJSON line of a bulk import; matches the lines written by the export."""
+    slug: Optional[str] = None
+    category_slug: Optional[str] = None
+    created_at: Optional[datetime] = None
+
 class ArticleUpdate(BaseModel):
     title: Optional[str] = None
     content: Optional[str] = None
@@ -84,8 +116,11 @@ class ArticleUpdate(BaseModel):
     category_id: Optional[int] = None
     is_published: Optional[bool] = None
     featured: Optional[bool] = None
+    publish_at: Optional[datetime] = None
     tag_names: Optional[List[str]] = None
 
+    _publish_at_utc = field_validator('publish_at')(naive_utc)
+
 class ArticleResponse(BaseModel):
     id: int
     title: str
@@ -96,6 +131,7 @@ class ArticleResponse(BaseModel):
     category_id: Optional[int] = None
     category: Optional[CategoryResponse] = None
     is_published: bool
+    publish_at: Optional[datetime] = None
     featured: bool
     view_count: int
     reading_time: Optional[int] = 1
@@ -122,6 +158,7 @@ class ArticleResponse(BaseModel):
                 "category_id": data.category_id,
                 "category": data.category_rel,
                 "is_published": data.is_published,
+                "publish_at": data.publish_at,
                 "featured": data.featured,
                 "view_count": data.view_count,
                 "reading_time": data.reading_time,
@@ -132,6 +169,16 @@ class ArticleResponse(BaseModel):
             }
         return data
 
+class NearDuplicate(BaseModel):
+    id: int
+    title: str
+    slug: Optional[str] = None
+    similarity: float
+
+class ArticleWriteResponse(ArticleResponse):
+    # Set when the title or content was written; estimated from MinHash signatures
+    near_duplicates: Optional[List[NearDuplicate]] = None
+
 class ArticleListResponse(BaseModel):
     id: int
     title: str
@@ -141,6 +188,7 @@ class ArticleListResponse(BaseModel):
     category_id: Optional[int] = None
     category: Optional[CategoryResponse] = None
     is_published: bool
+    publish_at: Optional[datetime] = None
     view_count: int
     featured: bool
     reading_time: Optional[int] = 1
@@ -171,6 +219,7 @@ class ArticleListResponse(BaseModel):
                 "category_id": data.category_id,
                 "category": data.category_rel,
                 "is_published": data.is_published,
+                "publish_at": data.publish_at,
                 "view_count": data.view_count,
                 "featured": data.featured,
                 "reading_time": data.reading_time,
@@ -181,7 +230,22 @@ class ArticleListResponse(BaseModel):
             }
         return data
 
+class BulkImportItemResult(BaseModel):
+    line: int
+    id: Optional[int] = None
+    slug: Optional[str] = None
+    error: Optional[str] = None
+
+class BulkImportResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[BulkImportItemResult]
+
 # ===== Stats Schemas =====
+class DailyViews(BaseModel):
+    day: str
+    views: int
+
 class StatsResponse(BaseModel):
     total_articles: int
     total_views: int
@@ -190,3 +254,4 @@ class StatsResponse(BaseModel):
     total_tags: int
     total_categories: int
     categories: List[str]
+    daily_views: List[DailyViews] = []
@@ -1,7 +1,13 @@
+import logging
 import os
 import re
 
 from elasticsearch import Elasticsearch
+from elasticsearch.helpers import bulk
+
+from .metrics import time_es
+
+logger = logging.getLogger(__name__)
 
 es_url = os.getenv("ELASTICSEARCH_URL", "http://elasticsearch:9200")
 es = Elasticsearch([es_url])
@@ -49,6 +55,8 @@ INDEX_MAPPING = {
                 "fields": {"keyword": {"type": "keyword"}},
             },
             "slug": {"type": "keyword"},
+            "category_id": {"type": "integer"},
+            "tag_ids": {"type": "integer"},
         }
     },
 }
@@ -63,52 +71,112 @@ FALLBACK_MAPPING = {
             "category": {"type": "text", "fields": {"keyword": {"type": "keyword"}}},
             "tags": {"type": "text", "fields": {"keyword": {"type": "keyword"}}},
             "slug": {"type": "keyword"},
+            "category_id": {"type": "integer"},
+            "tag_ids": {"type": "integer"},
         }
     },
 }
 
+# Ids stored next to the names so taxonomy edits can find the affected
+# documents with a term query instead of a full reindex
+TAXONOMY_FIELDS = {"category_id": {"type": "integer"}, "tag_ids": {"type": "integer"}}
+
 
 def strip_html(html: str) -> str:
     return re.sub(r'<[^>]+>', '', html or '')
 
 
-def ensure_index():
-    """Create the articles index with IK mapping if it doesn't exist."""
+def ensure_index() -> bool:
+    """Create the articles index with IK mapping if it doesn't exist. Returns False if ES is unusable."""
     try:
         if not es.indices.exists(index=INDEX_NAME):
             try:
                 es.indices.create(index=INDEX_NAME, body=INDEX_MAPPING)
-                print("Elasticsearch index created with IK analyzer")
+                logger.info("Elasticsearch index created with IK analyzer")
             except Exception:
                 # IK plugin might not be installed, use fallback
                 try:
                     es.indices.create(index=INDEX_NAME, body=FALLBACK_MAPPING)
-                    print("Elasticsearch index created with standard analyzer (IK not available)")
+                    logger.info("Elasticsearch index created with standard analyzer (IK not available)")
                 except Exception as e2:
-                    print(f"Elasticsearch index creation error: {e2}")
+                    logger.error("Elasticsearch index creation error: %s", e2)
+                    return False
+        else:
+            # Indexes created before the id fields existed; adding fields is allowed in place
+            es.indices.put_mapping(index=INDEX_NAME, properties=TAXONOMY_FIELDS)
+        return True
     except Exception as e:
-        print(f"Elasticsearch connection error: {e}")
+        logger.error("Elasticsearch connection error: %s", e)
+        return False
 
 
-def index_article(article_id: int, title: str, content: str,
-                  author: str = None, category: str = None,
-                  tags: list = None, slug: str = None):
-    doc = {
+def build_document(title: str, content: str, author: str = None,
+                   category: str = None, tags: list = None, slug: str = None,
+                   category_id: int = None, tag_ids: list = None) -> dict:
+    # tags and tag_ids are parallel arrays so a rename can patch one entry in place
+    return {
         "title": title,
         "content": strip_html(content),
         "author": author or "Itsour",
         "category": category or "",
-        "tags": " ".join(tags) if tags else "",
+        "tags": list(tags or []),
         "slug": slug or "",
+        "category_id": category_id,
+        "tag_ids": list(tag_ids or []),
     }
+
+
+def article_document(article) -> dict:
+    """Build the index document from an ORM article with tags and category loaded."""
+    return build_document(
+        article.title,
+        article.content,
+        article.author,
+        article.category_rel.name if article.category_rel else "",
+        [t.name for t in article.tags] if article.tags else [],
+        getattr(article, 'slug', None),
+        article.category_id,
+        [t.id for t in article.tags] if article.tags else [],
+    )
+
+
+def index_article(article_id: int, title: str, content: str,
+                  author: str = None, category: str = None,
+                  tags: list = None, slug: str = None,
+                  category_id: int = None, tag_ids: list = None):
+    doc = build_document(title, content, author, category, tags, slug, category_id, tag_ids)
+    try:
+        with time_es("index"):
+            es.index(index=INDEX_NAME, id=article_id, document=doc)
+    except Exception as e:
+        logger.error("Elasticsearch indexing error: %s", e)
+
+
+def bulk_index_articles(articles) -> int:
+    """Index many ORM articles with a single bulk request. Returns the number indexed."""
+    actions = [
+        {"_index": INDEX_NAME, "_id": article.id, "_source": article_document(article)}
+        for article in articles
+    ]
+    if not actions:
+        return 0
     try:
-        es.index(index=INDEX_NAME, id=article_id, document=doc)
+        with time_es("bulk"):
+            success, _ = bulk(es, actions, raise_on_error=False)
+        return success
     except Exception as e:
-        print(f"Elasticsearch indexing error: {e}")
+        logger.error("Elasticsearch bulk indexing error: %s", e)
+        return 0
 
 
 def search_articles(query: str):
+    return [article_id for article_id, _ in search_articles_scored(query)]
+
+
+def search_articles_scored(query: str, size: int = 10):
+    """(article_id, ES score) pairs, best first; empty if ES is unavailable."""
     body = {
+        "size": size,
         "query": {
             "multi_match": {
                 "query": query,
@@ -124,33 +192,76 @@ def search_articles(query: str):
         },
     }
     try:
-        result = es.search(index=INDEX_NAME, body=body)
-        return [int(hit["_id"]) for hit in result["hits"]["hits"]]
+        with time_es("search"):
+            result = es.search(index=INDEX_NAME, body=body)
+        return [(int(hit["_id"]), hit["_score"] or 0.0) for hit in result["hits"]["hits"]]
     except Exception as e:
-        print(f"Elasticsearch search error: {e}")
+        logger.error("Elasticsearch search error: %s", e)
         return []
 
 
 def delete_article_index(article_id: int):
     try:
-        es.delete(index=INDEX_NAME, id=article_id)
+        with time_es("delete"):
+            es.delete(index=INDEX_NAME, id=article_id)
     except Exception as e:
-        print(f"Elasticsearch delete error: {e}")
+        logger.error("Elasticsearch delete error: %s", e)
 
 
 def reindex_all(articles):
-    count = 0
-    for article in articles:
-        tag_names = [t.name for t in article.tags] if article.tags else []
-        cat_name = article.category_rel.name if article.category_rel else ""
-        index_article(
-            article.id,
-            article.title,
-            article.content,
-            article.author,
-            cat_name,
-            tag_names,
-            getattr(article, 'slug', None),
-        )
-        count += 1
-    return count
+    return bulk_index_articles(articles)
+
+
+# ===== Taxonomy propagation =====
+# Painless scripts run inside ES on just the documents matching the term query.
+RENAME_CATEGORY_SCRIPT = "ctx._source.category = params.name"
+CLEAR_CATEGORY_SCRIPT = "ctx._source.category = ''; ctx._source.category_id = null"
+RENAME_TAG_SCRIPT = """
+for (int i = 0; i < ctx._source.tag_ids.size(); i++) {
+  if (ctx._source.tag_ids[i] == params.id) { ctx._source.tags[i] = params.name; }
+}
+"""
+MERGE_TAGS_SCRIPT = """
+List ids = new ArrayList(); List names = new ArrayList();
+for (int i = 0; i < ctx._source.tag_ids.size(); i++) {
+  def id = ctx._source.tag_ids[i];
+  if (!params.sources.contains(id) && id != params.target) { ids.add(id); names.add(ctx._source.tags[i]); }
+}
+ids.add(params.target); names.add(params.name);
+ctx._source.tag_ids = ids; ctx._source.tags = names;
+"""
+
+
+def update_by_query(operation: str, query: dict, source: str, params: dict) -> int:
+    """Apply a script to every matching document. Returns how many were updated."""
+    try:
+        with time_es(operation):
+            result = es.update_by_query(
+                index=INDEX_NAME, query=query, conflicts="proceed", refresh=True,
+                script={"source": source, "lang": "painless", "params": params},
+            )
+        return result.get("updated", 0)
+    except Exception as e:
+        logger.error("Elasticsearch %s error: %s", operation, e)
+        return 0
+
+
+def rename_category_in_index(category_id: int, name: str) -> int:
+    return update_by_query("rename_category", {"term": {"category_id": category_id}},
+                           RENAME_CATEGORY_SCRIPT, {"name": name})
+
+
+def clear_category_in_index(category_id: int) -> int:
+    return update_by_query("clear_category", {"term": {"category_id": category_id}},
+                           CLEAR_CATEGORY_SCRIPT, {})
+
+
+def rename_tag_in_index(tag_id: int, name: str) -> int:
+    return update_by_query("rename_tag", {"term": {"tag_ids": tag_id}},
+                           RENAME_TAG_SCRIPT, {"id": tag_id, "name": name})
+
+
+def merge_tags_in_index(source_ids: list, target_id: int, target_name: str) -> int:
+    return update_by_query("merge_tags", {"terms": {"tag_ids": list(source_ids)}},
+                           MERGE_TAGS_SCRIPT,
+                           {"sources": list(source_ids), "target": target_id, "name": target_name})
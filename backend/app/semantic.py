@@ -0,0 +1,465 @@
+"""Local semantic index: article vectors built and queried on CPU.
+
+Each article becomes a hashed bag of character bi- and trigrams (no tokenizer
+needed for Chinese), weighted by sublinear TF x IDF and L2-normalised so
+cosine similarity is a plain dot product. Vectors live in a float32 matrix
+memory-mapped from SEMANTIC_DIR:
+
+    vectors.f32   capacity x SEMANTIC_DIM float32 rows
+    ids.i64       article id per row (0 = free row)
+    df.f32        document frequency per hash bucket
+    meta.json     {"dim", "capacity", "rows", "documents", "version"}
+
+Writes update single rows under a file lock shared by all workers; readers
+re-map when meta.json is replaced. A query is one matrix-vector product plus
+argpartition, linear in the number of articles; measure it with
+``python -m benchmarks semantic``.
+
+Full rebuild:  python -m app.semantic rebuild
+"""
+import argparse
+import fcntl
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .search import strip_html
+
+logger = logging.getLogger(__name__)
+
+SEMANTIC_ENABLED = os.getenv("SEMANTIC_ENABLED", "true").lower() == "true"
+SEMANTIC_DIR = Path(os.getenv("SEMANTIC_DIR", "cache/semantic"))
+# 512 float32 buckets = 2 KB per article, 200 MB at 100k articles
+SEMANTIC_DIM = int(os.getenv("SEMANTIC_DIM", "512"))
+# Share of the blended search score that comes from the semantic side
+SEMANTIC_WEIGHT = float(os.getenv("SEMANTIC_WEIGHT", "0.3"))
+# Semantic-only hits below this cosine are noise and are not added to keyword results
+SEMANTIC_MIN_SCORE = float(os.getenv("SEMANTIC_MIN_SCORE", "0.15"))
+SEMANTIC_MAX_CHARS = 20000
+# Wait between attempts when the startup build fails (database down) or another worker is building
+SEMANTIC_BUILD_RETRY = float(os.getenv("SEMANTIC_BUILD_RETRY", "30"))
+INITIAL_CAPACITY = 1024
+
+_WORD_BREAKS = re.compile(r"[\W_]+")
+_PRIMES = [np.uint64(0x9E3779B97F4A7C15), np.uint64(0xC2B2AE3D27D4EB4F), np.uint64(0x165667B19E3779F9)]
+_BIGRAM_SALT = np.uint64(0x27D4EB2F165667C5)
+_TRIGRAM_SALT = np.uint64(0x85EBCA77C2B2AE63)
+
+
+# ===== Vectorizer =====
+def article_text(title: str, summary: Optional[str], content: str) -> str:
+    # Title twice: it says more about the topic than any one paragraph
+    return f"{title}\n{title}\n{summary or ''}\n{strip_html(content)}"[:SEMANTIC_MAX_CHARS]
+
+
+def normalize_text(text: str) -> str:
+    return _WORD_BREAKS.sub(" ", text.lower()).strip()
+
+
+def code_points(text: str) -> np.ndarray:
+    return np.frombuffer(normalize_text(text).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+
+
+def mix64(h: np.ndarray) -> np.ndarray:
+    # splitmix64 finaliser; uint64 arithmetic wraps, which is what we want
+    h = h ^ (h >> np.uint64(30))
+    h = h * np.uint64(0xBF58476D1CE4E5B9)
+    h = h ^ (h >> np.uint64(27))
+    h = h * np.uint64(0x94D049BB133111EB)
+    return h ^ (h >> np.uint64(31))
+
+
+def ngram_buckets(text: str, dim: int = SEMANTIC_DIM) -> np.ndarray:
+    """Hash bucket of every character bigram and trigram, computed without a Python loop."""
+    codes = code_points(text)
+    if codes.size < 2:
+        return np.empty(0, dtype=np.intp)
+    grams = [codes[:-1] * _PRIMES[0] + codes[1:] * _PRIMES[1] + _BIGRAM_SALT]
+    if codes.size >= 3:
+        grams.append(codes[:-2] * _PRIMES[0] + codes[1:-1] * _PRIMES[1] + codes[2:] * _PRIMES[2] + _TRIGRAM_SALT)
+    return (mix64(np.concatenate(grams)) % np.uint64(dim)).astype(np.intp)
+
+
+def term_counts(text: str, dim: int = SEMANTIC_DIM) -> np.ndarray:
+    return np.bincount(ngram_buckets(text, dim), minlength=dim).astype(np.float32)
+
+
+def idf_weights(df: np.ndarray, documents: int) -> np.ndarray:
+    return (np.log((1.0 + documents) / (1.0 + df)) + 1.0).astype(np.float32)
+
+
+def weigh(counts: np.ndarray, idf: np.ndarray) -> np.ndarray:
+    vector = np.log1p(counts) * idf
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+# ===== Index =====
+class SemanticIndex:
+    def __init__(self, directory: Path = SEMANTIC_DIR, dim: int = SEMANTIC_DIM):
+        self.directory = Path(directory)
+        self.dim = dim
+        self._lock = threading.RLock()
+        self._stamp = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self.meta = None
+        self._vectors = self._ids = self._df = None
+        self._rows: Dict[int, int] = {}
+
+    def _path(self, name: str) -> Path:
+        return self.directory / name
+
+    # --- storage ---
+    def _meta_stamp(self):
+        try:
+            st = os.stat(self._path("meta.json"))
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns
+
+    def _refresh(self) -> None:
+        """Re-map if another worker (or a rebuild) replaced the files since we last looked."""
+        stamp = self._meta_stamp()
+        if stamp == self._stamp:
+            return
+        with self._lock:
+            stamp = self._meta_stamp()
+            if stamp != self._stamp:
+                self._load()
+                self._stamp = stamp
+
+    def _load(self) -> None:
+        self._reset()
+        try:
+            meta = json.loads(self._path("meta.json").read_text())
+        except FileNotFoundError:
+            return
+        if meta["dim"] != self.dim:
+            logger.warning("Semantic index has dim %s, expected %s; rebuild it", meta["dim"], self.dim)
+            return
+        capacity = meta["capacity"]
+        self._vectors = np.memmap(self._path("vectors.f32"), dtype=np.float32, mode="r+",
+                                  shape=(capacity, self.dim))
+        self._ids = np.memmap(self._path("ids.i64"), dtype=np.int64, mode="r+", shape=(capacity,))
+        self._df = np.fromfile(self._path("df.f32"), dtype=np.float32)
+        used = np.flatnonzero(self._ids[:meta["rows"]])
+        self._rows = dict(zip(self._ids[used].tolist(), used.tolist()))
+        self.meta = meta
+
+    def _write_file(self, name: str, data) -> None:
+        """Write bytes or an array to a temp file and rename it into place."""
+        tmp = self._path(f".{name}.tmp")
+        if isinstance(data, np.ndarray):
+            data.tofile(tmp)
+        else:
+            tmp.write_bytes(data)
+        os.replace(tmp, self._path(name))
+
+    def _save(self) -> None:
+        self._vectors.flush()
+        self._ids.flush()
+        self._write_file("df.f32", self._df)
+        self.meta["version"] += 1
+        self._write_file("meta.json", json.dumps(self.meta).encode())
+        self._stamp = self._meta_stamp()
+
+    def _create(self, capacity: int = INITIAL_CAPACITY) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for name, itemsize in (("vectors.f32", 4 * self.dim), ("ids.i64", 8)):
+            with open(self._path(name), "wb") as f:
+                f.truncate(capacity * itemsize)
+        self._write_file("df.f32", np.zeros(self.dim, dtype=np.float32))
+        self._write_file("meta.json", json.dumps(
+            {"dim": self.dim, "capacity": capacity, "rows": 0, "documents": 0, "version": 0}).encode())
+        self._load()
+
+    def _grow(self) -> None:
+        # Extending in place keeps other workers' shorter mappings valid until they re-map
+        capacity = self.meta["capacity"] * 2
+        self._vectors.flush()
+        self._ids.flush()
+        for name, itemsize in (("vectors.f32", 4 * self.dim), ("ids.i64", 8)):
+            with open(self._path(name), "r+b") as f:
+                f.truncate(capacity * itemsize)
+        self.meta["capacity"] = capacity
+        self._vectors = np.memmap(self._path("vectors.f32"), dtype=np.float32, mode="r+",
+                                  shape=(capacity, self.dim))
+        self._ids = np.memmap(self._path("ids.i64"), dtype=np.int64, mode="r+", shape=(capacity,))
+
+    @contextmanager
+    def _writing(self):
+        """Thread lock plus an flock shared with the other workers; state is re-read inside it."""
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(self._path(".lock"), "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._refresh()
+                if self.meta is None:
+                    self._create()
+                yield
+                self._save()
+
+    # --- writes ---
+    def _free_row(self) -> int:
+        rows = self.meta["rows"]
+        holes = np.flatnonzero(self._ids[:rows] == 0)
+        if holes.size:
+            return int(holes[0])
+        if rows >= self.meta["capacity"]:
+            self._grow()
+        self.meta["rows"] = rows + 1
+        return rows
+
+    def _drop(self, row: int) -> None:
+        self._df -= self._vectors[row] != 0
+        self._vectors[row] = 0
+        self._ids[row] = 0
+        self.meta["documents"] -= 1
+
+    def upsert_many(self, items: Iterable[Tuple[int, str]]) -> None:
+        """(article_id, text) pairs; vectors use the IDF as it stands, a rebuild re-weighs everything."""
+        with self._writing():
+            for article_id, text in items:
+                row = self._rows.get(article_id)
+                if row is not None:
+                    self._drop(row)
+                else:
+                    row = self._free_row()
+                    self._rows[article_id] = row
+                counts = term_counts(text, self.dim)
+                self.meta["documents"] += 1
+                self._df += counts > 0
+                self._vectors[row] = weigh(counts, idf_weights(self._df, self.meta["documents"]))
+                self._ids[row] = article_id
+
+    def remove(self, article_id: int) -> None:
+        with self._writing():
+            row = self._rows.pop(article_id, None)
+            if row is not None:
+                self._drop(row)
+
+    def rebuild(self, items: Iterable[Tuple[int, str]]) -> int:
+        """Replace the whole index; readers keep their old mapping until the new meta.json lands."""
+        ids, counts = [], []
+        for article_id, text in items:
+            ids.append(article_id)
+            counts.append(term_counts(text, self.dim))
+        matrix = np.vstack(counts) if counts else np.zeros((0, self.dim), dtype=np.float32)
+        df = (matrix > 0).sum(axis=0).astype(np.float32)
+        matrix = np.log1p(matrix) * idf_weights(df, len(ids))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+        capacity = max(INITIAL_CAPACITY, 1 << max(len(ids) - 1, 0).bit_length())
+        vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        vectors[:len(ids)] = matrix
+        id_column = np.zeros(capacity, dtype=np.int64)
+        id_column[:len(ids)] = ids
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(self._path(".lock"), "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                # New files under new inodes; existing mappings stay valid
+                self._write_file("vectors.f32", vectors)
+                self._write_file("ids.i64", id_column)
+                self._write_file("df.f32", df)
+                old = json.loads(self._path("meta.json").read_text()) if self._path("meta.json").exists() else {}
+                self._write_file("meta.json", json.dumps({
+                    "dim": self.dim, "capacity": capacity, "rows": len(ids), "documents": len(ids),
+                    "version": old.get("version", 0) + 1,
+                }).encode())
+                self._stamp = None
+                self._refresh()
+        return len(ids)
+
+    # --- reads ---
+    def exists(self) -> bool:
+        self._refresh()
+        return self.meta is not None
+
+    def __len__(self) -> int:
+        self._refresh()
+        return self.meta["documents"] if self.meta else 0
+
+    def vectorize(self, text: str) -> np.ndarray:
+        self._refresh()
+        if self.meta is None:
+            return weigh(term_counts(text, self.dim), np.ones(self.dim, dtype=np.float32))
+        return weigh(term_counts(text, self.dim), idf_weights(self._df, self.meta["documents"]))
+
+    def vector_of(self, article_id: int) -> Optional[np.ndarray]:
+        self._refresh()
+        row = self._rows.get(article_id)
+        return None if row is None else np.array(self._vectors[row])
+
+    def top_k(self, vector: np.ndarray, k: int = 10, exclude: Sequence[int] = ()) -> List[Tuple[int, float]]:
+        """Highest-cosine (article_id, score) pairs, best first."""
+        self._refresh()
+        meta, vectors, ids = self.meta, self._vectors, self._ids
+        if meta is None or not meta["rows"] or k <= 0:
+            return []
+        rows = meta["rows"]
+        scores = vectors[:rows] @ vector
+        live_ids = ids[:rows]
+        scores[live_ids == 0] = -np.inf
+        if exclude:
+            scores[np.isin(live_ids, list(exclude))] = -np.inf
+        k = min(k, rows)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(live_ids[r]), float(scores[r])) for r in top if scores[r] > 0]
+
+    def scores_for(self, vector: np.ndarray, article_ids: Iterable[int]) -> Dict[int, float]:
+        self._refresh()
+        rows = {article_id: self._rows[article_id] for article_id in article_ids if article_id in self._rows}
+        if not rows:
+            return {}
+        scores = self._vectors[list(rows.values())] @ vector
+        return dict(zip(rows, scores.tolist()))
+
+    def similar(self, article_id: int, k: int = 10) -> List[Tuple[int, float]]:
+        vector = self.vector_of(article_id)
+        if vector is None:
+            return []
+        return self.top_k(vector, k, exclude=[article_id])
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[int, float]]:
+        return self.top_k(self.vectorize(query), k)
+
+
+semantic_index = SemanticIndex()
+
+
+# ===== Hooks used by routes and bulk import =====
+def index_articles(items: List[Tuple[int, str]]) -> None:
+    if not SEMANTIC_ENABLED or not items:
+        return
+    try:
+        semantic_index.upsert_many(items)
+    except Exception as e:
+        logger.error("Semantic indexing error: %s", e)
+
+
+def remove_article(article_id: int) -> None:
+    if not SEMANTIC_ENABLED:
+        return
+    try:
+        semantic_index.remove(article_id)
+    except Exception as e:
+        logger.error("Semantic index delete error: %s", e)
+
+
+def blend(keyword_hits: List[Tuple[int, float]], query: str, size: int = 10,
+          weight: float = SEMANTIC_WEIGHT) -> List[int]:
+    """Merge ES hits with semantic neighbours of the query.
+
+    ES scores are scaled by the best hit so both sides are in [0, 1]. Keyword
+    hits get their cosine added in; strong semantic-only hits can fill in
+    results the keyword query missed (e.g. other wordings, ES down).
+    """
+    if not SEMANTIC_ENABLED or not len(semantic_index):
+        return [article_id for article_id, _ in keyword_hits][:size]
+    vector = semantic_index.vectorize(query)
+    best = max((score for _, score in keyword_hits), default=0.0) or 1.0
+    combined = {article_id: (1 - weight) * score / best for article_id, score in keyword_hits}
+    for article_id, cosine in semantic_index.scores_for(vector, combined).items():
+        combined[article_id] += weight * cosine
+    for article_id, cosine in semantic_index.top_k(vector, size):
+        if article_id not in combined and cosine >= SEMANTIC_MIN_SCORE:
+            combined[article_id] = weight * cosine
+    return sorted(combined, key=combined.get, reverse=True)[:size]
+
+
+# ===== Full rebuild =====
+def iter_article_texts(db, chunk_size: int = 500):
+    from . import models
+
+    query = db.query(models.Article.id, models.Article.title, models.Article.summary,
+                     models.Article.content).order_by(models.Article.id)
+    for row in query.yield_per(chunk_size):
+        yield row.id, article_text(row.title, row.summary, row.content)
+
+
+def rebuild_from_db() -> int:
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return semantic_index.rebuild(iter_article_texts(db))
+    finally:
+        db.close()
+
+
+# One background build per process, and one per host: the rest find the flock taken and wait for meta.json
+_build_running = threading.Lock()
+_build_error: Optional[str] = None
+
+
+def build_if_missing() -> Optional[int]:
+    """Build the index unless it exists or another worker holds the build lock; the article count if built.
+
+    The build lock is its own file: rebuild() takes .lock only to swap the
+    files in, so other workers' upserts are not held up by the full scan.
+    """
+    semantic_index.directory.mkdir(parents=True, exist_ok=True)
+    with open(semantic_index._path(".build.lock"), "w") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+        if semantic_index.exists():
+            return None
+        return rebuild_from_db()
+
+
+def _build_until_present() -> None:
+    global _build_error
+    try:
+        while not semantic_index.exists():
+            try:
+                count = build_if_missing()
+                _build_error = None
+                if count is not None:
+                    logger.info("Semantic index built with %d articles", count)
+                    return
+            except Exception as e:
+                _build_error = str(e)
+                logger.error("Semantic index build failed: %s", e)
+            time.sleep(SEMANTIC_BUILD_RETRY)
+    finally:
+        _build_running.release()
+
+
+def start_build() -> bool:
+    """Build a missing index on a background thread; False if disabled, present or already building here."""
+    if not SEMANTIC_ENABLED or semantic_index.exists() or not _build_running.acquire(blocking=False):
+        return False
+    threading.Thread(target=_build_until_present, name="semantic-build", daemon=True).start()
+    return True
+
+
+def ensure_semantic_index() -> None:
+    """Readiness check: only reports; the build runs from start_build() in the lifespan."""
+    if not SEMANTIC_ENABLED or semantic_index.exists():
+        return
+    if _build_error:
+        raise RuntimeError(f"index missing, last build failed: {_build_error}")
+    raise RuntimeError("index is being built")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the local semantic index")
+    parser.add_argument("command", choices=["rebuild"])
+    args = parser.parse_args()
+    started = time.perf_counter()
+    print({"articles": rebuild_from_db(), "seconds": round(time.perf_counter() - started, 2)})
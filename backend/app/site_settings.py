@@ -0,0 +1,120 @@
+import os
+import threading
+import time
+from typing import Dict
+
+from sqlalchemy.orm import Session
+
+from . import models
+from .metrics import record_cache
+
+SETTING_KEYS = ["ai_api_key", "ai_model", "ai_base_url", "ai_summary_prompt"]
+
+SETTING_DEFAULTS = {
+    "ai_api_key": "",
+    "ai_model": "gpt-4o-mini",
+    "ai_base_url": "https://api.openai.com/v1",
+    "ai_summary_prompt": "請根據以下文章內容，用繁體中文撰寫一段 50 字以內的摘要，直接輸出摘要文字即可，不要加任何前綴。",
+}
+
+# Reserved row bumped on every write so other workers know to reload
+VERSION_KEY = "_settings_version"
+SETTINGS_CHECK_INTERVAL = float(os.getenv("SETTINGS_CHECK_INTERVAL", "5"))
+
+
+class SettingsStore:
+    """In-process snapshot of the site_settings table.
+
+    Reads are dictionary lookups. At most once per SETTINGS_CHECK_INTERVAL a
+    worker reads the version row and reloads every setting in one query if
+    another worker has written since.
+    """
+
+    def __init__(self, check_interval: float = SETTINGS_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._values: Dict[str, str] = None
+        self._version = None
+        self._checked_at = 0.0
+
+    def _load(self, db: Session) -> None:
+        rows = db.query(models.SiteSetting.key, models.SiteSetting.value).all()
+        values = {key: value for key, value in rows}
+        self._version = values.pop(VERSION_KEY, "0")
+        self._values = values
+        self._checked_at = time.monotonic()
+
+    def _ensure_fresh(self, db: Session) -> None:
+        if self._values is not None and time.monotonic() - self._checked_at < self.check_interval:
+            record_cache("settings", True)
+            return
+        with self._lock:
+            if self._values is None:
+                record_cache("settings", False)
+                self._load(db)
+                return
+            if time.monotonic() - self._checked_at < self.check_interval:
+                record_cache("settings", True)
+                return
+            version = db.query(models.SiteSetting.value).filter(
+                models.SiteSetting.key == VERSION_KEY
+            ).scalar() or "0"
+            record_cache("settings", version == self._version)
+            if version != self._version:
+                self._load(db)
+            else:
+                self._checked_at = time.monotonic()
+
+    def _value(self, values: Dict[str, str], key: str) -> str:
+        value = values.get(key)
+        return value if value is not None else SETTING_DEFAULTS.get(key, "")
+
+    def get(self, db: Session, key: str) -> str:
+        self._ensure_fresh(db)
+        return self._value(self._values, key)
+
+    def all(self, db: Session) -> Dict[str, str]:
+        self._ensure_fresh(db)
+        values = self._values
+        return {key: self._value(values, key) for key in SETTING_KEYS}
+
+    def update(self, db: Session, values: Dict[str, str]) -> None:
+        """Write every key and bump the version in a single transaction."""
+        if not values:
+            return
+        keys = list(values) + [VERSION_KEY]
+        rows = {
+            row.key: row for row in db.query(models.SiteSetting)
+            .filter(models.SiteSetting.key.in_(keys))
+            .with_for_update()
+        }
+        for key, value in values.items():
+            if key in rows:
+                rows[key].value = value
+            else:
+                db.add(models.SiteSetting(key=key, value=value))
+        version_row = rows.get(VERSION_KEY)
+        if version_row is None:
+            version_row = models.SiteSetting(key=VERSION_KEY, value="0")
+            db.add(version_row)
+        version_row.value = str(int(version_row.value or "0") + 1)
+        new_version = version_row.value
+        db.commit()
+
+        with self._lock:
+            if self._values is None:
+                return
+            if int(new_version) == int(self._version or "0") + 1:
+                self._values.update(values)
+                self._version = new_version
+                self._checked_at = time.monotonic()
+            else:
+                # Another worker wrote since our snapshot; merging only our keys would hide its change
+                self._load(db)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._values = None
+
+
+settings_store = SettingsStore()
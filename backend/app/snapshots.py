@@ -0,0 +1,351 @@
+"""Static JSON snapshots of published content, served by Caddy without touching the API.
+
+Layout under SNAPSHOT_DIR (mirrors /snapshots/* in the Caddyfile):
+
+    articles/{slug}.json            ArticleResponse
+    pages/{n}.json                  published list, newest first (ArticleListResponse[])
+    tags/{tag_id}/{n}.json          same, filtered by tag
+    categories/{category_id}/{n}.json
+    {scope}/index.json              {"total", "pages", "page_size"}
+    tags.json, categories.json
+
+Every file is written to a temp file in the same directory and renamed into
+place, so readers never see a partial snapshot.
+
+Full rebuild:  python -m app.snapshots rebuild [--workers N]
+"""
+import argparse
+import math
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+import orjson
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+from . import models, serializers
+from .database import SessionLocal, engine
+
+SNAPSHOT_DIR = Path(os.getenv("SNAPSHOT_DIR", "snapshots"))
+SNAPSHOTS_ENABLED = os.getenv("SNAPSHOTS_ENABLED", "true").lower() == "true"
+SNAPSHOT_PAGE_SIZE = int(os.getenv("SNAPSHOT_PAGE_SIZE", "10"))
+REBUILD_CHUNK_SIZE = 200
+
+ALL = ("all", None)
+
+
+# ===== File helpers =====
+def write_json(path: Path, data) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(orjson.dumps(data))
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def article_path(slug: str) -> Path:
+    return SNAPSHOT_DIR / "articles" / f"{slug}.json"
+
+
+def scope_dir(scope: Tuple[str, Optional[int]]) -> Path:
+    kind, key = scope
+    if kind == "all":
+        return SNAPSHOT_DIR / "pages"
+    return SNAPSHOT_DIR / ("tags" if kind == "tag" else "categories") / str(key)
+
+
+def scopes_of(tag_ids: Iterable[int], category_id: Optional[int]) -> set:
+    scopes = {ALL} | {("tag", t) for t in tag_ids}
+    if category_id:
+        scopes.add(("category", category_id))
+    return scopes
+
+
+# ===== Rendering =====
+def published_query(db: Session):
+    return db.query(models.Article).options(
+        joinedload(models.Article.category_rel),
+        selectinload(models.Article.tags),
+        selectinload(models.Article.images),
+    ).filter(models.Article.is_published == True)
+
+
+def render_articles(db: Session, article_ids: List[int]) -> int:
+    articles = published_query(db).filter(models.Article.id.in_(article_ids)).all()
+    for article in articles:
+        write_json(article_path(article.slug), serializers.article_dict(article))
+    return len(articles)
+
+
+def in_scope(query, scope: Tuple[str, Optional[int]]):
+    kind, key = scope
+    if kind == "tag":
+        return query.filter(models.Article.tags.any(models.Tag.id == key))
+    if kind == "category":
+        return query.filter(models.Article.category_id == key)
+    return query
+
+
+def page_of(db: Session, scope: Tuple[str, Optional[int]], article) -> int:
+    """List page `article` is on in `scope`, or would be on: published articles that sort before it."""
+    ahead = in_scope(db.query(func.count(models.Article.id)), scope).filter(
+        models.Article.is_published == True,
+        or_(models.Article.created_at > article.created_at,
+            and_(models.Article.created_at == article.created_at, models.Article.id > article.id)),
+    ).scalar()
+    return ahead // SNAPSHOT_PAGE_SIZE + 1
+
+
+def render_scope(db: Session, scope: Tuple[str, Optional[int]], first_page: int = 1,
+                 only_page: bool = False) -> int:
+    """Rewrite the list pages of a scope from `first_page` on (or just that page) and drop pages past the end.
+
+    An edit that keeps an article in its place only changes its own page; an
+    article entering or leaving a scope shifts every page after it.
+    """
+    query = in_scope(published_query(db), scope).order_by(
+        models.Article.created_at.desc(), models.Article.id.desc())
+    total = in_scope(db.query(func.count(models.Article.id)), scope).filter(
+        models.Article.is_published == True).scalar()
+    last_page = max(1, math.ceil(total / SNAPSHOT_PAGE_SIZE))
+    first_page = min(first_page, last_page)
+    query = query.offset((first_page - 1) * SNAPSHOT_PAGE_SIZE)
+    if only_page:
+        query = query.limit(SNAPSHOT_PAGE_SIZE)
+
+    directory = scope_dir(scope)
+    page, batch = first_page - 1, []
+    for article in query.yield_per(SNAPSHOT_PAGE_SIZE * 10):
+        batch.append(serializers.article_list_item_dict(article))
+        if len(batch) == SNAPSHOT_PAGE_SIZE:
+            page += 1
+            write_json(directory / f"{page}.json", batch)
+            batch = []
+    if batch or page < first_page:
+        page += 1
+        write_json(directory / f"{page}.json", batch)
+
+    write_json(directory / "index.json", {
+        "total": total,
+        "pages": last_page,
+        "page_size": SNAPSHOT_PAGE_SIZE,
+    })
+    if not only_page and directory.exists():
+        for stale in directory.glob("*.json"):
+            if stale.stem.isdigit() and int(stale.stem) > page:
+                stale.unlink(missing_ok=True)
+    return total
+
+
+def render_taxonomy(db: Session) -> None:
+    write_json(SNAPSHOT_DIR / "tags.json",
+               [serializers.tag_dict(t) for t in db.query(models.Tag).order_by(models.Tag.id)])
+    write_json(SNAPSHOT_DIR / "categories.json",
+               [serializers.category_dict(c) for c in db.query(models.Category).order_by(models.Category.id)])
+
+
+def remove_scope(scope: Tuple[str, Optional[int]]) -> None:
+    shutil.rmtree(scope_dir(scope), ignore_errors=True)
+
+
+# ===== Incremental updates (run as background tasks after the response) =====
+def refresh_article(article_id: int, old_slug: Optional[str] = None, old_scopes: Iterable = (),
+                    was_published: bool = False) -> None:
+    """Re-render one article and the list pages it was or is on.
+
+    `old_scopes` and `was_published` describe the article before the write
+    (a new article was in no scope and unpublished).
+    """
+    if not SNAPSHOTS_ENABLED:
+        return
+    db = SessionLocal()
+    try:
+        article = db.query(models.Article).options(
+            selectinload(models.Article.tags)
+        ).filter(models.Article.id == article_id).first()
+        if article is None:
+            return
+        if not was_published and not article.is_published:
+            # A draft before and after: nothing public changed
+            if old_slug and old_slug != article.slug:
+                article_path(old_slug).unlink(missing_ok=True)
+            return
+
+        old = set(old_scopes) if was_published else set()
+        new = scopes_of([t.id for t in article.tags], article.category_id) if article.is_published else set()
+        if article.is_published:
+            if old_slug and old_slug != article.slug:
+                article_path(old_slug).unlink(missing_ok=True)
+            render_articles(db, [article.id])
+        else:
+            # Moved back to draft: its snapshot must disappear
+            article_path(old_slug or article.slug).unlink(missing_ok=True)
+        for scope in old | new:
+            # In both before and after: same place, only its own page; otherwise everything after it moves
+            render_scope(db, scope, page_of(db, scope, article), only_page=scope in old and scope in new)
+        if any(kind == "tag" for kind, _ in new - old):
+            # A newly attached tag may have been created by this write
+            render_taxonomy(db)
+    finally:
+        db.close()
+
+
+def refresh_many(article_ids: Iterable[int]) -> None:
+    """Render a batch of newly published or rewritten articles and the list pages from the first one on."""
+    if not SNAPSHOTS_ENABLED:
+        return
+    db = SessionLocal()
+    try:
+        ids = list(article_ids)
+        render_articles(db, ids)
+        articles = published_query(db).filter(models.Article.id.in_(ids)).all()
+        first_pages = {}
+        for article in articles:
+            for scope in scopes_of([t.id for t in article.tags], article.category_id):
+                page = page_of(db, scope, article)
+                first_pages[scope] = min(page, first_pages.get(scope, page))
+        for scope, page in first_pages.items():
+            render_scope(db, scope, page)
+        render_taxonomy(db)
+    finally:
+        db.close()
+
+
+def refresh_taxonomy() -> None:
+    if not SNAPSHOTS_ENABLED:
+        return
+    db = SessionLocal()
+    try:
+        render_taxonomy(db)
+    finally:
+        db.close()
+
+
+def remove_article(slug: Optional[str], old_scopes: Iterable) -> None:
+    if not SNAPSHOTS_ENABLED:
+        return
+    if slug:
+        article_path(slug).unlink(missing_ok=True)
+    db = SessionLocal()
+    try:
+        for scope in set(old_scopes) | {ALL}:
+            render_scope(db, scope)
+    finally:
+        db.close()
+
+
+def refresh_category(category_id: int, article_ids: Iterable[int] = (), deleted: bool = False) -> None:
+    """A category was renamed or deleted: its name is embedded in every article and listing."""
+    if not SNAPSHOTS_ENABLED:
+        return
+    db = SessionLocal()
+    try:
+        ids = list(article_ids) or [
+            row[0] for row in db.query(models.Article.id).filter(models.Article.category_id == category_id)
+        ]
+        if ids:
+            render_articles(db, ids)
+        if deleted:
+            remove_scope(("category", category_id))
+        rebuild_listings(db)
+    finally:
+        db.close()
+
+
+def refresh_tags(article_ids: Iterable[int], deleted_tag_ids: Iterable[int] = ()) -> None:
+    """Tags were renamed or merged: re-render the tagged articles and every listing."""
+    if not SNAPSHOTS_ENABLED:
+        return
+    db = SessionLocal()
+    try:
+        ids = list(article_ids)
+        if ids:
+            render_articles(db, ids)
+        for tag_id in deleted_tag_ids:
+            remove_scope(("tag", tag_id))
+        rebuild_listings(db)
+    finally:
+        db.close()
+
+
+def rebuild_listings(db: Session) -> None:
+    for scope in all_scopes(db):
+        render_scope(db, scope)
+    render_taxonomy(db)
+
+
+def all_scopes(db: Session) -> List[Tuple[str, Optional[int]]]:
+    return ([ALL]
+            + [("tag", row[0]) for row in db.query(models.Tag.id)]
+            + [("category", row[0]) for row in db.query(models.Category.id)])
+
+
+# ===== Full rebuild =====
+def _init_worker() -> None:
+    # Connections inherited through fork must not be shared with the parent
+    engine.dispose(close=False)
+
+
+def _run_task(task) -> int:
+    kind, payload = task
+    db = SessionLocal()
+    try:
+        if kind == "articles":
+            return render_articles(db, payload)
+        return render_scope(db, payload)
+    finally:
+        db.close()
+
+
+def rebuild_all(workers: Optional[int] = None) -> dict:
+    """Re-render every snapshot across a process pool and drop files for unpublished articles."""
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        published = db.query(models.Article.id, models.Article.slug).filter(
+            models.Article.is_published == True
+        ).order_by(models.Article.id).all()
+        scopes = all_scopes(db)
+        render_taxonomy(db)
+    finally:
+        db.close()
+
+    ids = [row.id for row in published]
+    tasks = [("articles", ids[i:i + REBUILD_CHUNK_SIZE]) for i in range(0, len(ids), REBUILD_CHUNK_SIZE)]
+    tasks += [("scope", scope) for scope in scopes]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        list(pool.map(_run_task, tasks))
+
+    live = {f"{row.slug}.json" for row in published}
+    articles_dir = SNAPSHOT_DIR / "articles"
+    removed = 0
+    if articles_dir.exists():
+        with os.scandir(articles_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(".json") and not entry.name.startswith(".") \
+                        and entry.name not in live:
+                    os.unlink(entry.path)
+                    removed += 1
+    return {
+        "articles": len(ids),
+        "scopes": len(scopes),
+        "removed": removed,
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild static JSON snapshots")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    print(rebuild_all(args.workers))
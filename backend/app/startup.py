@@ -0,0 +1,206 @@
+"""Application startup and readiness.
+
+Nothing here runs at import time. The FastAPI lifespan runs the checks in
+parallel, each with a timeout, and records how long each took. ``/ready``
+reports the result and re-runs failed checks so a worker that started while
+Elasticsearch was down recovers without a restart.
+
+Schema changes go through Alembic:
+
+    python -m app.startup migrate     # upgrade to head (stamps pre-Alembic databases first)
+"""
+import asyncio
+import logging
+import os
+import sys
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Callable, Dict, NamedTuple
+
+from sqlalchemy import inspect, text
+
+from .ai_client import ai_client
+from .auth import admin_password_hash
+from .database import DATABASE_URL, engine, replicas
+from .metrics import STARTUP_SECONDS, mark_worker_dead
+from .scheduler import publish_scheduler
+from .search import ensure_index
+from .semantic import ensure_semantic_index, start_build as start_semantic_build
+from .trending import tracker as trending_tracker
+
+logger = logging.getLogger(__name__)
+
+STARTUP_CHECK_TIMEOUT = float(os.getenv("STARTUP_CHECK_TIMEOUT", "10"))
+READY_RECHECK_INTERVAL = float(os.getenv("READY_RECHECK_INTERVAL", "5"))
+# Off by default: with several workers, migrations belong in a deploy step (see Dockerfile)
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "false").lower() in ("1", "true", "yes")
+
+UPLOAD_DIRS = ["uploads", "uploads/original", "uploads/medium", "uploads/thumbnail"]
+ALEMBIC_INI = Path(__file__).resolve().parent.parent / "alembic.ini"
+BASELINE_REVISION = "0001"
+
+
+# ===== Migrations =====
+def alembic_config(url: str = None):
+    from alembic.config import Config
+
+    cfg = Config(str(ALEMBIC_INI))
+    cfg.set_main_option("script_location", str(ALEMBIC_INI.parent / "alembic"))
+    cfg.set_main_option("sqlalchemy.url", (url or DATABASE_URL).replace("%", "%%"))
+    cfg.attributes["configure_logger"] = False
+    return cfg
+
+
+def head_revision() -> str:
+    from alembic.script import ScriptDirectory
+
+    return ScriptDirectory.from_config(alembic_config()).get_current_head()
+
+
+def upgrade_database(url: str = None) -> None:
+    """Upgrade to head. Databases built by the old create_all are stamped at the baseline first."""
+    from alembic import command
+    from sqlalchemy import create_engine
+
+    cfg = alembic_config(url)
+    target = create_engine(url) if url else engine
+    try:
+        tables = set(inspect(target).get_table_names())
+    finally:
+        if url:
+            target.dispose()
+    if "alembic_version" not in tables and "articles" in tables:
+        logger.info("Existing schema without Alembic history, stamping %s", BASELINE_REVISION)
+        command.stamp(cfg, BASELINE_REVISION)
+    command.upgrade(cfg, "head")
+
+
+# ===== Checks =====
+def prepare_upload_dirs() -> None:
+    for d in UPLOAD_DIRS:
+        Path(d).mkdir(parents=True, exist_ok=True)
+
+
+def check_database() -> None:
+    if AUTO_MIGRATE:
+        upgrade_database()
+    from alembic.runtime.migration import MigrationContext
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        current = MigrationContext.configure(conn).get_current_revision()
+    head = head_revision()
+    if current != head:
+        raise RuntimeError(f"schema at {current}, expected {head}; run `python -m app.startup migrate`")
+
+
+def check_elasticsearch() -> None:
+    if not ensure_index():
+        raise RuntimeError("Elasticsearch unavailable, search falls back to empty results")
+
+
+class Check(NamedTuple):
+    run: Callable[[], None]
+    # Critical checks gate /ready; the rest only degrade a feature
+    critical: bool = True
+
+
+CHECKS: Dict[str, Check] = {
+    "database": Check(check_database),
+    "uploads": Check(prepare_upload_dirs),
+    "elasticsearch": Check(check_elasticsearch, critical=False),
+    # bcrypt is deliberately slow; pay for it here rather than on the first login
+    "auth": Check(admin_password_hash, critical=False),
+    # The lifespan builds a missing vector index in the background; similar/hybrid results are empty until then
+    "semantic": Check(ensure_semantic_index, critical=False),
+}
+if replicas:
+    # Reads fall back to the primary while a replica is down
+    CHECKS["replicas"] = Check(replicas.check, critical=False)
+
+
+class Readiness:
+    def __init__(self, checks: Dict[str, Check]):
+        self.checks = checks
+        self.results: Dict[str, dict] = {}
+        self.startup_seconds = None
+        self._last_run = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return bool(self.results) and all(
+            self.results.get(name, {}).get("ok") for name, check in self.checks.items() if check.critical
+        )
+
+    async def _run_one(self, name: str, check: Check) -> None:
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.to_thread(check.run), STARTUP_CHECK_TIMEOUT)
+            result = {"ok": True}
+        except asyncio.TimeoutError:
+            result = {"ok": False, "error": f"timed out after {STARTUP_CHECK_TIMEOUT:g}s"}
+        except Exception as e:
+            result = {"ok": False, "error": str(e)}
+        result["ms"] = round((time.perf_counter() - start) * 1000, 1)
+        result["critical"] = check.critical
+        if not result["ok"]:
+            log = logger.error if check.critical else logger.warning
+            log("Startup check %s failed: %s", name, result["error"])
+        self.results[name] = result
+
+    async def run(self, names=None) -> None:
+        names = list(names or self.checks)
+        self._last_run = time.monotonic()
+        await asyncio.gather(*(self._run_one(name, self.checks[name]) for name in names))
+
+    async def recheck_failed(self) -> None:
+        """Re-run failed checks, at most once per READY_RECHECK_INTERVAL."""
+        failed = [name for name in self.checks if not self.results.get(name, {}).get("ok")]
+        if failed and time.monotonic() - self._last_run >= READY_RECHECK_INTERVAL:
+            # run() stamps _last_run before awaiting, so concurrent probes don't pile up
+            await self.run(failed)
+
+    def report(self) -> dict:
+        return {
+            "ready": self.ready,
+            "startup_seconds": self.startup_seconds,
+            "checks": self.results,
+        }
+
+
+readiness = Readiness(CHECKS)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    start = time.perf_counter()
+    await ai_client.startup()
+    start_semantic_build()
+    await readiness.run()
+    readiness.startup_seconds = round(time.perf_counter() - start, 3)
+    STARTUP_SECONDS.set(readiness.startup_seconds)
+    timings = ", ".join(f"{name}={r['ms']}ms" for name, r in readiness.results.items())
+    logger.info("Startup finished in %.3fs (%s), ready=%s", readiness.startup_seconds, timings, readiness.ready)
+    await publish_scheduler.start()
+    await trending_tracker.start()
+    yield
+    await trending_tracker.stop()
+    await publish_scheduler.stop()
+    await ai_client.shutdown()
+    mark_worker_dead()
+
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    logging.basicConfig(level=logging.INFO)
+    if argv[:1] == ["migrate"]:
+        upgrade_database()
+        print(f"database at {head_revision()}")
+        return 0
+    print("usage: python -m app.startup migrate", file=sys.stderr)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""AI summary cache and the archive backfill job.
+
+Backfill:  python -m app.summaries fill [--concurrency 4] [--limit N] [--after-id ID]
+
+The job only selects articles whose summary is still empty, so re-running it
+resumes where an interrupted run stopped; --after-id skips ahead explicitly.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+from typing import Optional
+
+import httpx
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models, snapshots
+from .ai_client import AIBusyError, ai_client
+from .database import SessionLocal
+from .metrics import record_cache
+from .search import strip_html
+from .site_settings import SETTING_DEFAULTS, settings_store
+
+CONTENT_LIMIT = 3000
+SUMMARY_MAX_LENGTH = 500
+MAX_RETRIES = 5
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 60.0
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+# ===== Cache =====
+def build_messages(prompt: str, title: str, content: str):
+    # Truncate content to avoid token limits
+    user_msg = f"標題：{title}\n\n內容：\n{content[:CONTENT_LIMIT]}"
+    return [
+        {"role": "system", "content": prompt},
+        {"role": "user", "content": user_msg},
+    ]
+
+
+def cache_key(prompt: str, model: str, title: str, content: str) -> str:
+    payload = json.dumps([prompt, model, title or "", content[:CONTENT_LIMIT]], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get_cached(db: Session, key: str) -> Optional[str]:
+    summary = db.query(models.SummaryCache.summary).filter(models.SummaryCache.key == key).scalar()
+    record_cache("summary", summary is not None)
+    return summary
+
+
+def store_cached(db: Session, key: str, model: str, summary: str) -> None:
+    db.add(models.SummaryCache(key=key, model=model, summary=summary))
+    try:
+        db.commit()
+    except IntegrityError:
+        # Same content summarized concurrently; either copy is fine
+        db.rollback()
+
+
+def summary_settings(db: Session) -> dict:
+    settings = settings_store.all(db)
+    return {
+        "api_key": settings["ai_api_key"],
+        "model": settings["ai_model"] or SETTING_DEFAULTS["ai_model"],
+        "base_url": settings["ai_base_url"] or SETTING_DEFAULTS["ai_base_url"],
+        "prompt": settings["ai_summary_prompt"] or SETTING_DEFAULTS["ai_summary_prompt"],
+    }
+
+
+# ===== Backfill =====
+def retry_delay(attempt: int, response: Optional[httpx.Response]) -> float:
+    """Honour Retry-After when the upstream sends it, else exponential backoff with jitter."""
+    if response is not None:
+        retry_after = response.headers.get("retry-after")
+        if retry_after:
+            try:
+                return min(float(retry_after), BACKOFF_MAX)
+            except ValueError:
+                pass
+    return min(BACKOFF_MAX, BACKOFF_BASE ** attempt) * (0.5 + random.random() / 2)
+
+
+async def summarize_with_backoff(cfg: dict, messages) -> str:
+    for attempt in range(MAX_RETRIES + 1):
+        response = None
+        try:
+            return await ai_client.complete(cfg["base_url"], cfg["api_key"], cfg["model"], messages)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code not in RETRYABLE_STATUS or attempt == MAX_RETRIES:
+                raise
+            response = e.response
+        except (httpx.TransportError, AIBusyError):
+            if attempt == MAX_RETRIES:
+                raise
+        await asyncio.sleep(retry_delay(attempt, response))
+
+
+def pending_articles(db: Session, after_id: int, limit: Optional[int]):
+    query = db.query(models.Article.id, models.Article.title, models.Article.content).filter(
+        or_(models.Article.summary.is_(None), models.Article.summary == ""),
+        models.Article.id > after_id,
+    ).order_by(models.Article.id)
+    if limit:
+        query = query.limit(limit)
+    return query.all()
+
+
+async def fill_missing_summaries(concurrency: int = 4, limit: Optional[int] = None,
+                                 after_id: int = 0, log=print) -> dict:
+    db = SessionLocal()
+    started = time.perf_counter()
+    stats = {"total": 0, "generated": 0, "cached": 0, "failed": 0}
+    filled = []
+    try:
+        cfg = summary_settings(db)
+        if not cfg["api_key"]:
+            raise RuntimeError("AI API key is not configured")
+        rows = pending_articles(db, after_id, limit)
+        stats["total"] = len(rows)
+        queue: asyncio.Queue = asyncio.Queue()
+        for row in rows:
+            queue.put_nowait(row)
+
+        async def worker():
+            while True:
+                try:
+                    row = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                content = strip_html(row.content)
+                key = cache_key(cfg["prompt"], cfg["model"], row.title, content)
+                summary = get_cached(db, key)
+                status = "cached"
+                if summary is None:
+                    try:
+                        summary = await summarize_with_backoff(
+                            cfg, build_messages(cfg["prompt"], row.title, content))
+                    except Exception as e:
+                        stats["failed"] += 1
+                        log(f"[{done_count()}/{stats['total']}] article {row.id} failed: {e}")
+                        continue
+                    store_cached(db, key, cfg["model"], summary)
+                    status = "generated"
+                db.query(models.Article).filter(models.Article.id == row.id).update(
+                    {models.Article.summary: summary[:SUMMARY_MAX_LENGTH]}, synchronize_session=False)
+                db.commit()
+                stats[status] += 1
+                filled.append(row.id)
+                log(f"[{done_count()}/{stats['total']}] article {row.id} {status}")
+
+        def done_count():
+            return stats["generated"] + stats["cached"] + stats["failed"]
+
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    finally:
+        db.close()
+        await ai_client.shutdown()
+
+    if filled:
+        snapshots.refresh_many(filled)
+    stats["max_filled_id"] = max(filled) if filled else None
+    stats["seconds"] = round(time.perf_counter() - started, 2)
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill missing article summaries")
+    parser.add_argument("command", choices=["fill"])
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--after-id", type=int, default=0)
+    args = parser.parse_args()
+    print(asyncio.run(fill_missing_summaries(args.concurrency, args.limit, args.after_id)))
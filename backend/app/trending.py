@@ -0,0 +1,247 @@
+"""Trending and popular articles.
+
+Every article view is counted in memory by the worker that served it.
+Every TRENDING_FLUSH_INTERVAL seconds the worker adds its counts to
+article_view_daily, one row per article per UTC day shared by all workers.
+That table is both the checkpoint and the dashboard rollup.
+
+After each flush the worker rebuilds its trending scores from the last few
+days of rollups. Each day's views are decayed from that day's midpoint.
+Views recorded since then are added on top, so the ranking includes other
+workers' traffic at most one interval late.
+
+Scores use forward decay. A view at time t adds exp(rate * (t - epoch)),
+so existing scores never have to be decayed as time passes; comparing them
+gives the same order as comparing decayed values. Only the best
+TRENDING_CAPACITY articles are kept. The ranking is re-sorted at most once
+per RANKING_TTL, so a request only slices a ready list.
+"""
+import asyncio
+import heapq
+import logging
+import math
+import os
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from operator import itemgetter
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+TRENDING_ENABLED = os.getenv("TRENDING_ENABLED", "true").lower() == "true"
+TRENDING_HALF_LIFE_HOURS = float(os.getenv("TRENDING_HALF_LIFE_HOURS", "24"))
+TRENDING_FLUSH_INTERVAL = float(os.getenv("TRENDING_FLUSH_INTERVAL", "60"))
+TRENDING_CAPACITY = int(os.getenv("TRENDING_CAPACITY", "1000"))
+VIEW_ROLLUP_RETENTION_DAYS = int(os.getenv("VIEW_ROLLUP_RETENTION_DAYS", "400"))
+# Rollups older than ten half-lives contribute under 0.1% and are not read back
+HISTORY_DAYS = max(1, math.ceil(TRENDING_HALF_LIFE_HOURS * 10 / 24))
+POPULAR_SIZE = 100
+
+
+def utc_today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def day_midpoint(day: date) -> float:
+    return datetime(day.year, day.month, day.day, 12, tzinfo=timezone.utc).timestamp()
+
+
+def parse_window(window: str) -> int:
+    """'7d' -> 7"""
+    return int(window[:-1])
+
+
+class TrendingTracker:
+    RANKING_TTL = 1.0
+    # Re-base the forward-decay epoch before exp() can overflow
+    REBASE_AFTER = 30 * 86400
+
+    def __init__(self, half_life_hours: float = TRENDING_HALF_LIFE_HOURS, capacity: int = TRENDING_CAPACITY):
+        self.rate = math.log(2) / (half_life_hours * 3600)
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._epoch = time.time()
+        self._scores: Dict[int, float] = {}
+        self._pending: Counter = Counter()
+        self._ranking: List[int] = []
+        self._ranked_at = 0.0
+        self._dirty = False
+        self._loaded = False
+        self._popular: Dict[int, Tuple[float, List[int]]] = {}
+        self._pruned_on: Optional[date] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # ===== Writes =====
+    def record(self, article_id: int, at: float = None) -> None:
+        at = at or time.time()
+        with self._lock:
+            if at - self._epoch > self.REBASE_AFTER:
+                factor = math.exp(-self.rate * (at - self._epoch))
+                self._scores = {k: v * factor for k, v in self._scores.items()}
+                self._epoch = at
+            self._pending[article_id] += 1
+            self._scores[article_id] = self._scores.get(article_id, 0.0) + math.exp(self.rate * (at - self._epoch))
+            self._dirty = True
+            if len(self._scores) > 2 * self.capacity:
+                self._scores = dict(heapq.nlargest(self.capacity, self._scores.items(), key=itemgetter(1)))
+
+    def _upsert(self, db: Session, day: date, counts: Counter) -> None:
+        dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+        stmt = dialect.insert(models.ArticleViewDaily)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["article_id", "day"],
+            set_={"views": models.ArticleViewDaily.views + stmt.excluded.views},
+        )
+        db.execute(stmt, [{"article_id": k, "day": day, "views": n} for k, n in counts.items()])
+
+    def flush(self, db: Session) -> int:
+        """Write unflushed views to today's rollup, then reload scores. Returns the views written."""
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        today = utc_today()
+        if pending:
+            try:
+                self._upsert(db, today, pending)
+                db.commit()
+            except Exception:
+                db.rollback()
+                with self._lock:
+                    self._pending.update(pending)
+                raise
+        if self._pruned_on != today:
+            db.query(models.ArticleViewDaily).filter(
+                models.ArticleViewDaily.day < today - timedelta(days=VIEW_ROLLUP_RETENTION_DAYS)
+            ).delete(synchronize_session=False)
+            db.commit()
+            self._pruned_on = today
+        self.load(db)
+        return sum(pending.values())
+
+    def load(self, db: Session) -> None:
+        """Rebuild scores from the rollups of the last HISTORY_DAYS days plus unflushed local views."""
+        now = time.time()
+        since = utc_today() - timedelta(days=HISTORY_DAYS - 1)
+        rows = db.query(
+            models.ArticleViewDaily.article_id, models.ArticleViewDaily.day, models.ArticleViewDaily.views,
+        ).filter(models.ArticleViewDaily.day >= since).all()
+        scores: Dict[int, float] = {}
+        for article_id, day, views in rows:
+            weight = math.exp(-self.rate * max(0.0, now - day_midpoint(day)))
+            scores[article_id] = scores.get(article_id, 0.0) + views * weight
+        with self._lock:
+            for article_id, views in self._pending.items():
+                scores[article_id] = scores.get(article_id, 0.0) + views
+            self._epoch = now
+            self._scores = dict(heapq.nlargest(self.capacity, scores.items(), key=itemgetter(1)))
+            self._dirty = True
+            self._loaded = True
+            self._popular.clear()
+
+    def reset(self) -> None:
+        """Forget all scores and unflushed views; reads start empty rather than from the rollups."""
+        with self._lock:
+            self._scores.clear()
+            self._pending.clear()
+            self._ranking = []
+            self._dirty = False
+            self._loaded = True
+            self._popular.clear()
+
+    # ===== Reads =====
+    def ensure_loaded(self, db: Session) -> None:
+        # Without the lifespan task (tests, scripts) load once on first use
+        if not self._loaded:
+            self.load(db)
+
+    def top(self, k: int) -> List[int]:
+        """Article ids by decayed score, best first."""
+        with self._lock:
+            if self._dirty and time.monotonic() - self._ranked_at >= self.RANKING_TTL:
+                self._ranking = [
+                    article_id for article_id, _ in
+                    heapq.nlargest(self.capacity, self._scores.items(), key=itemgetter(1))
+                ]
+                self._dirty = False
+                self._ranked_at = time.monotonic()
+            return self._ranking[:k]
+
+    def score(self, article_id: int) -> float:
+        """Decayed view count as of now (one fresh view = 1.0)."""
+        with self._lock:
+            raw = self._scores.get(article_id, 0.0)
+            return raw * math.exp(-self.rate * (time.time() - self._epoch))
+
+    def popular(self, db: Session, days: int, k: int) -> List[int]:
+        """Article ids by total views over the last `days` UTC days, cached until the next flush."""
+        cached = self._popular.get(days)
+        if cached is None or time.monotonic() - cached[0] >= TRENDING_FLUSH_INTERVAL:
+            since = utc_today() - timedelta(days=days - 1)
+            total = func.sum(models.ArticleViewDaily.views)
+            rows = db.query(models.ArticleViewDaily.article_id).filter(
+                models.ArticleViewDaily.day >= since
+            ).group_by(models.ArticleViewDaily.article_id).order_by(
+                total.desc(), models.ArticleViewDaily.article_id
+            ).limit(POPULAR_SIZE).all()
+            cached = (time.monotonic(), [row.article_id for row in rows])
+            self._popular[days] = cached
+        return cached[1][:k]
+
+    # ===== Background flush =====
+    def flush_now(self) -> int:
+        db = SessionLocal()
+        try:
+            return self.flush(db)
+        finally:
+            db.close()
+
+    async def start(self) -> None:
+        if self._task is None and TRENDING_ENABLED:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            # Don't lose the last interval's views on a graceful shutdown
+            try:
+                await asyncio.to_thread(self.flush_now)
+            except Exception as e:
+                logger.error("Final view flush failed: %s", e)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.flush_now)
+            except Exception as e:
+                logger.error("View flush failed: %s", e)
+            await asyncio.sleep(TRENDING_FLUSH_INTERVAL)
+
+
+tracker = TrendingTracker()
+
+
+def daily_views(db: Session, days: int = 30) -> List[dict]:
+    """Site-wide views per UTC day for the dashboard, oldest first, missing days as 0."""
+    today = utc_today()
+    since = today - timedelta(days=days - 1)
+    rows = db.query(models.ArticleViewDaily.day, func.sum(models.ArticleViewDaily.views)).filter(
+        models.ArticleViewDaily.day >= since
+    ).group_by(models.ArticleViewDaily.day).all()
+    totals = {day: int(views) for day, views in rows}
+    return [
+        {"day": (since + timedelta(days=i)).isoformat(), "views": totals.get(since + timedelta(days=i), 0)}
+        for i in range(days)
+    ]
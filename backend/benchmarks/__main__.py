@@ -0,0 +1,245 @@
+"""Reproducible benchmark run: seeded corpus, micro-benchmarks and an in-process load sweep.
+
+Run from backend/:
+
+    python -m benchmarks run --articles 1000 --output results.json
+    python -m benchmarks semantic --sizes 10000 100000
+    python -m benchmarks compression [--from-db]
+    python -m benchmarks compare before.json after.json
+
+Everything happens in a throwaway working directory (uploads, snapshots, SQLite
+database) with an in-memory Elasticsearch stub, so two runs on the same commit
+and machine are comparable. Set DATABASE_URL / --es-url to benchmark against
+real services instead.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+COMPARE_METRICS = ("p50_ms", "p95_ms", "p99_ms", "throughput_rps", "mean_ms")
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def prepare_environment(workdir: Path, es_url: str = None) -> str:
+    """Point the app at throwaway storage; must run before anything imports app.*"""
+    if "DATABASE_URL" not in os.environ:
+        os.environ["DATABASE_URL"] = f"sqlite:///{workdir / 'bench.db'}"
+    if not es_url:
+        from . import es_stub
+        es_url = es_stub.start()
+    os.environ["ELASTICSEARCH_URL"] = es_url
+    os.environ.setdefault("SNAPSHOT_DIR", str(workdir / "snapshots"))
+    os.environ.setdefault("FEED_CACHE_DIR", str(workdir / "cache" / "feeds"))
+    os.chdir(workdir)
+    return es_url
+
+
+def run(args) -> dict:
+    commit = git_commit()
+    sys.path.insert(0, os.getcwd())
+    output = Path(args.output).resolve() if args.output else None
+    workdir = Path(tempfile.mkdtemp(prefix="blog-bench-"))
+    es_url = prepare_environment(workdir, args.es_url)
+
+    from app import models
+    from app.database import SessionLocal
+    from app.main import app
+    from app.routes import get_article_query
+    from app.search import bulk_index_articles, ensure_index
+    from app.startup import prepare_upload_dirs, upgrade_database
+
+    from .corpus import seed_corpus
+    from .load import run_load
+    from .micro import run_micro
+
+    started = time.perf_counter()
+    upgrade_database()
+    prepare_upload_dirs()
+    db = SessionLocal()
+    try:
+        corpus = seed_corpus(db, articles=args.articles, zh_ratio=args.zh_ratio, tags=args.tags,
+                             images_per_article=args.images, seed=args.seed)
+        ensure_index()
+        indexed = 0
+        for offset in range(0, args.articles, 500):
+            indexed += bulk_index_articles(
+                get_article_query(db).order_by(models.Article.id).offset(offset).limit(500).all())
+        article_ids = [row.id for row in db.query(models.Article.id).filter(models.Article.is_published == True)]
+    finally:
+        db.close()
+    corpus["indexed"] = indexed
+    corpus["seed_seconds"] = round(time.perf_counter() - started, 2)
+    print(f"seeded {corpus['articles']} articles in {corpus['seed_seconds']}s", file=sys.stderr)
+
+    results = {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "database": os.environ["DATABASE_URL"].split("://", 1)[0],
+        "elasticsearch": "stub" if not args.es_url else es_url,
+        "corpus": corpus,
+        "micro": run_micro(repeat=args.repeat, zh_ratio=args.zh_ratio),
+    }
+    print("micro-benchmarks done", file=sys.stderr)
+    if not args.skip_load:
+        results["load"] = run_load(app, article_ids, requests_per_level=args.requests,
+                                   levels=args.concurrency, only=args.only)
+
+    write_results(results, output)
+    return results
+
+
+def write_results(results: dict, output) -> None:
+    text = json.dumps(results, ensure_ascii=False, indent=2)
+    if output:
+        output.write_text(text, encoding="utf-8")
+        print(f"wrote {output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+def semantic(args) -> dict:
+    sys.path.insert(0, os.getcwd())
+    output = Path(args.output).resolve() if args.output else None
+    from .semantic import run_semantic
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "semantic": run_semantic(sizes=args.sizes, dim=args.dim, repeat=args.repeat,
+                                 zh_ratio=args.zh_ratio, seed=args.seed),
+    }
+    write_results(results, output)
+    return results
+
+
+def compression(args) -> dict:
+    sys.path.insert(0, os.getcwd())
+    output = Path(args.output).resolve() if args.output else None
+    from .compression import run_compression
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "compression": run_compression(from_db=args.from_db, repeat=args.repeat,
+                                       zh_ratio=args.zh_ratio, seed=args.seed),
+    }
+    write_results(results, output)
+    return results
+
+
+def flatten(results: dict) -> dict:
+    """(section, name, concurrency, metric) -> value for everything comparable."""
+    rows = {}
+    for name, stats in results.get("micro", {}).items():
+        if isinstance(stats, dict):
+            for metric in COMPARE_METRICS:
+                if metric in stats:
+                    rows[("micro", name, "", metric)] = stats[metric]
+    for name, levels in results.get("load", {}).items():
+        for level in levels:
+            for metric in COMPARE_METRICS:
+                if metric in level:
+                    rows[("load", name, level["concurrency"], metric)] = level[metric]
+    for size, benches in results.get("semantic", {}).items():
+        if not isinstance(benches, dict):
+            continue
+        for metric in COMPARE_METRICS:
+            if metric in benches:  # size-independent, e.g. vectorize
+                rows[("semantic", size, "", metric)] = benches[metric]
+        for name, stats in benches.items():
+            if isinstance(stats, dict):
+                for metric in COMPARE_METRICS:
+                    if metric in stats:
+                        rows[("semantic", name, size, metric)] = stats[metric]
+    for payload, codecs in results.get("compression", {}).items():
+        if not isinstance(codecs, dict):
+            continue
+        for codec, stats in codecs.items():
+            if isinstance(stats, dict):
+                for metric in COMPARE_METRICS + ("ratio",):
+                    if metric in stats:
+                        rows[("compression", codec, payload, metric)] = stats[metric]
+    return rows
+
+
+def compare(args) -> None:
+    before = json.loads(Path(args.before).read_text(encoding="utf-8"))
+    after = json.loads(Path(args.after).read_text(encoding="utf-8"))
+    print(f"before: {before.get('commit', '?')[:10]} {before.get('timestamp', '')}")
+    print(f"after:  {after.get('commit', '?')[:10]} {after.get('timestamp', '')}")
+    a, b = flatten(before), flatten(after)
+    print(f"{'benchmark':<40}{'c':>4} {'metric':<16}{'before':>12}{'after':>12}{'change':>10}")
+    for key in sorted(a.keys() & b.keys(), key=lambda k: (k[0], k[1], str(k[2]).zfill(4), k[3])):
+        section, name, concurrency, metric = key
+        old, new = a[key], b[key]
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        print(f"{section + '.' + name:<40}{concurrency!s:>4} {metric:<16}{old:>12}{new:>12}{change:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("run", help="seed a corpus and run micro + load benchmarks")
+    p.add_argument("--articles", type=int, default=1000)
+    p.add_argument("--tags", type=int, default=50)
+    p.add_argument("--images", type=int, default=2, help="images per article")
+    p.add_argument("--zh-ratio", type=float, default=0.6, help="share of Chinese paragraphs")
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--repeat", type=int, default=200, help="micro-benchmark iterations")
+    p.add_argument("--requests", type=int, default=200, help="requests per concurrency level")
+    p.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    p.add_argument("--only", nargs="+", choices=["list", "detail", "search", "upload"])
+    p.add_argument("--skip-load", action="store_true")
+    p.add_argument("--es-url", help="benchmark against a real Elasticsearch instead of the stub")
+    p.add_argument("--output", help="write JSON results here instead of stdout")
+    p.set_defaults(func=run)
+
+    s = sub.add_parser("semantic", help="semantic index build and query latency by corpus size")
+    s.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    s.add_argument("--dim", type=int, default=None, help="vector size (default: SEMANTIC_DIM)")
+    s.add_argument("--zh-ratio", type=float, default=0.6, help="share of Chinese paragraphs")
+    s.add_argument("--seed", type=int, default=42)
+    s.add_argument("--repeat", type=int, default=200, help="queries per measurement")
+    s.add_argument("--output", help="write JSON results here instead of stdout")
+    s.set_defaults(func=semantic)
+
+    z = sub.add_parser("compression", help="gzip/brotli CPU time vs bytes by level on article payloads")
+    z.add_argument("--from-db", action="store_true", help="use articles from DATABASE_URL instead of synthetic ones")
+    z.add_argument("--zh-ratio", type=float, default=0.6, help="share of Chinese paragraphs")
+    z.add_argument("--seed", type=int, default=42)
+    z.add_argument("--repeat", type=int, default=50, help="iterations per measurement")
+    z.add_argument("--output", help="write JSON results here instead of stdout")
+    z.set_defaults(func=compression)
+
+    c = sub.add_parser("compare", help="diff two result files")
+    c.add_argument("before")
+    c.add_argument("after")
+    c.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
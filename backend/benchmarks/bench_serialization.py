@@ -0,0 +1,121 @@
+"""Serialization share of the article list endpoints, Pydantic path vs ORM -> orjson path.
+
+Run from backend/:  python -m benchmarks.bench_serialization [--repeat 50]
+
+Uses a throwaway SQLite database unless DATABASE_URL is already set.
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime
+from typing import List
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+os.environ.setdefault("ELASTICSEARCH_URL", "http://127.0.0.1:9")
+
+import orjson  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+from app import models, schemas, serializers  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from app.main import app  # noqa: E402
+from app.startup import upgrade_database  # noqa: E402
+
+SIZES = [10, 50, 200]
+PARAGRAPH = "<p>這是一段測試內容，用來模擬真實文章的長度。Mixed English words appear here too.</p>"
+
+
+def make_article(i: int, category, tags) -> models.Article:
+    now = datetime.utcnow()
+    article = models.Article(
+        id=i, title=f"Benchmark article {i}", slug=f"benchmark-article-{i}",
+        content=f'<p><img src="/uploads/original/img{i}.jpg"></p>' + PARAGRAPH * 40,
+        summary="摘要" * 20, author="Itsour", category_id=category.id,
+        is_published=True, view_count=i, featured=False, reading_time=3,
+        created_at=now, updated_at=now,
+    )
+    article.category_rel = category
+    article.tags = tags
+    article.images = [
+        models.Image(id=i * 10 + k, filename=f"img{i}_{k}.jpg", filepath=f"uploads/original/img{i}_{k}.jpg",
+                     article_id=i, thumbnail_path=f"uploads/thumbnail/img{i}_{k}.jpg",
+                     medium_path=f"uploads/medium/img{i}_{k}.jpg", width=1600, height=900,
+                     file_size=250_000, uploaded_at=now)
+        for k in range(2)
+    ]
+    return article
+
+
+def pydantic_path(articles, adapter) -> bytes:
+    # What FastAPI does for response_model: validate, dump to JSON-safe python, json.dumps
+    content = adapter.dump_python(adapter.validate_python(articles), mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def fast_path(articles) -> bytes:
+    return orjson.dumps(serializers.article_list(articles))
+
+
+def timed_ms(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def seed(count: int) -> None:
+    upgrade_database()
+    db = SessionLocal()
+    try:
+        have = db.query(models.Article).count()
+        if have >= count:
+            return
+        category = models.Category(name="bench-serialization", slug="bench-serialization")
+        tags = [models.Tag(name=f"bench-ser-{k}") for k in range(3)]
+        for i in range(have, count):
+            article = models.Article(title=f"Seeded {i}", slug=f"seeded-{i}",
+                                     content=PARAGRAPH * 40, category_rel=category, tags=tags)
+            db.add(article)
+        db.commit()
+    finally:
+        db.close()
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    adapter = TypeAdapter(List[schemas.ArticleListResponse])
+    category = models.Category(id=1, name="Python", slug="python", description="", color="#FFC107")
+    tags = [models.Tag(id=k, name=f"tag{k}", color="#667eea") for k in range(3)]
+
+    seed(max(SIZES))
+    client = TestClient(app)
+    for size in SIZES:
+        articles = [make_article(i, category, tags) for i in range(size)]
+        before = timed_ms(lambda: pydantic_path(articles, adapter), args.repeat)
+        after = timed_ms(lambda: fast_path(articles), args.repeat)
+        endpoint = timed_ms(lambda: client.get("/api/articles/", params={"limit": size}), args.repeat)
+        print(json.dumps({
+            "items": size,
+            "pydantic_ms": round(before, 3),
+            "orjson_ms": round(after, 3),
+            "speedup": round(before / after, 1) if after else None,
+            "endpoint_ms": round(endpoint, 3),
+            # share of the request spent serializing, estimated for the old path
+            # by swapping the measured serializer cost into the endpoint time
+            "share_before": round(before / (endpoint - after + before), 3),
+            "share_after": round(after / endpoint, 3),
+        }))
+
+
+if __name__ == "__main__":
+    main()
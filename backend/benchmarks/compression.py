@@ -0,0 +1,94 @@
+"""Compression benchmark: CPU time vs bytes saved per encoding and level, by article payload size.
+
+Payloads are article detail responses. With --from-db they are serialized
+from the configured DATABASE_URL (smallest, median, p90 and largest
+article); otherwise synthetic articles are built at fixed sizes. The
+synthetic text repeats a small sentence pool and compresses better than real
+prose, so pick levels from a --from-db run.
+"""
+import gzip
+import random
+from datetime import datetime
+
+import orjson
+
+from .corpus import paragraph
+from .micro import measure
+
+GZIP_LEVELS = (1, 4, 6, 9)
+BROTLI_QUALITIES = (1, 4, 5, 7, 11)
+SYNTHETIC_KB = (2, 8, 32, 128)
+
+
+def synthetic_payloads(zh_ratio: float, seed: int) -> dict:
+    rng = random.Random(seed)
+    payloads = {}
+    for kb in SYNTHETIC_KB:
+        content = ""
+        while len(content.encode()) < kb * 1024:
+            content += paragraph(rng, zh_ratio)
+        article = {
+            "id": kb, "title": f"Synthetic {kb} KB", "slug": f"synthetic-{kb}", "content": content,
+            "summary": None, "author": "Itsour", "category_id": None, "category": None,
+            "is_published": True, "publish_at": None, "featured": False, "view_count": 0,
+            "reading_time": 1, "created_at": datetime(2024, 1, 1), "updated_at": datetime(2024, 1, 1),
+            "images": [], "tags": [],
+        }
+        payloads[f"synthetic-{kb}kb"] = orjson.dumps(article)
+    return payloads
+
+
+def database_payloads() -> dict:
+    from app import models, serializers
+    from app.database import SessionLocal
+    from app.routes import get_article_query
+    from sqlalchemy import func
+
+    db = SessionLocal()
+    try:
+        sizes = db.query(models.Article.id, func.length(models.Article.content)).order_by(
+            func.length(models.Article.content)).all()
+        if not sizes:
+            raise SystemExit("no articles in the database")
+        picks = {
+            "smallest": sizes[0][0],
+            "median": sizes[len(sizes) // 2][0],
+            "p90": sizes[int(len(sizes) * 0.9)][0],
+            "largest": sizes[-1][0],
+        }
+        payloads = {}
+        for name, article_id in picks.items():
+            article = get_article_query(db).filter(models.Article.id == article_id).one()
+            payloads[name] = orjson.dumps(serializers.article_dict(article))
+        return payloads
+    finally:
+        db.close()
+
+
+def run_compression(from_db: bool = False, repeat: int = 50, zh_ratio: float = 0.6, seed: int = 42) -> dict:
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+
+    payloads = database_payloads() if from_db else synthetic_payloads(zh_ratio, seed)
+    codecs = [(f"gzip-{level}", lambda data, level=level: gzip.compress(data, compresslevel=level, mtime=0),
+               gzip.decompress) for level in GZIP_LEVELS]
+    if brotli:
+        codecs += [(f"br-{q}", lambda data, q=q: brotli.compress(data, quality=q), brotli.decompress)
+                   for q in BROTLI_QUALITIES]
+
+    results = {"source": "database" if from_db else "synthetic", "brotli": brotli is not None}
+    for name, raw in payloads.items():
+        section = {"bytes": len(raw)}
+        for codec, pack, unpack in codecs:
+            packed = pack(raw)
+            stats = measure(lambda: pack(raw), repeat)
+            stats["bytes"] = len(packed)
+            stats["ratio"] = round(len(packed) / len(raw), 4)
+            stats["decompress_ms"] = measure(lambda: unpack(packed), repeat)["mean_ms"]
+            # Compression throughput: how much payload one core gets through per second
+            stats["mb_per_s"] = round(len(raw) / 2 ** 20 / (stats["mean_ms"] / 1000), 1) if stats["mean_ms"] else None
+            section[codec] = stats
+        results[name] = section
+    return results
@@ -0,0 +1,90 @@
+"""Reproducible synthetic corpus: Chinese/English articles with tags, categories and images."""
+import io
+import random
+from datetime import datetime, timedelta
+
+from PIL import Image as PILImage
+
+ZH_SENTENCES = [
+    "今天我們來聊聊如何在容器中部署後端服務。",
+    "資料庫索引的設計會直接影響查詢效能。",
+    "這篇文章記錄了我在旅行途中拍攝的照片與心得。",
+    "全文搜尋需要適當的分詞器才能處理中文內容。",
+    "快取策略的選擇取決於讀寫比例與資料一致性需求。",
+]
+EN_SENTENCES = [
+    "This post walks through profiling a slow endpoint step by step.",
+    "Connection pooling keeps latency predictable under load.",
+    "We compare several approaches to image thumbnail generation.",
+    "Pagination with offsets gets slower as the archive grows.",
+    "Serialization cost often dominates small JSON responses.",
+]
+
+
+def paragraph(rng: random.Random, zh_ratio: float) -> str:
+    pool = ZH_SENTENCES if rng.random() < zh_ratio else EN_SENTENCES
+    return "<p>" + "".join(rng.choice(pool) + (" " if pool is EN_SENTENCES else "") for _ in range(rng.randint(3, 8))) + "</p>"
+
+
+def article_html(rng: random.Random, zh_ratio: float, image_paths) -> str:
+    parts = [paragraph(rng, zh_ratio) for _ in range(rng.randint(4, 20))]
+    for path in image_paths:
+        parts.insert(rng.randint(0, len(parts)), f'<figure><img src="/{path}" alt=""></figure>')
+    parts.insert(rng.randint(0, len(parts)), "<pre><code>print('hello')</code></pre>")
+    return "".join(parts)
+
+
+def jpeg_bytes(width: int = 1600, height: int = 1200, seed: int = 0) -> bytes:
+    rng = random.Random(seed)
+    img = PILImage.new("RGB", (width, height), tuple(rng.randint(0, 255) for _ in range(3)))
+    for _ in range(40):
+        x, y = rng.randint(0, width - 100), rng.randint(0, height - 100)
+        img.paste(tuple(rng.randint(0, 255) for _ in range(3)), (x, y, x + 100, y + 100))
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+def seed_corpus(db, articles: int = 1000, zh_ratio: float = 0.6, tags: int = 50,
+                categories: int = 8, images_per_article: int = 2, seed: int = 42) -> dict:
+    """Insert the corpus with bulk inserts; image rows point at paths, files are not written."""
+    from app import models
+
+    rng = random.Random(seed)
+    cats = [models.Category(name=f"bench-category-{i}", slug=f"bench-category-{i}") for i in range(categories)]
+    tag_rows = [models.Tag(name=f"bench-tag-{i}") for i in range(tags)]
+    db.add_all(cats + tag_rows)
+    db.flush()
+
+    now = datetime.utcnow()
+    batch = []
+    for i in range(articles):
+        paths = [f"uploads/original/bench_{i}_{k}.jpg" for k in range(images_per_article)]
+        created = now - timedelta(hours=i)
+        article = models.Article(
+            title=f"{'效能筆記' if rng.random() < zh_ratio else 'Performance notes'} #{i}",
+            slug=f"bench-{seed}-{i}",
+            content=article_html(rng, zh_ratio, paths),
+            summary="", author="Itsour",
+            category_id=rng.choice(cats).id,
+            is_published=rng.random() < 0.9,
+            view_count=rng.randint(0, 5000),
+            reading_time=rng.randint(1, 12),
+            created_at=created, updated_at=created,
+        )
+        article.tags = rng.sample(tag_rows, rng.randint(1, min(4, tags)))
+        article.images = [
+            models.Image(filename=p.rsplit("/", 1)[1], filepath=p, width=1600, height=1200,
+                         medium_path=p.replace("original", "medium"),
+                         thumbnail_path=p.replace("original", "thumbnail"), file_size=200_000)
+            for p in paths
+        ]
+        batch.append(article)
+        if len(batch) == 500:
+            db.add_all(batch)
+            db.flush()
+            batch = []
+    db.add_all(batch)
+    db.commit()
+    return {"articles": articles, "tags": tags, "categories": categories,
+            "images": articles * images_per_article, "zh_ratio": zh_ratio, "seed": seed}
@@ -0,0 +1,98 @@
+"""In-memory stand-in for the handful of Elasticsearch APIs the app calls.
+
+Good enough to exercise index/bulk/search/delete code paths and their latency
+without a JVM; search is a naive substring match scored by field weights.
+"""
+import json
+import socket
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request, Response
+
+HEADERS = {"X-Elastic-Product": "Elasticsearch"}
+WEIGHTS = {"title": 5, "tags": 3, "category": 3, "content": 1}
+
+app = FastAPI()
+indices = {}
+
+
+def reply(body, status=200):
+    return Response(json.dumps(body), status_code=status, media_type="application/json", headers=HEADERS)
+
+
+@app.get("/")
+def info():
+    return reply({"version": {"number": "8.11.0"}, "tagline": "You Know, for Search"})
+
+
+@app.post("/_bulk")
+@app.put("/_bulk")
+async def bulk(request: Request):
+    lines = [json.loads(line) for line in (await request.body()).splitlines() if line.strip()]
+    items = []
+    i = 0
+    while i < len(lines):
+        action, meta = next(iter(lines[i].items()))
+        index, doc_id = meta["_index"], str(meta["_id"])
+        if action == "delete":
+            indices.get(index, {}).pop(doc_id, None)
+            i += 1
+        else:
+            indices.setdefault(index, {})[doc_id] = lines[i + 1]
+            i += 2
+        items.append({action: {"_index": index, "_id": doc_id, "status": 200}})
+    return reply({"took": 1, "errors": False, "items": items})
+
+
+@app.head("/{index}")
+def index_exists(index: str):
+    return Response(status_code=200 if index in indices else 404, headers=HEADERS)
+
+
+@app.put("/{index}")
+def create_index(index: str):
+    indices.setdefault(index, {})
+    return reply({"acknowledged": True, "index": index})
+
+
+@app.put("/{index}/_doc/{doc_id}")
+@app.post("/{index}/_doc/{doc_id}")
+async def index_doc(index: str, doc_id: str, request: Request):
+    indices.setdefault(index, {})[doc_id] = await request.json()
+    return reply({"_index": index, "_id": doc_id, "result": "created"}, 201)
+
+
+@app.delete("/{index}/_doc/{doc_id}")
+def delete_doc(index: str, doc_id: str):
+    found = indices.get(index, {}).pop(doc_id, None) is not None
+    return reply({"_index": index, "_id": doc_id, "result": "deleted" if found else "not_found"},
+                 200 if found else 404)
+
+
+@app.post("/{index}/_search")
+async def search(index: str, request: Request):
+    body = await request.json()
+    query = body.get("query", {}).get("multi_match", {}).get("query", "").lower()
+    hits = []
+    for doc_id, doc in indices.get(index, {}).items():
+        score = sum(w * str(doc.get(field, "")).lower().count(query) for field, w in WEIGHTS.items())
+        if score:
+            hits.append({"_id": doc_id, "_score": float(score), "_source": doc})
+    hits.sort(key=lambda h: -h["_score"])
+    size = body.get("size", 10)
+    return reply({"took": 1, "hits": {"total": {"value": len(hits)}, "hits": hits[:size]}})
+
+
+def start() -> str:
+    """Run the stub on a free local port in a daemon thread and return its URL."""
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}"
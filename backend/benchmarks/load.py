@@ -0,0 +1,85 @@
+"""In-process load test: a concurrency sweep over the hot endpoints through httpx's ASGI transport."""
+import asyncio
+import itertools
+import random
+import time
+
+import httpx
+
+from .corpus import jpeg_bytes
+from .micro import percentile
+
+CONCURRENCY_LEVELS = [1, 4, 16, 64]
+SEARCH_TERMS = ["效能", "快取", "pooling", "serialization", "資料庫", "image"]
+
+
+def scenarios(article_ids, upload_image: bytes):
+    """name -> coroutine factory taking (client, request number)."""
+    rng = random.Random(1)
+    counter = itertools.count()
+
+    async def article_list(client):
+        page = rng.randint(0, 20)
+        return await client.get(f"/api/articles/?published_only=true&limit=10&skip={page * 10}")
+
+    async def article_detail(client):
+        return await client.get(f"/api/articles/{rng.choice(article_ids)}")
+
+    async def search(client):
+        return await client.get("/api/articles/search/query", params={"q": rng.choice(SEARCH_TERMS)})
+
+    async def upload(client):
+        name = f"bench_{next(counter)}.jpg"
+        return await client.post("/api/media/upload", files={"file": (name, upload_image, "image/jpeg")})
+
+    return {"list": article_list, "detail": article_detail, "search": search, "upload": upload}
+
+
+async def sweep(client, request, concurrency: int, total: int) -> dict:
+    latencies, errors = [], 0
+    remaining = itertools.count()
+
+    async def worker():
+        nonlocal errors
+        while next(remaining) < total:
+            start = time.perf_counter()
+            try:
+                response = await request(client)
+                ok = response.status_code < 400
+            except Exception:
+                ok = False
+            latencies.append((time.perf_counter() - start) * 1000)
+            errors += not ok
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+    }
+
+
+async def run_load_async(app, article_ids, requests_per_level: int, levels, only=None) -> dict:
+    upload_image = jpeg_bytes(1200, 800, seed=3)
+    transport = httpx.ASGITransport(app=app)
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, request in scenarios(article_ids, upload_image).items():
+            if only and name not in only:
+                continue
+            # Uploads are an order of magnitude slower; keep the sweep short
+            total = requests_per_level if name != "upload" else max(8, requests_per_level // 10)
+            await request(client)  # warm-up
+            results[name] = [await sweep(client, request, c, max(total, c)) for c in levels]
+    return results
+
+
+def run_load(app, article_ids, requests_per_level: int = 200, levels=CONCURRENCY_LEVELS, only=None) -> dict:
+    return asyncio.run(run_load_async(app, article_ids, requests_per_level, levels, only))
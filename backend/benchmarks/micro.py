@@ -0,0 +1,69 @@
+"""Micro-benchmarks for the CPU-bound helpers on the request path."""
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from .corpus import article_html, jpeg_bytes
+
+
+def measure(fn, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "repeat": repeat,
+        "mean_ms": round(statistics.fmean(samples), 4),
+        "p50_ms": round(percentile(samples, 50), 4),
+        "p95_ms": round(percentile(samples, 95), 4),
+    }
+
+
+def percentile(sorted_samples, pct: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    k = (len(sorted_samples) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_samples) - 1)
+    return sorted_samples[lo] + (sorted_samples[hi] - sorted_samples[lo]) * (k - lo)
+
+
+def run_micro(repeat: int = 200, zh_ratio: float = 0.6) -> dict:
+    from app import models, schemas, serializers
+    from app.image_utils import process_image
+    from app.routes import calculate_reading_time, sanitize_html
+
+    rng = random.Random(7)
+    html = article_html(rng, zh_ratio, ["uploads/original/a.jpg", "uploads/original/b.jpg"]) * 3
+    dirty = html + '<script>alert(1)</script><p onclick="x()">evil</p>'
+
+    results = {
+        "content_bytes": len(html.encode("utf-8")),
+        "calculate_reading_time": measure(lambda: calculate_reading_time(html), repeat),
+        "sanitize_html": measure(lambda: sanitize_html(dirty), repeat),
+    }
+
+    image = jpeg_bytes()
+    tmpdir = tempfile.mkdtemp()
+
+    def process_once():
+        path = os.path.join(tmpdir, "upload.jpg")
+        with open(path, "wb") as f:
+            f.write(image)
+        process_image(path, "upload.jpg")
+
+    results["process_image_1600x1200"] = measure(process_once, max(5, repeat // 20))
+
+    from .bench_serialization import make_article
+    category = models.Category(id=1, name="Python", slug="python", description="", color="#FFC107")
+    tags = [models.Tag(id=k, name=f"tag{k}", color="#667eea") for k in range(3)]
+    articles = [make_article(i, category, tags) for i in range(50)]
+    results["serialize_detail_pydantic"] = measure(
+        lambda: schemas.ArticleResponse.model_validate(articles[0]).model_dump(mode="json"), repeat)
+    results["serialize_detail_fast"] = measure(lambda: serializers.article_dict(articles[0]), repeat)
+    results["serialize_list50_fast"] = measure(lambda: serializers.article_list(articles), repeat // 4)
+    return results
@@ -0,0 +1,58 @@
+"""Semantic index benchmark: build time, disk size and top-k query latency by corpus size."""
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from .corpus import paragraph
+from .micro import measure
+
+QUERIES = ["資料庫索引", "全文搜尋 分詞", "image thumbnail generation", "容器 部署", "slow endpoint profiling"]
+
+
+def synthetic_texts(count: int, zh_ratio: float, seed: int):
+    rng = random.Random(seed)
+    for article_id in range(1, count + 1):
+        yield article_id, " ".join(paragraph(rng, zh_ratio) for _ in range(rng.randint(2, 6)))
+
+
+def run_semantic(sizes=(10000, 100000), dim: int = None, repeat: int = 200,
+                 zh_ratio: float = 0.6, seed: int = 42) -> dict:
+    from app.semantic import SEMANTIC_DIM, SemanticIndex, article_text
+
+    dim = dim or SEMANTIC_DIM
+    results = {"dim": dim}
+    rng = random.Random(seed)
+    sample = article_text("標題 title", None, "".join(paragraph(rng, zh_ratio) for _ in range(12)))
+    scratch = SemanticIndex(Path(tempfile.mkdtemp(prefix="semantic-bench-")), dim)
+    results["vectorize"] = measure(lambda: scratch.vectorize(sample), repeat)
+
+    for size in sizes:
+        directory = Path(tempfile.mkdtemp(prefix="semantic-bench-"))
+        try:
+            index = SemanticIndex(directory, dim)
+            started = time.perf_counter()
+            index.rebuild(synthetic_texts(size, zh_ratio, seed))
+            build_seconds = time.perf_counter() - started
+
+            # A fresh instance maps the files like a newly started worker would
+            index = SemanticIndex(directory, dim)
+            started = time.perf_counter()
+            index.search(QUERIES[0])
+            cold_ms = (time.perf_counter() - started) * 1000
+
+            vectors = [index.vectorize(q) for q in QUERIES]
+            counter = iter(range(10 ** 9))
+            results[str(size)] = {
+                "build_seconds": round(build_seconds, 2),
+                "disk_mb": round(sum(p.stat().st_size for p in directory.iterdir()) / 2 ** 20, 1),
+                "cold_query_ms": round(cold_ms, 3),
+                "top_k": measure(lambda: index.top_k(vectors[next(counter) % len(vectors)], 10), repeat),
+                "similar": measure(lambda: index.similar(rng.randint(1, size), 10), repeat),
+                "upsert": measure(lambda: index.upsert_many([(rng.randint(1, size), sample)]), min(repeat, 50)),
+            }
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+    shutil.rmtree(scratch.directory, ignore_errors=True)
+    return results
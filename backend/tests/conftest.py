@@ -0,0 +1,40 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
+import pytest
+
+# Snapshots, the feed cache and the semantic index go to a throwaway directory,
+# never into the source tree (where a Docker build would pick them up).
+# Set before anything imports app, which reads these at import time.
+_scratch = tempfile.mkdtemp(prefix="itsour-tests-")
+for _name, _sub in (("SNAPSHOT_DIR", "snapshots"), ("FEED_CACHE_DIR", "cache/feeds"),
+                    ("SEMANTIC_DIR", "cache/semantic")):
+    os.environ[_name] = os.path.join(_scratch, _sub)
+
+from app import query_audit  # noqa: E402
+from app.database import engine  # noqa: E402
+from app.startup import prepare_upload_dirs, upgrade_database  # noqa: E402
+
+# Importing the app no longer touches the database or filesystem; build the
+# schema through the migrations so the tests also cover them.
+upgrade_database()
+prepare_upload_dirs()
+
+
+@pytest.fixture
+def query_budget():
+    """Assert the wrapped block runs at most `max_queries` SQL statements.
+
+        with query_budget(2):
+            client.get("/api/articles/")
+    """
+    query_audit.install(engine)
+
+    @contextmanager
+    def budget(max_queries: int, label: str = ""):
+        with query_audit.capture(label) as audit:
+            yield audit
+        assert audit.count <= max_queries, audit.report()
+
+    return budget
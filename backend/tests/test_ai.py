@@ -0,0 +1,140 @@
+import asyncio
+import json
+import socket
+import threading
+import time
+
+import pytest
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.ai_client import AIBusyError, AIClient
+from app.main import app
+
+client = TestClient(app)
+
+# ===== 本地 OpenAI 相容 stub 伺服器 =====
+stub = FastAPI()
+stub_state = {"requests": 0}
+
+
+@stub.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stub_state["requests"] += 1
+    words = ["這是", "一段", "摘要"]
+    if not body.get("stream"):
+        return {"choices": [{"message": {"content": " " + "".join(words) + " "}}]}
+
+    async def chunks():
+        for word in words:
+            yield f"data: {json.dumps({'choices': [{'delta': {'content': word}}]})}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(chunks(), media_type="text/event-stream")
+
+
+@pytest.fixture(scope="module")
+def stub_url():
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    server = uvicorn.Server(uvicorn.Config(stub, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    client.put("/api/settings/", json={
+        "ai_api_key": "sk-test-stub-key",
+        "ai_base_url": f"http://127.0.0.1:{port}/v1",
+    })
+    yield f"http://127.0.0.1:{port}/v1"
+    server.should_exit = True
+    thread.join(timeout=5)
+
+
+def test_generate_summary_uses_stub(stub_url):
+    response = client.post("/api/ai/generate-summary", json={"content": "文章內容", "title": "標題"})
+    assert response.status_code == 200
+    assert response.json() == {"summary": "這是一段摘要"}
+
+
+def test_generate_summary_stream_emits_deltas(stub_url):
+    response = client.post("/api/ai/generate-summary/stream", json={"content": "串流內容", "title": "標題"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [e for e in response.text.split("\n\n") if e]
+    deltas = [json.loads(e[len("data: "):])["delta"] for e in events if e.startswith("data: ")]
+    assert deltas == ["這是", "一段", "摘要"]
+    assert events[-1].startswith("event: done")
+    assert json.loads(events[-1].split("data: ", 1)[1]) == {"summary": "這是一段摘要"}
+
+
+def test_stream_releases_slot_when_body_never_runs(stub_url, monkeypatch):
+    """客戶端在串流開始前斷線不會佔住名額；串流完成後摘要寫入快取"""
+    from app import ai_routes
+    from app.database import SessionLocal
+
+    ai = AIClient(max_concurrency=1, queue_timeout=0.05)
+    monkeypatch.setattr(ai_routes, "ai_client", ai)
+
+    async def scenario():
+        db = SessionLocal()
+        try:
+            for i in range(3):
+                req = ai_routes.SummaryRequest(content=f"斷線內容 {i}", title="斷線")
+                await ai_routes.generate_summary_stream(req, db)  # 不讀取 body
+        finally:
+            db.close()
+        async with ai.slot():
+            pass
+        await ai.shutdown()
+
+    asyncio.run(scenario())
+
+    payload = {"content": "串流後快取", "title": "快取"}
+    client.post("/api/ai/generate-summary/stream", json=payload)
+    before = stub_state["requests"]
+    assert client.post("/api/ai/generate-summary", json=payload).json() == {"summary": "這是一段摘要"}
+    assert stub_state["requests"] == before
+
+
+def test_repeat_summary_is_served_from_cache(stub_url):
+    payload = {"content": "快取測試內容", "title": "快取"}
+    first = client.post("/api/ai/generate-summary", json=payload)
+    before = stub_state["requests"]
+    second = client.post("/api/ai/generate-summary", json=payload)
+    assert second.json() == first.json()
+    assert stub_state["requests"] == before
+
+
+def test_backfill_fills_empty_summaries(stub_url):
+    from app.summaries import fill_missing_summaries
+
+    created = client.post("/api/articles/", json={"title": "Backfill me", "content": "<p>需要摘要</p>"}).json()
+    assert not created["summary"]
+    logs = []
+    stats = asyncio.run(fill_missing_summaries(concurrency=2, log=logs.append))
+    assert stats["failed"] == 0
+    assert stats["generated"] + stats["cached"] == stats["total"] >= 1
+    assert client.get(f"/api/articles/{created['id']}").json()["summary"] == "這是一段摘要"
+    # 再跑一次沒有待處理文章（可續跑）
+    assert asyncio.run(fill_missing_summaries(log=logs.append))["total"] == 0
+
+
+def test_concurrency_limit_queues_then_rejects():
+    async def scenario():
+        ai = AIClient(max_concurrency=1, queue_timeout=0.05)
+        async with ai.slot():
+            with pytest.raises(AIBusyError):
+                async with ai.slot():
+                    pass
+        # 釋放後可再次取得
+        async with ai.slot():
+            pass
+        await ai.shutdown()
+
+    asyncio.run(scenario())
@@ -93,6 +93,98 @@ def test_get_stats_with_auth():
     assert "total_articles" in response.json()
 
 
+class TestTokenAuth:
+    """Token 快取、登出撤銷與登入限流"""
+
+    @pytest.fixture(autouse=True)
+    def _reset_auth_state(self):
+        from app import auth
+        auth.login_rate_limiter.reset()
+        auth.token_cache.clear()
+        yield
+        auth.login_rate_limiter.reset()
+
+    def _login(self):
+        response = client.post("/api/auth/login", json={"username": "admin", "password": "admin123"})
+        assert response.status_code == 200
+        return response.json()["access_token"]
+
+    def test_logout_revokes_token(self):
+        token = self._login()
+        headers = {"Authorization": f"Bearer {token}"}
+        assert client.get("/api/auth/me", headers=headers).json() == {"username": "admin"}
+
+        assert client.post("/api/auth/logout", headers=headers).status_code == 200
+        response = client.get("/api/auth/me", headers=headers)
+        assert response.status_code == 401
+        # 其他 Token 不受影響
+        assert client.get("/api/auth/me", headers={"Authorization": f"Bearer {self._login()}"}).status_code == 200
+
+    def test_revocation_from_other_worker_is_synced(self):
+        from datetime import datetime, timedelta
+        from app import auth, models
+        from app.database import SessionLocal
+
+        token = self._login()
+        info = auth.decode_token(token)
+        denylist = auth.TokenDenylist(sync_interval=0)
+        assert not denylist.is_revoked(info.jti)
+
+        db = SessionLocal()
+        db.add(models.RevokedToken(jti=info.jti, expires_at=datetime.utcnow() + timedelta(hours=1)))
+        db.commit()
+        db.close()
+        assert denylist.is_revoked(info.jti)
+
+    def test_verified_tokens_are_cached(self, monkeypatch):
+        from app import auth
+        token = self._login()
+        calls = []
+        real_decode = auth.jwt.decode
+        monkeypatch.setattr(auth.jwt, "decode", lambda *a, **kw: calls.append(1) or real_decode(*a, **kw))
+
+        for _ in range(3):
+            assert auth.decode_token(token).username == "admin"
+        assert len(calls) == 1
+
+    def test_token_cache_is_bounded_and_expires(self):
+        import time
+        from app.auth import TokenCache, TokenInfo
+        cache = TokenCache(maxsize=2)
+        cache.put("a", TokenInfo("admin", "1", time.time() + 60))
+        cache.put("b", TokenInfo("admin", "2", time.time() - 1))
+        cache.put("c", TokenInfo("admin", "3", time.time() + 60))
+        assert cache.get("a") is None  # 超過容量被淘汰
+        assert cache.get("c").jti == "3"
+        cache.put("d", TokenInfo("admin", "4", time.time() - 1))
+        assert cache.get("d") is None  # 已過期
+
+    def test_login_is_rate_limited(self, monkeypatch):
+        from app import auth
+        monkeypatch.setattr(auth.login_rate_limiter, "limit", 3)
+
+        bad = {"username": "admin", "password": "wrong"}
+        for _ in range(3):
+            assert client.post("/api/auth/login", json=bad).status_code == 401
+        response = client.post("/api/auth/login", json=bad)
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) > 0
+        # 其他來源 IP 不受影響
+        other = client.post("/api/auth/login", json=bad, headers={"X-Forwarded-For": "203.0.113.7"})
+        assert other.status_code == 401
+
+    def test_prehashed_admin_password(self, monkeypatch):
+        from passlib.hash import bcrypt
+        from app import auth
+        monkeypatch.setattr(auth, "ADMIN_PASSWORD_HASH", bcrypt.hash("s3cret"))
+        auth.admin_password_hash.cache_clear()
+        try:
+            assert auth.authenticate_user("admin", "s3cret") == "admin"
+            assert auth.authenticate_user("admin", "admin123") is None
+        finally:
+            auth.admin_password_hash.cache_clear()
+
+
 # ============================================================
 # 自動儲存相關測試 — 驗證 PUT /api/articles/{id} 支援 autosave 場景
 # 規格：docs/specs/verified_spec.md 功能 2（伺服器線上草稿）
@@ -289,3 +381,1243 @@ class TestAutosaveRapidUpdates:
 # - 開啟表單時檢查草稿並提示還原
 # - 離開確認對話框
 # - 24 小時過期清理
+
+
+# ============================================================
+# Slug 配置 — 一次前綴查詢找出下一個可用後綴
+# ============================================================
+
+class TestSlugAllocation:
+    """文章與分類的 slug 必須唯一，重複標題依序取得 -1、-2 後綴"""
+
+    def test_next_free_slug_fills_lowest_gap(self):
+        from app.routes import next_free_slug
+        assert next_free_slug("weekly", set()) == "weekly"
+        assert next_free_slug("weekly", {"weekly", "weekly-1", "weekly-3"}) == "weekly-2"
+        # 其他以相同前綴開頭的 slug 不影響編號
+        assert next_free_slug("weekly", {"weekly", "weekly-notes"}) == "weekly-1"
+
+    def test_duplicate_titles_get_suffixes(self):
+        first = _create_test_article(title="Slug Series Title")
+        second = _create_test_article(title="Slug Series Title")
+        assert first["slug"] != second["slug"]
+        assert second["slug"].startswith(first["slug"])
+
+    def test_update_keeps_own_slug(self):
+        article = _create_test_article(title="Stable Slug Title")
+        response = client.put(f"/api/articles/{article['id']}", json={"title": "Stable Slug Title"})
+        assert response.status_code == 200
+        assert response.json()["slug"] == article["slug"]
+
+    def test_update_category_slug_is_unique(self):
+        import uuid
+        suffix = uuid.uuid4().hex[:6]
+        a = client.post("/api/categories/", json={"name": f"cat-{suffix}"}).json()
+        b = client.post("/api/categories/", json={"name": f"other-{suffix}"}).json()
+
+        # 改名後 slug 與既有分類衝突時應自動加後綴，而不是 500
+        response = client.put(f"/api/categories/{b['id']}", json={"name": f"Cat {suffix}"})
+        assert response.status_code == 200
+        assert response.json()["slug"] != a["slug"]
+        assert response.json()["slug"].startswith(a["slug"])
+
+
+# ============================================================
+# 批次匯入 / 匯出（NDJSON）
+# ============================================================
+
+class TestBulkImportExport:
+    """POST /api/articles/bulk 與 GET /api/articles/export"""
+
+    def test_bulk_import_reports_per_line_results(self):
+        import json
+        lines = [
+            json.dumps({"title": "Bulk Weekly", "content": "<p>one</p>", "tag_names": ["bulk", "weekly"]}),
+            "",
+            "not-json",
+            json.dumps({"title": "Bulk Weekly", "content": "<p>two</p>", "tag_names": ["bulk"]}),
+            json.dumps({"title": "Bulk Unknown Cat", "content": "x", "category_slug": "no-such-category"}),
+        ]
+        response = client.post(
+            "/api/articles/bulk",
+            content="\n".join(lines).encode("utf-8"),
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["created"] == 2
+        assert data["failed"] == 2
+        by_line = {r["line"]: r for r in data["results"]}
+        assert by_line[1]["id"] and by_line[4]["id"]
+        assert by_line[1]["slug"] != by_line[4]["slug"]
+        assert by_line[3]["error"]
+        assert "no-such-category" in by_line[5]["error"]
+
+        article = client.get(f"/api/articles/{by_line[1]['id']}").json()
+        assert sorted(t["name"] for t in article["tags"]) == ["bulk", "weekly"]
+
+    def test_export_streams_ndjson_that_reimports(self):
+        import json
+        _create_test_article(title="Export Me", content="<p>exported</p>")
+        response = client.get("/api/articles/export")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        records = [json.loads(line) for line in response.text.splitlines() if line]
+        exported = [r for r in records if r["title"] == "Export Me"]
+        assert exported and exported[0]["tag_names"] == ["test-tag"]
+
+        reimport = client.post("/api/articles/bulk", content=json.dumps(exported[0]).encode("utf-8"))
+        assert reimport.json()["created"] == 1
+        assert reimport.json()["results"][0]["slug"] != exported[0]["slug"]
+
+
+# ============================================================
+# ORM 直出序列化 — 與 Pydantic response schema 輸出一致
+# ============================================================
+
+class TestFastSerialization:
+    """serializers 輸出必須與 ArticleResponse / ArticleListResponse 完全相同"""
+
+    def test_serializers_match_response_schemas(self):
+        import orjson
+        from app import schemas, serializers
+        from app.database import SessionLocal
+        from app.routes import get_article_query
+        from app import models
+
+        created = _create_test_article(title="Serializer Parity",
+                                       content='<p><img src="/uploads/original/x.jpg"></p>')
+        db = SessionLocal()
+        try:
+            article = get_article_query(db).filter(models.Article.id == created["id"]).first()
+            fast = orjson.loads(orjson.dumps(serializers.article_dict(article)))
+            slow = orjson.loads(orjson.dumps(schemas.ArticleResponse.model_validate(article).model_dump()))
+            assert fast == slow
+
+            fast_item = orjson.loads(orjson.dumps(serializers.article_list_item_dict(article)))
+            slow_item = orjson.loads(orjson.dumps(schemas.ArticleListResponse.model_validate(article).model_dump()))
+            assert fast_item == slow_item
+            assert fast_item["cover_image"] == "/uploads/original/x.jpg"
+        finally:
+            db.close()
+
+
+# ============================================================
+# 靜態快照 — 寫入後由 Caddy 直接提供
+# ============================================================
+
+class TestSnapshots:
+    """發布文章的 JSON 快照隨 create / update / delete 同步更新"""
+
+    def test_publish_update_and_unpublish_snapshot(self):
+        import json
+        from app.snapshots import SNAPSHOT_DIR, article_path
+
+        article = _create_test_article(title="Snapshot Story", is_published=True)
+        path = article_path(article["slug"])
+        assert path.exists()
+        assert json.loads(path.read_text())["title"] == "Snapshot Story"
+        first_page = json.loads((SNAPSHOT_DIR / "pages" / "1.json").read_text())
+        assert first_page[0]["id"] == article["id"]
+
+        # 改標題 → slug 改變，舊快照移除
+        renamed = client.put(f"/api/articles/{article['id']}", json={"title": "Snapshot Renamed"}).json()
+        assert not path.exists()
+        assert article_path(renamed["slug"]).exists()
+
+        # 改為草稿 → 快照移除
+        client.put(f"/api/articles/{article['id']}", json={"is_published": False})
+        assert not article_path(renamed["slug"]).exists()
+
+    def test_saves_render_only_affected_pages(self, monkeypatch):
+        import json
+        from app import snapshots
+
+        article = _create_test_article(title="Snapshot Pages", is_published=True)
+        draft = _create_test_article(title="Snapshot Draft")
+        calls = []
+        real_render = snapshots.render_scope
+
+        def recording(db, scope, first_page=1, only_page=False):
+            calls.append((scope, first_page, only_page))
+            return real_render(db, scope, first_page, only_page)
+
+        monkeypatch.setattr(snapshots, "render_scope", recording)
+        client.put(f"/api/articles/{draft['id']}", json={"content": "<p>still a draft</p>"})
+        assert calls == []
+
+        client.put(f"/api/articles/{article['id']}", json={"summary": "edited"})
+        assert calls and all(only_page for _, _, only_page in calls)
+        first_page = json.loads((snapshots.SNAPSHOT_DIR / "pages" / "1.json").read_text())
+        assert first_page[0]["summary"] == "edited"
+
+        calls.clear()
+        client.put(f"/api/articles/{article['id']}", json={"is_published": False})
+        assert (snapshots.ALL, 1, False) in calls
+        first_page = json.loads((snapshots.SNAPSHOT_DIR / "pages" / "1.json").read_text())
+        assert article["id"] not in [item["id"] for item in first_page]
+
+    def test_delete_removes_snapshot(self):
+        from app.snapshots import article_path
+
+        article = _create_test_article(title="Snapshot Delete", is_published=True)
+        assert article_path(article["slug"]).exists()
+        client.delete(f"/api/articles/{article['id']}")
+        assert not article_path(article["slug"]).exists()
+
+
+# ============================================================
+# Sitemap / Atom feed — 磁碟快取與 Last-Modified
+# ============================================================
+
+class TestFeeds:
+    """/sitemap.xml 與 /feed.xml 只在已發布文章變動時重新產生"""
+
+    def test_sitemap_and_feed_list_published_articles(self):
+        article = _create_test_article(title="Feed Visible", is_published=True)
+        draft = _create_test_article(title="Feed Hidden Draft", is_published=False)
+
+        sitemap = client.get("/sitemap.xml")
+        assert sitemap.status_code == 200
+        assert article["slug"] in sitemap.text
+        assert draft["slug"] not in sitemap.text
+        assert "Last-Modified" in sitemap.headers
+
+        feed = client.get("/feed.xml")
+        assert feed.status_code == 200
+        assert feed.headers["content-type"].startswith("application/atom+xml")
+        assert "Feed Visible" in feed.text
+
+    def test_views_do_not_invalidate_cache(self):
+        article = _create_test_article(title="Feed Viewed", is_published=True)
+        first = client.get("/sitemap.xml")
+        client.get(f"/api/articles/{article['id']}")
+        second = client.get("/sitemap.xml")
+        assert first.headers["Last-Modified"] == second.headers["Last-Modified"]
+
+        not_modified = client.get("/sitemap.xml", headers={"If-Modified-Since": first.headers["Last-Modified"]})
+        assert not_modified.status_code == 304
+
+
+# ============================================================
+# 設定快取 — 一次載入、單一交易寫入、跨 worker 版本失效
+# ============================================================
+
+class TestSettingsStore:
+    """site_settings 讀取走記憶體快照，版本列變動時重新載入"""
+
+    def test_update_and_read_settings(self):
+        response = client.put("/api/settings/", json={"ai_model": "gpt-test", "ai_api_key": "sk-1234567890abcdef"})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["ai_model"] == "gpt-test"
+        assert data["ai_api_key"] == "sk-12345...cdef"
+        assert client.get("/api/settings/").json()["ai_model"] == "gpt-test"
+
+    def test_other_worker_write_is_picked_up_after_version_bump(self):
+        from app.database import SessionLocal
+        from app.site_settings import SettingsStore
+
+        db = SessionLocal()
+        try:
+            worker_a = SettingsStore(check_interval=0)
+            worker_b = SettingsStore(check_interval=3600)
+            worker_a.get(db, "ai_base_url")
+            worker_b.update(db, {"ai_base_url": "http://stub.local/v1"})
+            assert worker_a.get(db, "ai_base_url") == "http://stub.local/v1"
+        finally:
+            db.close()
+
+    def test_own_write_after_other_worker_write_keeps_both(self):
+        from app.database import SessionLocal
+        from app.site_settings import SettingsStore
+
+        db = SessionLocal()
+        try:
+            worker_a = SettingsStore(check_interval=3600)
+            worker_b = SettingsStore(check_interval=3600)
+            worker_a.get(db, "ai_model")
+            worker_b.update(db, {"ai_api_key": "sk-from-worker-b"})
+            worker_a.update(db, {"ai_model": "gpt-from-worker-a"})
+            assert worker_a.get(db, "ai_api_key") == "sk-from-worker-b"
+            assert worker_a.get(db, "ai_model") == "gpt-from-worker-a"
+        finally:
+            db.close()
+
+
+# ============================================================
+# Prometheus 指標
+# ============================================================
+
+def test_metrics_endpoint_reports_route_latency_and_db_queries():
+    article = _create_test_article(title="Metrics Article")
+    client.get(f"/api/articles/{article['id']}")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    body = response.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/articles/{article_id}",status="200"}' in body
+    assert 'db_queries_per_request_count{route="/api/articles/{article_id}"}' in body
+    assert "es_request_duration_seconds" in body
+
+
+def test_failed_statement_leaves_no_timer_on_connection():
+    from sqlalchemy import text
+    from sqlalchemy.exc import OperationalError
+    from app import query_audit
+    from app.database import engine
+
+    query_audit.install(engine)
+
+    with engine.connect() as conn:
+        with pytest.raises(OperationalError):
+            conn.execute(text("SELECT * FROM no_such_table"))
+        assert "metrics_start" not in conn.info and "audit_start" not in conn.info
+        conn.rollback()
+        assert conn.execute(text("SELECT 1")).scalar() == 1
+        assert "metrics_start" not in conn.info and "audit_start" not in conn.info
+
+
+# ============================================================
+# 查詢預算 — 防止 N+1 回歸（fixture 定義於 tests/conftest.py）
+# ============================================================
+
+class TestQueryBudgets:
+    """各端點的 SQL 查詢數上限"""
+
+    def test_list_articles(self, query_budget):
+        _create_test_article(title="Budget List")
+        with query_budget(1):
+            client.get("/api/articles/", params={"limit": 20})
+
+    def test_article_detail(self, query_budget):
+        article = _create_test_article(title="Budget Detail")
+        with query_budget(2):
+            client.get(f"/api/articles/{article['id']}")
+        with query_budget(2):
+            client.get(f"/api/articles/by-slug/{article['slug']}")
+
+    def test_related_articles(self, query_budget):
+        article = _create_test_article(title="Budget Related")
+        with query_budget(2):
+            client.get(f"/api/articles/{article['id']}/related")
+
+    def test_create_article_does_not_lazy_load_after_commit(self, query_budget, monkeypatch):
+        # 快照在背景任務中更新，TestClient 會同步執行，這裡只量測請求本身
+        monkeypatch.setattr("app.snapshots.SNAPSHOTS_ENABLED", False)
+        _create_test_article(title="Budget Create")  # 確保 test-tag 已存在
+        # 5 次寫入文章 + 3 次近似重複檢查（簽章、LSH 桶、候選比對）
+        with query_budget(8) as audit:
+            client.post("/api/articles/", json={
+                "title": "Budget Create", "content": "<p>x</p>", "tag_names": ["test-tag"],
+            })
+        assert not audit.duplicates(), audit.report()
+
+    def test_taxonomy_listings(self, query_budget):
+        with query_budget(1):
+            client.get("/api/articles/tags/all")
+        with query_budget(1):
+            client.get("/api/categories/")
+
+
+class TestReadReplicas:
+    """唯讀路由走 replica，寫入與剛寫入過的客戶端走 primary"""
+
+    @pytest.fixture
+    def replica(self, monkeypatch):
+        import tempfile
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import Session
+        from app import database, models, read_cache
+        from app.startup import upgrade_database
+
+        url = f"sqlite:///{tempfile.mkdtemp()}/replica.db"
+        upgrade_database(url)
+        seed = create_engine(url)
+        with Session(seed) as db:
+            db.add(models.Tag(name="replica-only-tag"))
+            db.add(models.Article(title="Replica article", slug="replica-article", content="<p>r</p>"))
+            db.commit()
+        seed.dispose()
+        pool = database.ReplicaPool([url])
+        monkeypatch.setattr(database, "replicas", pool)
+        read_cache.clear_all()  # 之前的測試可能快取了 primary 的資料
+        yield pool
+        read_cache.clear_all()
+        for replica in pool.engines:
+            replica.dispose()
+
+    def test_reads_use_replica_and_writes_pin_client_to_primary(self, replica):
+        fresh = TestClient(app)
+        tags = [t["name"] for t in fresh.get("/api/articles/tags/all").json()]
+        assert "replica-only-tag" in tags
+
+        # 寫入後 cookie 讓同一客戶端改讀 primary
+        response = fresh.post("/api/categories/", json={"name": "Replica Routing Category"})
+        assert response.status_code in (200, 201)
+        assert "db_primary" in response.headers.get("set-cookie", "")
+        tags = [t["name"] for t in fresh.get("/api/articles/tags/all").json()]
+        assert "replica-only-tag" not in tags
+
+    def test_view_counter_write_goes_to_primary(self, replica):
+        from app.database import SessionLocal
+        from app import models
+
+        primary_article = client.post("/api/articles/", json={
+            "title": "Primary only", "content": "<p>p</p>", "is_published": True,
+        }).json()
+        db = SessionLocal()
+        db.info["use_replica"] = True
+        try:
+            # 讀取 replica 找不到，但 UPDATE 仍送往 primary
+            assert db.query(models.Article).filter(models.Article.id == primary_article["id"]).first() is None
+            db.query(models.Article).filter(models.Article.id == primary_article["id"]).update(
+                {models.Article.view_count: models.Article.view_count + 5}, synchronize_session=False)
+            db.commit()
+            # 寫入後同一 session 改讀 primary
+            article = db.query(models.Article).filter(models.Article.id == primary_article["id"]).one()
+            assert article.view_count == primary_article["view_count"] + 5
+        finally:
+            db.close()
+
+    def test_round_robin_and_failover(self, replica, tmp_path):
+        from app.database import ReplicaPool
+        from sqlalchemy import text
+
+        good = replica.engines[0].url.render_as_string(hide_password=False)
+        pool = ReplicaPool([good, f"sqlite:///{tmp_path}/missing-dir/x.db", good], retry_interval=60)
+        assert [pool.pick() for _ in range(3)] == pool.engines
+
+        bad = pool.engines[1]
+        with pytest.raises(Exception):
+            with bad.connect() as conn:
+                conn.execute(text("SELECT 1"))
+        picks = {pool.pick() for _ in range(6)}
+        assert bad not in picks and len(picks) == 2
+
+        pool.mark_down(pool.engines[0])
+        pool.mark_down(pool.engines[2])
+        assert pool.pick() is None  # 全部失效時呼叫端退回 primary
+        with pytest.raises(RuntimeError):
+            pool.check()
+
+
+class TestScheduledPublishing:
+    """publish_at 到期時由排程器自動上線，且只會發布一次"""
+
+    def test_future_publish_at_saves_draft(self):
+        from datetime import datetime, timedelta, timezone
+        publish_at = datetime.now(timezone.utc) + timedelta(days=1)
+        response = client.post("/api/articles/", json={
+            "title": "Scheduled later", "content": "<p>soon</p>", "is_published": True,
+            "publish_at": publish_at.isoformat(),
+        })
+        assert response.status_code == 201
+        data = response.json()
+        assert data["is_published"] is False
+        assert data["publish_at"].startswith(publish_at.replace(tzinfo=None).isoformat()[:19])
+
+    def test_publish_due_wins_once(self):
+        from datetime import datetime, timedelta
+        from app import models, scheduler
+        from app.database import SessionLocal
+
+        created = _create_test_article(title="Due article")
+        due_at = datetime.utcnow() - timedelta(minutes=1)
+        db = SessionLocal()
+        try:
+            db.query(models.Article).filter(models.Article.id == created["id"]).update(
+                {models.Article.publish_at: due_at, models.Article.is_published: False})
+            db.commit()
+            assert scheduler.next_due(db) <= due_at
+
+            assert created["id"] in scheduler.publish_due(db)
+            # 第二個 worker 的條件式 UPDATE 不會再命中
+            assert created["id"] not in scheduler.publish_due(db)
+        finally:
+            db.close()
+
+        article = client.get(f"/api/articles/{created['id']}").json()
+        assert article["is_published"] is True
+        assert article["created_at"].startswith(due_at.isoformat()[:19])
+
+    def test_unpublished_scheduled_post_stays_draft(self):
+        from datetime import datetime, timedelta
+        from app import models, scheduler
+        from app.database import SessionLocal
+
+        created = _create_test_article(title="Published on schedule")
+        db = SessionLocal()
+        try:
+            db.query(models.Article).filter(models.Article.id == created["id"]).update({
+                models.Article.publish_at: datetime.utcnow() - timedelta(minutes=1),
+                models.Article.is_published: False,
+            })
+            db.commit()
+            assert created["id"] in scheduler.publish_due(db)
+
+            updated = client.put(f"/api/articles/{created['id']}", json={"is_published": False}).json()
+            assert updated["is_published"] is False and updated["publish_at"] is None
+            assert created["id"] not in scheduler.publish_due(db)
+        finally:
+            db.close()
+        assert client.get(f"/api/articles/{created['id']}").json()["is_published"] is False
+
+    def test_past_publish_at_on_draft_is_not_scheduled(self):
+        from datetime import datetime, timedelta
+        response = client.post("/api/articles/", json={
+            "title": "Backdated draft", "content": "<p>x</p>", "is_published": False,
+            "publish_at": (datetime.utcnow() - timedelta(days=1)).isoformat(),
+        })
+        data = response.json()
+        assert data["is_published"] is False and data["publish_at"] is None
+
+    def test_scheduler_wakes_for_new_schedule(self):
+        import time
+        from datetime import datetime, timedelta
+        with TestClient(app) as live:
+            publish_at = datetime.utcnow() + timedelta(seconds=1)
+            created = live.post("/api/articles/", json={
+                "title": "Wake me", "content": "<p>x</p>", "publish_at": publish_at.isoformat(),
+            }).json()
+            assert created["is_published"] is False
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline:
+                if live.get(f"/api/articles/{created['id']}").json()["is_published"]:
+                    break
+                time.sleep(0.1)
+            assert live.get(f"/api/articles/{created['id']}").json()["is_published"] is True
+
+
+class TestTaxonomyPropagation:
+    """分類、標籤改名與合併只更新受影響的索引文件"""
+
+    @pytest.fixture
+    def es_calls(self, monkeypatch):
+        from app import search
+
+        class FakeES:
+            def __init__(self):
+                self.calls = []
+
+            def update_by_query(self, **kwargs):
+                self.calls.append(kwargs)
+                return {"updated": 1}
+
+        fake = FakeES()
+        monkeypatch.setattr(search, "es", fake)
+        return fake.calls
+
+    def test_document_stores_taxonomy_ids(self):
+        from app.search import build_document
+        doc = build_document("t", "<p>c</p>", category="Cat", tags=["a", "b"], category_id=3, tag_ids=[7, 8])
+        assert doc["tags"] == ["a", "b"] and doc["tag_ids"] == [7, 8] and doc["category_id"] == 3
+
+    def test_category_rename_and_delete_update_by_query(self, es_calls):
+        cat = client.post("/api/categories/", json={"name": "Rename Me ES"}).json()
+        client.put(f"/api/categories/{cat['id']}", json={"description": "no rename"})
+        assert es_calls == []
+
+        client.put(f"/api/categories/{cat['id']}", json={"name": "Renamed ES"})
+        assert es_calls[-1]["query"] == {"term": {"category_id": cat["id"]}}
+        assert es_calls[-1]["script"]["params"] == {"name": "Renamed ES"}
+
+        client.delete(f"/api/categories/{cat['id']}")
+        assert es_calls[-1]["query"] == {"term": {"category_id": cat["id"]}}
+        assert "category_id = null" in es_calls[-1]["script"]["source"]
+
+    def test_tag_rename(self, es_calls):
+        created = _create_test_article(title="Tag rename article")
+        client.put(f"/api/articles/{created['id']}", json={"tag_names": ["old-tag-name"]})
+        tag_id = next(t["id"] for t in client.get(f"/api/articles/{created['id']}").json()["tags"])
+
+        response = client.put(f"/api/tags/{tag_id}", json={"name": "new-tag-name"})
+        assert response.status_code == 200
+        assert [t["name"] for t in client.get(f"/api/articles/{created['id']}").json()["tags"]] == ["new-tag-name"]
+        assert es_calls[-1]["query"] == {"term": {"tag_ids": tag_id}}
+
+        other = _create_test_article(title="Tag clash article")
+        client.put(f"/api/articles/{other['id']}", json={"tag_names": ["clash-tag"]})
+        assert client.put(f"/api/tags/{tag_id}", json={"name": "clash-tag"}).status_code == 409
+
+    def test_tag_merge_is_set_based_and_deduplicates(self, es_calls):
+        a = _create_test_article(title="Merge A")
+        b = _create_test_article(title="Merge B")
+        client.put(f"/api/articles/{a['id']}", json={"tag_names": ["merge-js", "merge-javascript"]})
+        client.put(f"/api/articles/{b['id']}", json={"tag_names": ["merge-js", "merge-ecmascript"]})
+        tags = {t["name"]: t["id"] for t in client.get("/api/articles/tags/all").json()}
+        target = tags["merge-javascript"]
+        sources = [tags["merge-js"], tags["merge-ecmascript"]]
+
+        response = client.post("/api/tags/merge", json={"source_ids": sources, "target_id": target})
+        assert response.status_code == 200
+        assert response.json()["articles_updated"] == 2
+
+        for article in (a, b):
+            names = [t["name"] for t in client.get(f"/api/articles/{article['id']}").json()["tags"]]
+            assert names == ["merge-javascript"]
+        remaining = {t["name"] for t in client.get("/api/articles/tags/all").json()}
+        assert "merge-js" not in remaining and "merge-ecmascript" not in remaining
+        assert es_calls[-1]["query"] == {"terms": {"tag_ids": sorted(sources)}}
+        assert es_calls[-1]["script"]["params"]["target"] == target
+
+        assert client.post("/api/tags/merge", json={"source_ids": [999999], "target_id": target}).status_code == 404
+
+
+class TestSemanticSearch:
+    """本地向量索引：相似文章、語意搜尋與 ES 分數混合"""
+
+    def test_similar_articles_rank_by_content(self):
+        base = _create_test_article(title="神經網路訓練技巧", is_published=True,
+                                    content="<p>卷積神經網路的學習率與批次大小如何調整，訓練才會穩定收斂。</p>")
+        close = _create_test_article(title="神經網路的學習率", is_published=True,
+                                     content="<p>調整學習率與批次大小可以讓神經網路訓練更穩定。</p>")
+        _create_test_article(title="台北牛肉麵地圖", is_published=True,
+                             content="<p>整理了十家台北牛肉麵與小籠包名店。</p>")
+        draft = _create_test_article(title="神經網路訓練草稿",
+                                     content="<p>卷積神經網路的學習率與批次大小草稿。</p>")
+
+        response = client.get(f"/api/articles/{base['id']}/similar", params={"limit": 3})
+        assert response.status_code == 200
+        ids = [a["id"] for a in response.json()]
+        assert ids[0] == close["id"]
+        assert base["id"] not in ids and draft["id"] not in ids
+        assert client.get("/api/articles/999999/similar").status_code == 404
+
+    def test_semantic_mode_works_without_elasticsearch(self):
+        created = _create_test_article(title="向量檢索實作筆記", is_published=True,
+                                       content="<p>用字元 n-gram 雜湊建立向量檢索。</p>")
+        results = client.get("/api/articles/search/query", params={"q": "向量檢索", "mode": "semantic"}).json()
+        assert results[0]["id"] == created["id"]
+        # hybrid 在 ES 不可用時仍有語意結果
+        hybrid = client.get("/api/articles/search/query", params={"q": "向量檢索"}).json()
+        assert created["id"] in [a["id"] for a in hybrid]
+        assert client.get("/api/articles/search/query", params={"q": "x", "mode": "bogus"}).status_code == 422
+
+    def test_update_and_delete_keep_index_in_sync(self):
+        from app.semantic import semantic_index
+        created = _create_test_article(title="Index sync", content="<p>first version</p>")
+        before = semantic_index.vector_of(created["id"])
+        client.put(f"/api/articles/{created['id']}", json={"content": "<p>完全不同的內容</p>"})
+        assert (semantic_index.vector_of(created["id"]) != before).any()
+
+        client.delete(f"/api/articles/{created['id']}")
+        assert semantic_index.vector_of(created["id"]) is None
+
+    def test_missing_index_builds_once_in_background(self, monkeypatch, tmp_path):
+        import threading
+        from app import semantic
+
+        _create_test_article(title="Background build")
+        monkeypatch.setattr(semantic, "semantic_index", semantic.SemanticIndex(tmp_path))
+        started, release, builds = threading.Event(), threading.Event(), []
+        real_rebuild = semantic.rebuild_from_db
+
+        def slow_rebuild():
+            builds.append(1)
+            started.set()
+            release.wait(5)
+            return real_rebuild()
+
+        monkeypatch.setattr(semantic, "rebuild_from_db", slow_rebuild)
+        assert semantic.start_build() is True
+        assert started.wait(5)
+        assert semantic.start_build() is False  # 同一程序內已在建置
+        # 就緒檢查只回報狀態，不會再觸發建置
+        with pytest.raises(RuntimeError, match="being built"):
+            semantic.ensure_semantic_index()
+        # 其他 worker 拿不到建置鎖就略過
+        assert semantic.build_if_missing() is None
+
+        release.set()
+        with semantic._build_running:
+            pass
+        assert builds == [1]
+        semantic.ensure_semantic_index()
+        assert len(semantic.semantic_index) >= 1
+
+    def test_blend_boosts_keyword_hits_that_are_also_close(self, monkeypatch):
+        from app import semantic
+        a = _create_test_article(title="Blend keyword only", content="<p>zzz qqq</p>")
+        b = _create_test_article(title="Blend 混合排序 keyword and meaning", content="<p>混合排序</p>")
+        # ES 給 a 較高分，但 b 在語意上更接近查詢
+        ranked = semantic.blend([(a["id"], 10.0), (b["id"], 9.0)], "混合排序", weight=0.5)
+        assert ranked.index(b["id"]) < ranked.index(a["id"])
+        monkeypatch.setattr(semantic, "SEMANTIC_ENABLED", False)
+        assert semantic.blend([(a["id"], 10.0), (b["id"], 9.0)], "混合排序") == [a["id"], b["id"]]
+
+
+class TestNearDuplicates:
+    """MinHash/LSH：寫入時回報近似重複文章，批次掃描找出重複群組"""
+
+    BODY = ("<p>容器化部署讓後端服務在各環境保持一致，映像檔建置與設定管理是關鍵。"
+            "我們先整理 Dockerfile 的多階段建置，再說明環境變數如何注入。</p>"
+            "<p>資料庫遷移放在部署步驟中執行，避免多個 worker 同時升級。"
+            "健康檢查與就緒檢查分開設計，讓負載平衡器只把流量送到準備好的實例。</p>"
+            "<p>We also cover health checks, rolling restarts and log shipping in detail, "
+            "plus how to roll back a bad release without downtime.</p>")
+
+    def test_signature_estimates_similarity(self):
+        from app import duplicates
+        a = duplicates.signature(duplicates.plain_text("t", self.BODY))
+        b = duplicates.signature(duplicates.plain_text("t", self.BODY.replace("關鍵", "重點")))
+        c = duplicates.signature("完全無關的一段文字，講的是台北的牛肉麵與小籠包。")
+        assert duplicates.similarity(a, b) > 0.8
+        assert duplicates.similarity(a, c) < 0.2
+        assert duplicates.signature("") is None
+
+    def test_create_and_update_report_near_duplicates(self):
+        original = client.post("/api/articles/", json={"title": "部署筆記", "content": self.BODY}).json()
+        assert original["near_duplicates"] == []
+
+        copy = client.post("/api/articles/", json={
+            "title": "部署筆記（重發）", "content": self.BODY.replace("關鍵", "重點"),
+        }).json()
+        assert [d["id"] for d in copy["near_duplicates"]] == [original["id"]]
+        assert copy["near_duplicates"][0]["similarity"] >= 0.8
+
+        # 只改狀態不重算；改寫內容後不再重複
+        assert client.put(f"/api/articles/{copy['id']}", json={"featured": True}).json()["near_duplicates"] is None
+        rewritten = client.put(f"/api/articles/{copy['id']}", json={"content": "<p>全新內容，談的是資料庫備份。</p>"})
+        assert rewritten.json()["near_duplicates"] == []
+
+    def test_scan_clusters_existing_articles(self):
+        from app import duplicates
+        from app.database import SessionLocal
+        a = client.post("/api/articles/", json={"title": "Scan A", "content": self.BODY + "<p>scan</p>"}).json()
+        b = client.post("/api/articles/", json={"title": "Scan A", "content": self.BODY + "<p>scan!</p>"}).json()
+        db = SessionLocal()
+        try:
+            assert duplicates.backfill(db) == 0  # 寫入時已建立簽章
+            clusters = duplicates.scan(db)
+        finally:
+            db.close()
+        assert any({a["id"], b["id"]} <= set(c["articles"]) for c in clusters)
+
+        client.delete(f"/api/articles/{b['id']}")
+        db = SessionLocal()
+        try:
+            assert not any(b["id"] in c["articles"] for c in duplicates.scan(db))
+        finally:
+            db.close()
+
+
+class TestTrending:
+    """瀏覽事件驅動的時間衰減熱門排行與每日彙總"""
+
+    @pytest.fixture(autouse=True)
+    def fresh_tracker(self, monkeypatch):
+        from app.trending import TrendingTracker, tracker
+        monkeypatch.setattr(TrendingTracker, "RANKING_TTL", 0)
+        tracker.reset()
+        yield tracker
+        tracker.reset()
+
+    def test_recent_views_outrank_older_ones(self):
+        import time
+        from app.trending import TrendingTracker
+        t = TrendingTracker(half_life_hours=24)
+        now = time.time()
+        for _ in range(3):
+            t.record(1, at=now - 2 * 86400)  # 兩個半衰期前：3 × 0.25
+        t.record(2, at=now)
+        assert t.top(2) == [2, 1]
+        assert abs(t.score(1) - 0.75) < 0.01
+
+    def test_trending_endpoint_follows_views(self):
+        a = _create_test_article(title="Trending A", is_published=True)
+        b = _create_test_article(title="Trending B", is_published=True)
+        draft = _create_test_article(title="Trending draft")
+        for _ in range(3):
+            client.get(f"/api/articles/{b['id']}")
+        client.get(f"/api/articles/by-slug/{a['slug']}")
+        client.get(f"/api/articles/{draft['id']}")
+
+        response = client.get("/api/articles/trending", params={"limit": 5})
+        assert response.status_code == 200
+        assert [x["id"] for x in response.json()][:2] == [b["id"], a["id"]]
+        assert draft["id"] not in [x["id"] for x in response.json()]
+
+    def test_flush_feeds_popular_and_dashboard(self, fresh_tracker):
+        article = _create_test_article(title="Popular one", is_published=True)
+        # 其他測試今天也留下瀏覽紀錄，次數要明顯高於它們
+        for _ in range(30):
+            client.get(f"/api/articles/{article['id']}")
+        assert fresh_tracker.flush_now() == 30
+        # 重新載入後分數來自每日彙總表
+        assert fresh_tracker.top(1) == [article["id"]]
+
+        popular = client.get("/api/articles/popular", params={"window": "7d"}).json()
+        assert popular[0]["id"] == article["id"]
+        assert client.get("/api/articles/popular", params={"window": "week"}).status_code == 422
+        assert client.get("/api/articles/popular", params={"window": "0d"}).status_code == 422
+
+        stats = client.get("/api/articles/stats/dashboard").json()
+        assert len(stats["daily_views"]) == 30
+        assert stats["daily_views"][-1]["views"] >= 30
+
+        client.get(f"/api/articles/{article['id']}")
+        assert fresh_tracker.flush_now() == 1  # 同一天的列累加
+
+
+class TestReadCache:
+    """熱門唯讀端點的請求合併與 stale-while-revalidate"""
+
+    class FakeSession:
+        info = {"use_replica": True}
+
+    def test_concurrent_misses_share_one_computation(self):
+        import threading, time
+        from app.read_cache import ReadCache
+        cache, calls = ReadCache("test"), []
+
+        def compute(db):
+            calls.append(1)
+            time.sleep(0.2)
+            return {"value": 42}
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get("k", compute, self.FakeSession())))
+                   for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(calls) == 1
+        assert results == [{"value": 42}] * 8
+
+    def test_stale_value_served_while_one_refresh_runs(self):
+        import threading, time
+        from app.read_cache import ReadCache
+        cache = ReadCache("test", ttl=0, stale=30)
+        release, refreshed = threading.Event(), threading.Event()
+        versions = iter(range(1, 10))
+
+        def compute(db):
+            version = next(versions)
+            if version > 1:
+                release.wait(5)
+                refreshed.set()
+            return version
+
+        assert cache.get("k", compute, self.FakeSession()) == 1
+        # 過期後立即回傳舊值，背景只跑一次更新
+        assert cache.get("k", compute, self.FakeSession()) == 1
+        assert cache.get("k", compute, self.FakeSession()) == 1
+        release.set()
+        assert refreshed.wait(5)
+        time.sleep(0.05)
+        assert cache._entries["k"].value == 2
+
+    def test_waiters_give_up_after_max_wait(self):
+        import threading, time
+        from app.read_cache import ReadCache
+        cache = ReadCache("test", max_wait=0.1)
+        release = threading.Event()
+
+        def slow(db):
+            release.wait(5)
+            return "leader"
+
+        leader = threading.Thread(target=lambda: cache.get("k", slow, self.FakeSession()))
+        leader.start()
+        time.sleep(0.05)
+        started = time.monotonic()
+        assert cache.get("k", lambda db: "own", self.FakeSession()) == "own"
+        assert time.monotonic() - started < 1
+        release.set()
+        leader.join()
+
+    def test_errors_are_not_cached_and_primary_reads_bypass(self):
+        from fastapi import HTTPException
+        from app.read_cache import ReadCache
+        cache, calls = ReadCache("test"), []
+
+        def missing(db):
+            calls.append(1)
+            raise HTTPException(status_code=404)
+
+        for _ in range(2):
+            with pytest.raises(HTTPException):
+                cache.get("k", missing, self.FakeSession())
+        assert len(calls) == 2
+
+        pinned = type("Pinned", (), {"info": {}})()
+        cache.get("p", lambda db: 1, pinned)
+        assert "p" not in cache._entries
+
+    def test_writes_invalidate_cached_endpoints(self):
+        article = _create_test_article(title="Cached Article", is_published=True)
+        reader = TestClient(app)  # 沒有寫入 cookie，讀取會經過快取
+        first = reader.get(f"/api/articles/{article['id']}").json()
+        assert first["title"] == "Cached Article"
+        second = reader.get(f"/api/articles/{article['id']}").json()
+        assert second["view_count"] >= first["view_count"]
+
+        updated = client.put(f"/api/articles/{article['id']}", json={"title": "Cached Article v2"}).json()
+        assert reader.get(f"/api/articles/{article['id']}").json()["title"] == "Cached Article v2"
+        assert reader.get(f"/api/articles/by-slug/{updated['slug']}").json()["id"] == article["id"]
+        assert reader.get(f"/api/articles/by-slug/{article['slug']}").status_code == 404
+
+        reader.get("/api/categories/")
+        cat = client.post("/api/categories/", json={"name": "Cached Category"}).json()
+        assert cat["id"] in [c["id"] for c in reader.get("/api/categories/").json()]
+
+        client.delete(f"/api/articles/{article['id']}")
+        assert reader.get(f"/api/articles/{article['id']}").status_code == 404
+
+
+class TestSparseFields:
+    """fields= 只載入並輸出需要的欄位；batch 一次查詢取回多篇"""
+
+    def test_list_projection_skips_unrequested_columns_and_joins(self, query_budget):
+        _create_test_article(title="Sparse Card", content='<p><img src="/uploads/card.jpg"></p>', is_published=True)
+        with query_budget(1) as audit:
+            response = client.get("/api/articles/", params={"fields": "id,slug,title", "limit": 5})
+        assert response.status_code == 200
+        assert all(list(item) == ["id", "slug", "title"] for item in response.json())
+        sql = audit.queries[0][0].lower()
+        assert "images" not in sql and "tags" not in sql and "articles.content" not in sql
+
+        cards = client.get("/api/articles/", params={"fields": "id,cover_image,tags", "limit": 50}).json()
+        card = next(c for c in cards if c["cover_image"] == "/uploads/card.jpg")
+        assert set(card) == {"id", "cover_image", "tags"}
+
+    def test_unknown_field_is_rejected(self):
+        response = client.get("/api/articles/", params={"fields": "id,password"})
+        assert response.status_code == 422
+        assert client.get("/api/articles/trending", params={"fields": ""}).status_code == 422
+
+    def test_batch_keeps_requested_order_in_one_query(self, query_budget):
+        a = _create_test_article(title="Batch A")
+        b = _create_test_article(title="Batch B", is_published=True)
+        with query_budget(1):
+            response = client.get("/api/articles/batch", params={"ids": f"{b['id']},999999,{a['id']},{b['id']}"})
+        assert response.status_code == 200
+        assert [x["id"] for x in response.json()] == [b["id"], a["id"]]
+        assert "images" in response.json()[0]
+
+        published = client.get("/api/articles/batch", params={
+            "ids": f"{a['id']},{b['id']}", "published_only": True, "fields": "id,title",
+        }).json()
+        assert published == [{"id": b["id"], "title": "Batch B"}]
+
+        assert client.get("/api/articles/batch", params={"ids": "1,x"}).status_code == 422
+        too_many = ",".join(str(i) for i in range(1, 102))
+        assert client.get("/api/articles/batch", params={"ids": too_many}).status_code == 422
+
+
+class TestCompression:
+    """依 Accept-Encoding 壓縮回應；快取的回應重用已壓縮的位元組"""
+
+    LONG = "<p>" + "壓縮測試的長段落內容，用來產生足夠大的回應。" * 200 + "</p>"
+
+    def test_article_detail_negotiates_encoding(self):
+        article = _create_test_article(title="Compressed Article", content=self.LONG)
+        for encoding in ("br", "gzip"):
+            response = client.get(f"/api/articles/{article['id']}", headers={"Accept-Encoding": encoding})
+            assert response.headers["content-encoding"] == encoding
+            assert "accept-encoding" in response.headers["vary"].lower()
+            assert response.json()["content"] == self.LONG
+            assert int(response.headers["content-length"]) < len(self.LONG.encode()) / 3
+
+        plain = client.get(f"/api/articles/{article['id']}", headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in plain.headers
+        refused = client.get(f"/api/articles/{article['id']}", headers={"Accept-Encoding": "gzip;q=0, br;q=0"})
+        assert "content-encoding" not in refused.headers
+
+    def test_middleware_skips_small_bodies_and_streams_large_ones(self):
+        small = client.get("/health", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in small.headers
+
+        _create_test_article(title="Compressed Export", content=self.LONG)
+        export = client.get("/api/articles/export", headers={"Accept-Encoding": "gzip"})
+        assert export.status_code == 200
+        assert export.headers["content-encoding"] == "gzip"
+        assert "content-length" not in export.headers
+        assert any(line for line in export.text.splitlines() if "Compressed Export" in line)
+
+    def test_encoded_body_compresses_once(self):
+        from app.compression import EncodedBody
+        body = EncodedBody.json({"content": self.LONG})
+        first = body.variant("gzip")
+        assert body.variant("gzip") is first
+        assert body.variant(None) is body.raw
+        assert EncodedBody.json({"x": 1}).variant("gzip") == b'{"x":1}'  # 低於門檻不壓縮
+
+
+def _jpeg(width=1200, height=900, color=(200, 80, 40)):
+    import io
+    from PIL import Image as PILImage
+    buf = io.BytesIO()
+    PILImage.new("RGB", (width, height), color).save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+class TestMediaServing:
+    """/uploads：不可變快取、條件請求、Range 與分層目錄"""
+
+    def _upload(self):
+        response = client.post("/api/media/upload", files={"file": ("photo.jpg", _jpeg(), "image/jpeg")})
+        assert response.status_code == 200
+        return response.json()
+
+    def test_uploads_are_sharded_and_cached_immutably(self):
+        import re
+        image = self._upload()
+        assert re.match(r"^uploads/original/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{16}_photo\.jpg$", image["filepath"])
+
+        response = client.get(f"/{image['filepath']}")
+        assert response.status_code == 200
+        assert "immutable" in response.headers["cache-control"]
+        assert response.headers["accept-ranges"] == "bytes"
+        assert "content-encoding" not in response.headers
+        etag = response.headers["etag"]
+
+        assert client.get(f"/{image['filepath']}", headers={"If-None-Match": etag}).status_code == 304
+        assert client.get(f"/{image['filepath']}", headers={
+            "If-Modified-Since": response.headers["last-modified"]}).status_code == 304
+        assert client.get("/uploads/..%2f..%2fapp/main.py").status_code == 404
+
+    def test_range_requests(self):
+        image = self._upload()
+        full = client.get(f"/{image['filepath']}").content
+        part = client.get(f"/{image['filepath']}", headers={"Range": "bytes=10-109"})
+        assert part.status_code == 206
+        assert part.content == full[10:110]
+        assert part.headers["content-range"] == f"bytes 10-109/{len(full)}"
+
+        tail = client.get(f"/{image['filepath']}", headers={"Range": "bytes=-20"})
+        assert tail.content == full[-20:]
+        stale = client.get(f"/{image['filepath']}", headers={"Range": "bytes=0-9", "If-Range": '"other"'})
+        assert stale.status_code == 200
+        beyond = client.get(f"/{image['filepath']}", headers={"Range": f"bytes={len(full)}-"})
+        assert beyond.status_code == 416
+        assert beyond.headers["content-range"] == f"bytes */{len(full)}"
+
+    def test_migrate_moves_flat_files_and_rewrites_references(self):
+        from pathlib import Path
+        from app import media, models
+        from app.database import SessionLocal
+        from app.image_utils import shard
+
+        name = "0123456789abcdef_legacy.jpg"
+        flat = {v: Path("uploads", v, name) for v in ("original", "medium", "thumbnail")}
+        for path in flat.values():
+            path.write_bytes(_jpeg(40, 30))
+        article = _create_test_article(
+            title="Legacy Images", content=f'<p><img src="/uploads/medium/{name}"></p>')
+        db = SessionLocal()
+        try:
+            image = models.Image(filename=name, filepath=str(flat["original"]), medium_path=str(flat["medium"]),
+                                 thumbnail_path=str(flat["thumbnail"]), article_id=article["id"])
+            db.add(image)
+            db.commit()
+            assert media.migrate(db, batch_size=1, dry_run=True)["articles"] >= 1
+            assert flat["original"].exists()
+
+            stats = media.migrate(db, batch_size=1)
+            assert stats["moved"] >= 3 and stats["articles"] >= 1
+            db.refresh(image)
+            assert image.filepath == f"uploads/original/{shard(name)}/{name}"
+            assert not flat["original"].exists() and Path(image.filepath).exists()
+        finally:
+            db.close()
+
+        content = client.get(f"/api/articles/{article['id']}").json()["content"]
+        assert f"/uploads/medium/{shard(name)}/{name}" in content
+        old = client.get(f"/uploads/medium/{name}", follow_redirects=False)
+        assert old.status_code == 301
+        assert old.headers["location"] == f"/uploads/medium/{shard(name)}/{name}"
+
+
+class TestImagePlaceholders:
+    """上傳時產生 LQIP 與主色、套用 EXIF 方向；文章內圖片於儲存時補上尺寸與 srcset"""
+
+    def test_exif_orientation_applied_and_metadata_stripped(self):
+        import io
+        from PIL import Image as PILImage
+        img = PILImage.new("RGB", (1200, 900), (30, 120, 200))
+        exif = img.getexif()
+        exif[0x0112] = 6  # 需順時針旋轉 90 度
+        exif[0x010F] = "Test Camera"
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", exif=exif)
+
+        image = client.post("/api/media/upload", files={"file": ("rotated.jpg", buf.getvalue(), "image/jpeg")}).json()
+        assert (image["width"], image["height"]) == (900, 1200)
+        assert image["placeholder"].startswith("data:image/")
+        r, g, b = (int(image["dominant_color"][i:i + 2], 16) for i in (1, 3, 5))
+        assert abs(r - 30) < 12 and abs(g - 120) < 12 and abs(b - 200) < 12
+        with PILImage.open(image["filepath"]) as stored:
+            assert not stored.getexif()
+
+    def test_article_images_get_dimensions_lazy_loading_and_srcset(self):
+        image = client.post("/api/media/upload", files={"file": ("wide.jpg", _jpeg(1600, 1200), "image/jpeg")}).json()
+        article = client.post("/api/articles/", json={
+            "title": "Responsive Images",
+            "content": f'<p><img src="/{image["medium_path"]}" alt="wide"><img src="/elsewhere.png"></p>',
+        }).json()
+        content = article["content"]
+        assert 'width="800" height="600"' in content
+        assert 'loading="lazy"' in content and 'decoding="async"' in content
+        assert f'/{image["thumbnail_path"]} 300w, /{image["medium_path"]} 800w, /{image["filepath"]} 1600w' in content
+        assert image["dominant_color"] in content
+        assert '<img src="/elsewhere.png">' in content
+
+        # 再次儲存時 sanitize 會移除屬性，重新產生後結果相同
+        updated = client.put(f"/api/articles/{article['id']}", json={"content": content}).json()
+        assert updated["content"] == content
+
+    def test_backfill_refreshes_snapshots(self):
+        import json
+        from app import image_markup, models
+        from app.database import SessionLocal
+        from app.snapshots import article_path
+
+        image = client.post("/api/media/upload", files={"file": ("old.jpg", _jpeg(), "image/jpeg")}).json()
+        article = _create_test_article(title="Pre-markup Article", is_published=True)
+        db = SessionLocal()
+        try:
+            # 模擬功能上線前儲存的內容
+            db.query(models.Article).filter(models.Article.id == article["id"]).update(
+                {models.Article.content: f'<p><img src="/{image["medium_path"]}"></p>'})
+            db.commit()
+            assert image_markup.backfill(db)["articles"] >= 1
+        finally:
+            db.close()
+        assert 'loading="lazy"' in json.loads(article_path(article["slug"]).read_text())["content"]
+
+
+class TestMediaGC:
+    """孤兒圖片回收：寬限期、內文引用保護、dry-run 與儲存用量"""
+
+    def _backdate(self, image_id, days=30):
+        import os
+        import time
+        from datetime import datetime, timedelta
+        from app import models
+        from app.database import SessionLocal
+        db = SessionLocal()
+        try:
+            image = db.query(models.Image).get(image_id)
+            image.uploaded_at = datetime.utcnow() - timedelta(days=days)
+            db.commit()
+            old = time.time() - days * 86400
+            for path in (image.filepath, image.medium_path, image.thumbnail_path):
+                os.utime(path, (old, old))
+        finally:
+            db.close()
+
+    def test_collect_deletes_only_old_unreferenced_media(self):
+        import os
+        import time
+        from pathlib import Path
+        from app import media_gc, models
+        from app.database import SessionLocal
+
+        orphan = client.post("/api/media/upload", files={"file": ("orphan.jpg", _jpeg(), "image/jpeg")}).json()
+        linked = client.post("/api/media/upload", files={"file": ("linked.jpg", _jpeg(), "image/jpeg")}).json()
+        recent = client.post("/api/media/upload", files={"file": ("recent.jpg", _jpeg(), "image/jpeg")}).json()
+        self._backdate(orphan["id"])
+        self._backdate(linked["id"])
+        _create_test_article(title="Uses Library Image", content=f'<p><img src="/{linked["medium_path"]}"></p>')
+
+        old = time.time() - 30 * 86400
+        stray = Path("uploads/original/ff/ee/00000000deadbeef_stray.jpg")
+        fresh_stray = Path("uploads/original/ff/ee/00000000cafebabe_fresh.jpg")
+        temp = Path("uploads/temp_broken.jpg")
+        for path in (stray, fresh_stray, temp):
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(b"x" * 100)
+        os.utime(stray, (old, old))
+        os.utime(temp, (old, old))
+
+        db = SessionLocal()
+        try:
+            found = media_gc.plan(db)
+            assert orphan["id"] in found["images"]
+            assert linked["id"] not in found["images"] and recent["id"] not in found["images"]
+            assert str(stray) in found["files"] and str(fresh_stray) not in found["files"]
+            assert str(temp) in found["temp_files"]
+            assert found["summary"]["reclaimable_bytes"] >= orphan["file_size"] + 200
+
+            dry = media_gc.collect(db, dry_run=True)
+            assert dry["deleted_images"] == 0 and stray.exists()
+
+            result = media_gc.collect(db, batch_size=1)
+            assert result["deleted_images"] >= 1 and result["deleted_files"] >= 5
+            assert db.query(models.Image).get(orphan["id"]) is None
+            assert not Path(orphan["filepath"]).exists() and not stray.exists() and not temp.exists()
+            assert db.query(models.Image).get(linked["id"]) is not None
+            assert Path(linked["filepath"]).exists() and Path(recent["filepath"]).exists() and fresh_stray.exists()
+        finally:
+            db.close()
+            fresh_stray.unlink(missing_ok=True)
+
+    def test_escaped_reference_protects_image(self):
+        from app import media_gc, models
+        from app.database import SessionLocal
+
+        image = client.post("/api/media/upload", files={"file": ("a&b c.jpg", _jpeg(), "image/jpeg")}).json()
+        self._backdate(image["id"])
+        article = _create_test_article(title="Escaped Name", content=f'<p><img src="/{image["medium_path"]}"></p>')
+        assert "&amp;" in client.get(f"/api/articles/{article['id']}").json()["content"]
+
+        db = SessionLocal()
+        try:
+            assert image["id"] not in media_gc.plan(db)["images"]
+            stored = db.query(models.Image).get(image["id"])
+            assert media_gc.referenced_in_content(db, [stored]) == {image["id"]}
+            media_gc.collect(db)
+            assert db.query(models.Image).get(image["id"]) is not None
+        finally:
+            db.close()
+
+    def test_storage_usage(self):
+        from app import media_gc
+        media_gc.invalidate_usage()
+        client.post("/api/media/upload", files={"file": ("usage.jpg", _jpeg(), "image/jpeg")})
+        response = client.get("/api/media/storage")
+        assert response.status_code == 200
+        data = response.json()
+        assert set(data["directories"]) == {"original", "medium", "thumbnail", "temp"}
+        assert data["directories"]["original"]["files"] >= 1
+        assert data["total_bytes"] == sum(d["bytes"] for d in data["directories"].values())
+        assert data["images"]["unattached"]["count"] >= 1
+        assert "reclaimable_bytes" in data["reclaimable"]
+
+
+def test_query_fingerprint_collapses_literals_and_in_lists():
+    from app.query_audit import fingerprint
+    a = fingerprint("SELECT * FROM tags WHERE tags.name IN (?, ?, ?) AND id = 5")
+    b = fingerprint("SELECT *  FROM tags WHERE tags.name IN (?, ?) AND id = 7")
+    assert a == b
+
+
+def test_strict_query_audit_fails_request_before_response(monkeypatch):
+    """strict 模式在送出回應前就讓超出預算的請求失敗"""
+    from fastapi import FastAPI
+    from sqlalchemy import text
+    from app import query_audit
+    from app.database import SessionLocal, engine
+
+    query_audit.install(engine)
+    mini = FastAPI()
+    mini.add_middleware(query_audit.QueryAuditMiddleware, strict=True)
+
+    @mini.get("/queries/{n}")
+    def run_queries(n: int):
+        db = SessionLocal()
+        try:
+            for _ in range(n):
+                db.execute(text("SELECT 1"))
+        finally:
+            db.close()
+        return {"ran": n}
+
+    monkeypatch.setitem(query_audit.ENDPOINT_BUDGETS, "GET /queries/{n}", 2)
+    strict_client = TestClient(mini, raise_server_exceptions=False)
+    assert strict_client.get("/queries/2").json() == {"ran": 2}
+    response = strict_client.get("/queries/3")
+    assert response.status_code == 500
+    assert "ran" not in response.text
@@ -0,0 +1,107 @@
+import tempfile
+
+from alembic.autogenerate import compare_metadata
+from alembic.runtime.migration import MigrationContext
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, inspect
+
+from app import startup
+from app.database import Base
+from app.main import app
+
+def test_migrations_match_models():
+    """全新資料庫升級到 head 後，結構應與 models 完全一致"""
+    url = f"sqlite:///{tempfile.mkdtemp()}/migrate.db"
+    startup.upgrade_database(url)
+    engine = create_engine(url)
+    with engine.connect() as conn:
+        diff = compare_metadata(MigrationContext.configure(conn), Base.metadata)
+    engine.dispose()
+    assert diff == []
+
+
+# 導入 Alembic 前 models 以 create_all 建立的資料表（SQLite DDL）
+LEGACY_SCHEMA = """
+CREATE TABLE categories (
+    id INTEGER NOT NULL, name VARCHAR(100) NOT NULL, slug VARCHAR(100) NOT NULL,
+    description VARCHAR(500), color VARCHAR(7), PRIMARY KEY (id)
+);
+CREATE UNIQUE INDEX ix_categories_slug ON categories (slug);
+CREATE INDEX ix_categories_id ON categories (id);
+CREATE UNIQUE INDEX ix_categories_name ON categories (name);
+CREATE TABLE tags (id INTEGER NOT NULL, name VARCHAR(50) NOT NULL, color VARCHAR(7), PRIMARY KEY (id));
+CREATE INDEX ix_tags_id ON tags (id);
+CREATE UNIQUE INDEX ix_tags_name ON tags (name);
+CREATE TABLE site_settings (id INTEGER NOT NULL, "key" VARCHAR(100) NOT NULL, value TEXT, PRIMARY KEY (id));
+CREATE INDEX ix_site_settings_id ON site_settings (id);
+CREATE UNIQUE INDEX ix_site_settings_key ON site_settings ("key");
+CREATE TABLE articles (
+    id INTEGER NOT NULL, title VARCHAR(255) NOT NULL, slug VARCHAR(300), content TEXT NOT NULL,
+    summary VARCHAR(500), author VARCHAR(100), category_id INTEGER, is_published BOOLEAN,
+    view_count INTEGER, featured BOOLEAN, reading_time INTEGER, created_at DATETIME, updated_at DATETIME,
+    PRIMARY KEY (id), FOREIGN KEY(category_id) REFERENCES categories (id) ON DELETE SET NULL
+);
+CREATE INDEX ix_articles_is_published ON articles (is_published);
+CREATE UNIQUE INDEX ix_articles_slug ON articles (slug);
+CREATE INDEX ix_articles_title ON articles (title);
+CREATE INDEX ix_articles_id ON articles (id);
+CREATE INDEX ix_articles_created_at ON articles (created_at);
+CREATE TABLE article_tags (
+    article_id INTEGER, tag_id INTEGER,
+    FOREIGN KEY(article_id) REFERENCES articles (id) ON DELETE CASCADE,
+    FOREIGN KEY(tag_id) REFERENCES tags (id) ON DELETE CASCADE
+);
+CREATE TABLE images (
+    id INTEGER NOT NULL, filename VARCHAR(255) NOT NULL, filepath VARCHAR(500) NOT NULL,
+    alt_text VARCHAR(255), article_id INTEGER, thumbnail_path VARCHAR(500), medium_path VARCHAR(500),
+    width INTEGER, height INTEGER, file_size INTEGER, uploaded_at DATETIME,
+    PRIMARY KEY (id), FOREIGN KEY(article_id) REFERENCES articles (id) ON DELETE SET NULL
+);
+CREATE INDEX ix_images_id ON images (id);
+"""
+
+
+def test_pre_alembic_database_is_stamped():
+    """舊版 create_all 建立的資料庫會先標記為 baseline 再升級，之後所有資料表都存在"""
+    url = f"sqlite:///{tempfile.mkdtemp()}/legacy.db"
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        for statement in LEGACY_SCHEMA.split(";"):
+            if statement.strip():
+                conn.exec_driver_sql(statement)
+    startup.upgrade_database(url)
+    with engine.connect() as conn:
+        assert MigrationContext.configure(conn).get_current_revision() == startup.head_revision()
+        assert set(Base.metadata.tables) <= set(inspect(conn).get_table_names())
+        diff = compare_metadata(MigrationContext.configure(conn), Base.metadata)
+    engine.dispose()
+    assert diff == []
+
+
+def test_ready_reports_timed_checks():
+    """lifespan 啟動後 /ready 回報各項檢查與耗時；ES 無法連線不影響就緒"""
+    with TestClient(app) as client:
+        response = client.get("/ready")
+    body = response.json()
+    assert set(body["checks"]) == set(startup.CHECKS)
+    assert all("ms" in check for check in body["checks"].values())
+    assert body["checks"]["database"]["ok"]
+    assert body["checks"]["uploads"]["ok"]
+    assert body["startup_seconds"] is not None
+    assert response.status_code == (200 if body["ready"] else 503)
+
+
+def test_ready_fails_on_critical_check(monkeypatch):
+    """關鍵檢查失敗時 /ready 回傳 503，並在間隔後重新檢查"""
+    def broken():
+        raise RuntimeError("db down")
+
+    monkeypatch.setitem(startup.CHECKS, "database", startup.Check(broken))
+    monkeypatch.setattr(startup, "READY_RECHECK_INTERVAL", 0)
+    with TestClient(app) as client:
+        response = client.get("/ready")
+        assert response.status_code == 503
+        assert response.json()["checks"]["database"]["error"] == "db down"
+
+        monkeypatch.setitem(startup.CHECKS, "database", startup.Check(lambda: None))
+        assert client.get("/ready").status_code == 200
@@ -29,15 +29,18 @@ api.interceptors.response.use(
 
 export const authAPI = {
   login: (username, password) => api.post('/auth/login', { username, password }),
-  logout: () => {
-    localStorage.removeItem('token')
-    return Promise.resolve()
-  }
+  // 先讓伺服器撤銷 Token，失敗（例如已過期）也照樣清除本地登入狀態
+  logout: () => api.post('/auth/logout')
+    .catch(() => {})
+    .finally(() => localStorage.removeItem('token')),
+  me: () => api.get('/auth/me')
 }
 
 export const articleAPI = {
   getAll: (params = {}) => api.get('/articles/', { params }),
   getOne: (id) => api.get(`/articles/${id}`),
+  // fields: 例如 'id,slug,title,cover_image'，只回傳卡片需要的欄位
+  getBatch: (ids, fields) => api.get('/articles/batch', { params: { ids: ids.join(','), fields } }),
   getBySlug: (slug) => api.get(`/articles/by-slug/${slug}`),
   create: (data) => api.post('/articles/', data),
   update: (id, data) => api.put(`/articles/${id}`, data),
@@ -80,6 +83,44 @@ export const mediaAPI = {
 
 export const aiAPI = {
   generateSummary: (content, title) => api.post('/ai/generate-summary', { content, title }),
+  // Server-sent events: onDelta 每收到一段文字呼叫一次，resolve 完整摘要
+  generateSummaryStream: async (content, title, onDelta) => {
+    const token = localStorage.getItem('token')
+    const res = await fetch('/api/ai/generate-summary/stream', {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        ...(token ? { Authorization: `Bearer ${token}` } : {}),
+      },
+      body: JSON.stringify({ content, title }),
+    })
+    if (!res.ok) {
+      const data = await res.json().catch(() => ({}))
+      throw new Error(data.detail || 'AI 生成失敗')
+    }
+    const reader = res.body.getReader()
+    const decoder = new TextDecoder()
+    let buffer = ''
+    let summary = ''
+    while (true) {
+      const { done, value } = await reader.read()
+      if (done) break
+      buffer += decoder.decode(value, { stream: true })
+      const events = buffer.split('\n\n')
+      buffer = events.pop()
+      for (const raw of events) {
+        const event = raw.match(/^event: (.*)$/m)?.[1]
+        const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] || '{}')
+        if (event === 'error') throw new Error(data.detail || 'AI 生成失敗')
+        if (event === 'done') summary = data.summary
+        else if (data.delta) {
+          summary += data.delta
+          onDelta(data.delta, summary)
+        }
+      }
+    }
+    return summary
+  },
 }
 
 export const settingsAPI = {